@@ -0,0 +1,126 @@
+"""Benchmark of the plain and packed blob layouts.
+
+Stores generated robot descriptions shaped like the GitHub corpus (many small,
+similar XML files) in each layout, then reads every one back the way analysis
+and the full-text index do. Reports files/s for both, and the disk space used
+in allocated blocks rather than file sizes:
+
+    python -m benchmarks.bench_blobs [--files N] [--json out.json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+from nidus_scraper import blobs, config, packs
+from nidus_scraper.packs import PackStore
+
+
+def make_description(i: int, rng: random.Random) -> bytes:
+    links = "".join(
+        f'<link name="link_{j}"><visual><geometry><mesh filename="package://robot_{i}/'
+        f'meshes/link_{j}.stl" scale="0.001 0.001 0.001"/></geometry></visual>'
+        f'<inertial><mass value="{rng.random():.4f}"/></inertial></link>\n'
+        for j in range(rng.randint(3, 40))
+    )
+    kinds = ("revolute", "fixed", "prismatic")
+    joints = "".join(
+        f'<joint name="joint_{j}" type="{rng.choice(kinds)}">'
+        f'<parent link="link_{j}"/><child link="link_{j + 1}"/>'
+        f'<limit effort="{rng.randint(1, 200)}" velocity="{rng.random():.3f}"/>'
+        "</joint>\n"
+        for j in range(rng.randint(2, 39))
+    )
+    robot = f'<robot name="robot_{i}">\n{links}{joints}</robot>\n'
+    return f'<?xml version="1.0"?>\n{robot}'.encode()
+
+
+def disk_usage(root: Path) -> tuple[int, int]:
+    """Allocated bytes and number of distinct files below ``root`` (hardlinks once)."""
+    inodes = {
+        p.stat().st_ino: p.stat().st_blocks * 512
+        for p in root.rglob("*")
+        if p.is_file()
+    }
+    return sum(inodes.values()), len(inodes)
+
+
+async def store_all(
+    docs: list[bytes], root: Path, packed: bool
+) -> tuple[list[tuple[Path, str]], float]:
+    """Store every document; returns where, and the seconds spent storing.
+
+    Downloads are spooled to a temporary file in either layout, so only
+    storing the spooled file is timed.
+    """
+    stored = []
+    elapsed = 0.0
+    async with PackStore() if packed else contextlib.nullcontext():
+        for i, data in enumerate(docs):
+            dest = root / "github" / f"org{i % 500}" / f"repo{i}" / "robot.urdf"
+            tmp = blobs.temp_path()
+            tmp.write_bytes(data)
+            sha256 = hashlib.sha256(data).hexdigest()
+            start = time.perf_counter()
+            blobs.store(tmp, sha256, dest)
+            elapsed += time.perf_counter() - start
+            stored.append((dest, sha256))
+    return stored, elapsed
+
+
+def run(docs: list[bytes], packed: bool) -> dict[str, Any]:
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        config.DATA_DIR = root
+        stored, write_s = asyncio.run(store_all(docs, root, packed))
+        start = time.perf_counter()
+        total = 0
+        for dest, sha256 in stored:
+            with blobs.open_stored(dest, sha256) as f:
+                total += len(f.read())
+        scan_s = time.perf_counter() - start
+        assert total == sum(len(d) for d in docs)
+        used, files = disk_usage(root)
+        row = {
+            "layout": "packed" if packed else "plain",
+            "write_files_per_s": len(docs) / write_s,
+            "scan_files_per_s": len(docs) / scan_s,
+            "disk_mb": used / 1e6,
+            "files_on_disk": files,
+        }
+        packs.reader(packs.default_dir()).close()
+    return row
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=20_000)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+    rng = random.Random(0)
+    docs = [make_description(i, rng) for i in range(args.files)]
+    print(f"{len(docs)} files, {sum(map(len, docs)) / 1e6:.1f} MB")
+    results = []
+    for packed in (False, True):
+        row = run(docs, packed)
+        results.append(row)
+        print(
+            f"{row['layout']:>7}: write {row['write_files_per_s']:8.0f} files/s"
+            f"  scan {row['scan_files_per_s']:8.0f} files/s"
+            f"  disk {row['disk_mb']:7.1f} MB in {row['files_on_disk']} files"
+        )
+    if args.json:
+        Path(args.json).write_text(json.dumps({"results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+"""End-to-end crawler benchmark against :mod:`benchmarks.fake_internet`.
+
+Runs each crawler through the real network stack against a local server in a
+child process and reports files/s, MB/s, request latency percentiles, peak
+RSS and event-loop lag. Results are printed and can be written as JSON, and
+compared against an earlier run:
+
+    python -m benchmarks.bench_crawl --json after.json --compare before.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import json
+import multiprocessing
+import resource
+import socket
+import tempfile
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import asdict, fields
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+
+import aiohttp
+
+from nidus_scraper import config, github, manifest, standards, vendor_pages, vendors
+from nidus_scraper.connections import Connections
+from nidus_scraper.jobs import JobStore
+from nidus_scraper.manifest import Manifest
+from nidus_scraper.packs import PackStore
+from nidus_scraper.scheduler import Scheduler
+
+from .fake_internet import (
+    API_HOST,
+    RAW_HOST,
+    STANDARDS_HOST,
+    FakeConfig,
+    run_in_process,
+    vendor_host,
+)
+
+Scenario = Callable[[aiohttp.ClientSession, int, int], Awaitable[int]]
+
+
+class LoopLag:
+    """Sample how late the event loop wakes a sleeping task."""
+
+    def __init__(self, interval: float = 0.01) -> None:
+        self.interval = interval
+        self.samples: list[float] = []
+        self._task: asyncio.Task[None] | None = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(loop.time() - start - self.interval, 0.0))
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+
+def request_tracer(latencies: list[float], received: list[int]) -> aiohttp.TraceConfig:
+    trace = aiohttp.TraceConfig()
+
+    async def on_start(
+        session: aiohttp.ClientSession, ctx: SimpleNamespace, params: Any
+    ) -> None:
+        ctx.start = time.perf_counter()
+
+    async def on_end(
+        session: aiohttp.ClientSession, ctx: SimpleNamespace, params: Any
+    ) -> None:
+        latencies.append(time.perf_counter() - ctx.start)
+
+    async def on_chunk(
+        session: aiohttp.ClientSession, ctx: SimpleNamespace, params: Any
+    ) -> None:
+        received[0] += len(params.chunk)
+
+    trace.on_request_start.append(on_start)
+    trace.on_request_end.append(on_end)
+    trace.on_response_chunk_received.append(on_chunk)
+    return trace
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+def stored_bytes(data_dir: Path) -> int:
+    return sum(p.stat().st_size for p in (data_dir / "blobs").rglob("*") if p.is_file())
+
+
+async def count_files() -> int:
+    store = manifest.current()
+    assert store is not None
+    await store.flush()
+    conn = store._rconn
+    assert conn is not None
+    return int(conn.execute("SELECT COUNT(*) FROM files").fetchone()[0])
+
+
+async def scenario_github(
+    session: aiohttp.ClientSession, port: int, workers: int
+) -> int:
+    await github.crawl_github(session, workers)
+    return await count_files()
+
+
+async def scenario_vendors(
+    session: aiohttp.ClientSession, port: int, workers: int
+) -> int:
+    await vendors.crawl_vendors(session, workers)
+    return await count_files()
+
+
+async def scenario_standards(
+    session: aiohttp.ClientSession, port: int, workers: int
+) -> int:
+    await standards.crawl_standards(session, workers)
+    return await count_files()
+
+
+async def scenario_pages(
+    session: aiohttp.ClientSession, port: int, workers: int
+) -> int:
+    sites = {
+        f"{vendor_host(i)}:{port}": [f"http://{vendor_host(i)}:{port}/"]
+        for i in range(SITES)
+    }
+    found = await asyncio.gather(
+        *(
+            vendor_pages.discover_product_pages(
+                session, seeds, domain, max_pages=10_000
+            )
+            for domain, seeds in sites.items()
+        )
+    )
+    return sum(len(pages) for pages in found)
+
+
+SCENARIOS: dict[str, Scenario] = {
+    "github": scenario_github,
+    "vendors": scenario_vendors,
+    "pages": scenario_pages,
+    "standards": scenario_standards,
+}
+SITES = FakeConfig.vendor_sites
+# The source each scenario crawls as, for its timeouts.
+SOURCES = {
+    "github": "urdf",
+    "vendors": "vendor",
+    "pages": "pages",
+    "standards": "standards",
+}
+
+
+def point_at(port: int, fake: FakeConfig, data_dir: Path) -> None:
+    """Redirect the crawlers' hard-coded endpoints and data dir to the fake."""
+    config.DATA_DIR = data_dir
+    config.MANIFEST = data_dir / "sources.csv"
+    github.SEARCH_URL = f"http://{API_HOST}:{port}/search/code"
+    github.raw_url = lambda html_url: html_url.replace(  # type: ignore[assignment]
+        "https://github.com/", f"http://{RAW_HOST}:{port}/"
+    ).replace("/blob/", "/")
+    vendors.VENDOR_PAGES = [
+        f"http://{vendor_host(i)}:{port}/downloads" for i in range(fake.vendor_sites)
+    ]
+    standards.STANDARD_URLS = [
+        f"http://{STANDARDS_HOST}:{port}/std/doc{i}.pdf" for i in range(fake.standards)
+    ]
+
+
+async def run_scenario(
+    name: str,
+    port: int,
+    workers: int,
+    data_dir: Path,
+    rerun: bool,
+    adaptive: bool = False,
+    packed: bool = False,
+    default_pool: bool = False,
+) -> dict[str, Any]:
+    latencies: list[float] = []
+    received = [0]
+    lag = LoopLag()
+    tracer = request_tracer(latencies, received)
+    pool = (
+        # aiohttp's defaults, as sessions were configured before.
+        Connections(per_host=0, dns_ttl=10, keepalive=15.0, trace_configs=[tracer])
+        if default_pool
+        else Connections(per_host=workers, trace_configs=[tracer])
+    )
+    async with (
+        Manifest(),
+        JobStore(),
+        Scheduler(ceiling=workers if adaptive else None),
+        PackStore() if packed else contextlib.nullcontext(),
+        pool,
+    ):
+        session = pool.session(SOURCES[name])
+        if rerun:
+            await SCENARIOS[name](session, port, workers)
+            latencies.clear()
+            received[0] = 0
+        before = await count_files()
+        disk_before = stored_bytes(data_dir)
+        opened_before = pool.stats.opened
+        lag.start()
+        start = time.perf_counter()
+        files = await SCENARIOS[name](session, port, workers)
+        elapsed = time.perf_counter() - start
+        await lag.stop()
+        opened = pool.stats.opened - opened_before
+    # Streaming reads bypass the chunk trace hook, so count what was stored too.
+    transferred = max(received[0], stored_bytes(data_dir) - disk_before)
+    if name != "pages":
+        files -= before
+    return {
+        "scenario": name + (" (re-crawl)" if rerun else ""),
+        "seconds": elapsed,
+        "files": files,
+        "requests": len(latencies),
+        "connections": opened,
+        "files_per_s": files / elapsed,
+        "mb_per_s": transferred / elapsed / 1e6,
+        "latency_p50_ms": percentile(latencies, 50) * 1000,
+        "latency_p99_ms": percentile(latencies, 99) * 1000,
+        "loop_lag_p99_ms": percentile(lag.samples, 99) * 1000,
+        "loop_lag_max_ms": max(lag.samples, default=0.0) * 1000,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind((API_HOST, 0))
+        return int(s.getsockname()[1])
+
+
+def compare(results: list[dict[str, Any]], baseline_path: str) -> None:
+    baseline = {
+        r["scenario"]: r for r in json.loads(Path(baseline_path).read_text())["results"]
+    }
+    for row in results:
+        old = baseline.get(row["scenario"])
+        if not old:
+            continue
+        deltas = []
+        for key in ("files_per_s", "mb_per_s", "latency_p99_ms", "peak_rss_mb"):
+            if old[key]:
+                deltas.append(f"{key} {100 * (row[key] - old[key]) / old[key]:+.1f}%")
+        print(f"{row['scenario']:>22}: " + ", ".join(deltas))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument(
+        "--rerun", action="store_true", help="Also time a second, conditional crawl"
+    )
+    parser.add_argument(
+        "--adaptive", action="store_true", help="Adapt host limits up to --workers"
+    )
+    parser.add_argument("--packed", action="store_true", help="Pack small text files")
+    parser.add_argument(
+        "--default-pool",
+        action="store_true",
+        help="Use aiohttp's default DNS cache, keep-alive and per-host settings",
+    )
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--compare", help="Print deltas against an earlier --json file")
+    for field in fields(FakeConfig):
+        parser.add_argument(
+            f"--{field.name.replace('_', '-')}",
+            type=type(field.default),
+            default=field.default,
+        )
+    args = parser.parse_args()
+    config.configure()
+    fake = FakeConfig(**{f.name: getattr(args, f.name) for f in fields(FakeConfig)})
+
+    port = free_port()
+    ctx = multiprocessing.get_context("spawn")
+    ready, child_end = ctx.Pipe()
+    server = ctx.Process(
+        target=run_in_process, args=(fake, port, child_end), daemon=True
+    )
+    server.start()
+    ready.recv()
+    results = []
+    try:
+        for name in args.scenarios.split(","):
+            for rerun in (False, True) if args.rerun else (False,):
+                with tempfile.TemporaryDirectory() as tmp:
+                    point_at(port, fake, Path(tmp))
+                    row = asyncio.run(
+                        run_scenario(
+                            name,
+                            port,
+                            args.workers,
+                            Path(tmp),
+                            rerun,
+                            args.adaptive,
+                            args.packed,
+                            args.default_pool,
+                        )
+                    )
+                results.append(row)
+                print(
+                    f"{row['scenario']:>22}: {row['files']:6d} files"
+                    f" {row['seconds']:7.2f}s {row['files_per_s']:8.1f} files/s"
+                    f" {row['mb_per_s']:7.1f} MB/s p50 {row['latency_p50_ms']:6.1f}ms"
+                    f" p99 {row['latency_p99_ms']:7.1f}ms"
+                    f" lag p99 {row['loop_lag_p99_ms']:5.1f}ms"
+                    f" rss {row['peak_rss_mb']:6.0f}MB"
+                    f" conns {row['connections']:5d}"
+                )
+    finally:
+        server.terminate()
+    if args.compare:
+        compare(results, args.compare)
+    if args.json:
+        Path(args.json).write_text(
+            json.dumps({"config": asdict(fake), "results": results}, indent=2)
+        )
+
+
+if __name__ == "__main__":
+    main()
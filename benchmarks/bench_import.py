@@ -0,0 +1,110 @@
+"""Import-time benchmark.
+
+Times importing the package, the crawler entry point and each built-in source
+in a fresh interpreter (the best of several runs, so a warm disk cache is
+compared with a warm disk cache) and checks that optional heavy dependencies
+stay unimported until used. Exits non-zero when over budget:
+
+    python -m benchmarks.bench_import --budget-ms 500 \
+        --json after.json --compare before.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any
+
+from nidus_scraper import sources
+
+# Modules only rendering and PDF text extraction need.
+HEAVY = ("pyppeteer", "pypdf")
+
+PROBE = """
+import sys, time
+started = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - started
+print(elapsed, ",".join(m for m in {heavy!r} if m in sys.modules))
+"""
+
+
+def targets() -> dict[str, str]:
+    found = {
+        "nidus_scraper": "import nidus_scraper",
+        "nidus_scraper.runners": "import nidus_scraper.runners",
+    }
+    for name in sources.BUILTIN:
+        found[f"source:{name}"] = f"import nidus_scraper.sources as s; s.load({name!r})"
+    return found
+
+
+def measure(statement: str, runs: int) -> tuple[float, list[str]]:
+    """Best import time in seconds over ``runs`` fresh interpreters.
+
+    Also returns the heavy modules that were imported.
+    """
+    best = float("inf")
+    heavy: list[str] = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", PROBE.format(statement=statement, heavy=HEAVY)],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.split()
+        best = min(best, float(out[0]))
+        heavy = out[1].split(",") if len(out) > 1 else []
+    return best, heavy
+
+
+def compare(results: list[dict[str, Any]], baseline_path: str) -> None:
+    baseline = {
+        r["target"]: r for r in json.loads(Path(baseline_path).read_text())["results"]
+    }
+    for row in results:
+        old = baseline.get(row["target"])
+        if old and old["ms"]:
+            change = 100 * (row["ms"] - old["ms"]) / old["ms"]
+            print(f"{row['target']:>24}: {change:+.1f}%")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        help="Fail if importing nidus_scraper.runners takes longer",
+    )
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--compare", help="Print deltas against an earlier --json file")
+    args = parser.parse_args()
+
+    results = []
+    for target, statement in targets().items():
+        seconds, heavy = measure(statement, args.runs)
+        results.append({"target": target, "ms": seconds * 1000, "heavy": heavy})
+        print(f"{target:>24}: {seconds * 1000:7.1f} ms  {' '.join(heavy)}")
+    if args.compare:
+        compare(results, args.compare)
+    if args.json:
+        Path(args.json).write_text(json.dumps({"results": results}, indent=2))
+
+    failures = []
+    runners = next(r for r in results if r["target"] == "nidus_scraper.runners")
+    if runners["heavy"]:
+        failures.append(f"nidus_scraper.runners imports {', '.join(runners['heavy'])}")
+    if args.budget_ms is not None and runners["ms"] > args.budget_ms:
+        failures.append(
+            f"nidus_scraper.runners took {runners['ms']:.1f} ms (> {args.budget_ms} ms)"
+        )
+    if failures:
+        sys.exit("; ".join(failures))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Micro-benchmark of the link-extraction backends.
+
+Compares the previous BeautifulSoup implementation with the streaming
+backends in :mod:`nidus_scraper.links` on generated pages shaped like the
+vendor sites we crawl (navigation menus, inline scripts and styles, product
+grids), from a typical product page up to a multi-megabyte catalogue.
+
+    python -m benchmarks.bench_links [--repeat N] [--json out.json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import statistics
+import time
+from collections.abc import Callable
+
+from bs4 import BeautifulSoup, Tag
+
+from nidus_scraper import links
+
+SIZES = {"product_page": 60_000, "category_page": 600_000, "catalogue": 2_000_000}
+
+
+def make_page(target_size: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    nav = "".join(
+        f'<li class="menu-item"><a href="/products/cat-{i}/" title="Category {i}">'
+        f"Category {i}</a></li>"
+        for i in range(150)
+    )
+    head = (
+        "<!doctype html><html><head><meta charset='utf-8'><title>Vendor</title>"
+        f"<style>{'.c{color:#333;margin:0 auto;padding:4px}' * 400}</style>"
+        f"<script>window.__DATA__ = {json.dumps({'k': 'v' * 5000})};</script>"
+        f"</head><body><header><nav><ul>{nav}</ul></nav></header><main>"
+    )
+    parts = [head]
+    size = len(head)
+    i = 0
+    while size < target_size:
+        href = rng.choice(
+            [
+                f"/wp-content/uploads/2024/{i % 12 + 1:02d}/datasheet-{i}.pdf",
+                f"/product/{i}/?ref=grid&amp;utm_source=site",
+                f"https://cdn.example.com/img/{i}.jpg",
+                "#",
+            ]
+        )
+        block = (
+            f'<div class="card" data-id="{i}"><img src="/img/{i}.webp" alt="">'
+            f'<h3><a href="{href}">Item {i}</a></h3>'
+            f"<p>{'Lorem ipsum dolor sit amet. ' * rng.randint(2, 8)}</p></div>"
+        )
+        parts.append(block)
+        size += len(block)
+        i += 1
+    parts.append("</main><footer>&copy; Vendor</footer></body></html>")
+    return "".join(parts)
+
+
+def bs4_hrefs(html: str) -> list[str]:
+    soup = BeautifulSoup(html, "html.parser")
+    return [
+        str(a.get("href"))
+        for a in soup.find_all("a", href=True)
+        if isinstance(a, Tag) and a.get("href")
+    ]
+
+
+def measure(fn: Callable[[str], list[str]], html: str, repeat: int) -> dict[str, float]:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(html)
+        times.append(time.perf_counter() - start)
+    return {"median_ms": statistics.median(times) * 1000, "min_ms": min(times) * 1000}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    backends: dict[str, Callable[[str], list[str]]] = {"bs4": bs4_hrefs}
+    for name in links.BACKENDS:
+        backends[name] = lambda html, name=name: links.anchor_hrefs(html, name)
+
+    results = []
+    for fixture, size in SIZES.items():
+        html = make_page(size)
+        expected = bs4_hrefs(html)
+        for backend, fn in backends.items():
+            assert fn(html) == expected, f"{backend} disagrees with bs4 on {fixture}"
+            row = {"fixture": fixture, "bytes": len(html), "backend": backend}
+            row.update(measure(fn, html, args.repeat))
+            results.append(row)
+            print(
+                f"{fixture:>14} {len(html) / 1e6:6.2f} MB  {backend:<12}"
+                f" {row['median_ms']:9.1f} ms"
+            )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
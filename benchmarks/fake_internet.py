@@ -0,0 +1,285 @@
+"""Local stand-in for the hosts the crawlers talk to.
+
+Every emulated host gets its own loopback address, so per-host limits in the
+scheduler behave as they would against the real sites:
+
+* ``API_HOST`` - GitHub code search with ``size:`` filtering, the 1000-result
+  cap and ``X-RateLimit-*`` headers;
+* ``RAW_HOST`` - raw.githubusercontent-style blobs;
+* ``STANDARDS_HOST`` - large standards documents with ``Range`` support;
+* ``vendor_host(i)`` - vendor sites with a product-page link graph and PDFs.
+
+Latency, bandwidth, error rate and whether conditional requests get a 304
+are configurable through :class:`FakeConfig`.
+
+    python -m benchmarks.fake_internet --port 8800
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import random
+import re
+import time
+from dataclasses import dataclass
+from multiprocessing.connection import Connection
+from urllib.parse import urlencode
+
+from aiohttp import web
+
+API_HOST = "127.0.0.2"
+RAW_HOST = "127.0.0.3"
+STANDARDS_HOST = "127.0.0.4"
+EXTENSIONS = ["urdf", "sdf", "xacro"]
+SEARCH_CAP = 1000
+MAX_INDEXED_SIZE = 384 * 1024
+
+
+def vendor_host(i: int) -> str:
+    return f"127.0.1.{i + 1}"
+
+
+@dataclass
+class FakeConfig:
+    github_files: int = 1500  # per extension
+    raw_size: int = 4096
+    vendor_sites: int = 4
+    pages_per_site: int = 60
+    pdfs_per_site: int = 10
+    pdf_size: int = 2 * 1024 * 1024
+    standards: int = 4
+    standard_size: int = 8 * 1024 * 1024
+    latency: float = 0.005  # seconds before the response starts
+    bandwidth: float = 0.0  # bytes per second per response, 0 = unlimited
+    error_rate: float = 0.0  # share of requests answered with a 503
+    not_modified: bool = True  # answer matching If-None-Match with 304
+    rate_limit: int = 5000  # search requests per window
+    rate_window: float = 60.0
+    seed: int = 0
+
+
+def _body(key: str, size: int) -> bytes:
+    block = hashlib.sha256(key.encode()).digest() * 64
+    return (block * (size // len(block) + 1))[:size]
+
+
+class FakeInternet:
+    def __init__(self, config: FakeConfig) -> None:
+        self.config = config
+        rng = random.Random(config.seed)
+        self.files = {
+            ext: [
+                (
+                    f"org{i % 97}/repo{i % 389}",
+                    f"robots/r{i}/model.{ext}",
+                    rng.randrange(MAX_INDEXED_SIZE),
+                )
+                for i in range(config.github_files)
+            ]
+            for ext in EXTENSIONS
+        }
+        self.links = {
+            site: {
+                page: rng.sample(
+                    range(config.pages_per_site), min(8, config.pages_per_site)
+                )
+                for page in range(config.pages_per_site)
+            }
+            for site in range(config.vendor_sites)
+        }
+        self.rng = rng
+        self.window_start = time.time()
+        self.window_used = 0
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_get("/{tail:.*}", self._dispatch)
+        return app
+
+    @web.middleware
+    async def _middleware(
+        self, request: web.Request, handler: web.RequestHandler
+    ) -> web.StreamResponse:
+        if self.config.latency:
+            await asyncio.sleep(self.config.latency)
+        if self.config.error_rate and self.rng.random() < self.config.error_rate:
+            return web.Response(status=503, text="try again")
+        return await handler(request)
+
+    async def _dispatch(self, request: web.Request) -> web.StreamResponse:
+        host = request.url.host or ""
+        if host == API_HOST:
+            return self._search(request)
+        if host == RAW_HOST:
+            return await self._blob(request, _body(request.path, self.config.raw_size))
+        if host == STANDARDS_HOST:
+            return await self._blob(
+                request, _body(request.path, self.config.standard_size)
+            )
+        if host.startswith("127.0.1."):
+            return await self._vendor(request, int(host.rsplit(".", 1)[1]) - 1)
+        raise web.HTTPNotFound()
+
+    def _rate_headers(self) -> dict[str, str]:
+        now = time.time()
+        if now - self.window_start >= self.config.rate_window:
+            self.window_start, self.window_used = now, 0
+        self.window_used += 1
+        return {
+            "X-RateLimit-Limit": str(self.config.rate_limit),
+            "X-RateLimit-Remaining": str(
+                max(self.config.rate_limit - self.window_used, 0)
+            ),
+            "X-RateLimit-Reset": str(int(self.window_start + self.config.rate_window)),
+        }
+
+    def _search(self, request: web.Request) -> web.Response:
+        headers = self._rate_headers()
+        if self.window_used > self.config.rate_limit:
+            headers["Retry-After"] = str(
+                int(float(headers["X-RateLimit-Reset"]) - time.time()) + 1
+            )
+            return web.json_response(
+                {"message": "API rate limit exceeded"}, status=403, headers=headers
+            )
+        query = request.query.get("q", "")
+        ext = re.search(r"extension:(\w+)", query)
+        size = re.search(r"size:(\d+)\.\.(\d+)", query)
+        lo, hi = (int(size[1]), int(size[2])) if size else (0, MAX_INDEXED_SIZE)
+        hits = [
+            f for f in self.files.get(ext[1] if ext else "", []) if lo <= f[2] <= hi
+        ]
+        page = int(request.query.get("page", "1"))
+        per_page = int(request.query.get("per_page", "30"))
+        start = (page - 1) * per_page
+        reachable = hits[:SEARCH_CAP]
+        items = [
+            {
+                "name": path.rsplit("/", 1)[1],
+                "path": path,
+                "sha": hashlib.sha1(f"{repo}/{path}".encode()).hexdigest(),
+                "html_url": f"https://github.com/{repo}/blob/main/{path}",
+                "repository": {"full_name": repo},
+            }
+            for repo, path, _ in reachable[start : start + per_page]
+        ]
+        return web.json_response(
+            {"total_count": len(hits), "incomplete_results": False, "items": items},
+            headers=headers,
+        )
+
+    async def _vendor(self, request: web.Request, site: int) -> web.StreamResponse:
+        path = request.path
+        if path.endswith(".pdf"):
+            return await self._blob(
+                request, _body(f"{site}{path}", self.config.pdf_size)
+            )
+        match = re.fullmatch(r"/products/p(\d+)", path)
+        pages = self.links.get(site, {})
+        if path == "/":
+            targets = list(pages)[:8]
+        elif match and int(match[1]) in pages:
+            targets = pages[int(match[1])]
+        elif path == "/downloads":
+            pdfs = "".join(
+                f'<li><a href="/files/doc{i}.pdf">Datasheet {i}</a></li>'
+                for i in range(self.config.pdfs_per_site)
+            )
+            return web.Response(
+                text=f"<html><body><ul>{pdfs}</ul></body></html>",
+                content_type="text/html",
+            )
+        else:
+            raise web.HTTPNotFound()
+        anchors = "".join(
+            f'<a href="/products/p{t}?{urlencode({"ref": "nav"})}">Product {t}</a>'
+            for t in targets
+        )
+        filler = (
+            "<p>" + "Rugged autonomous platform for demanding missions. " * 200 + "</p>"
+        )
+        html = (
+            f"<html><head><title>Site {site}</title></head><body>"
+            '<nav><a href="/blog/news">Blog</a><a href="/downloads">Downloads</a>'
+            f"{anchors}</nav>"
+            f"{filler}</body></html>"
+        )
+        return web.Response(text=html, content_type="text/html")
+
+    async def _blob(self, request: web.Request, body: bytes) -> web.StreamResponse:
+        etag = (
+            '"' + hashlib.sha1(body[:4096] + str(len(body)).encode()).hexdigest() + '"'
+        )
+        if self.config.not_modified and request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        status = 200
+        headers = {
+            "ETag": etag,
+            "Accept-Ranges": "bytes",
+            "Content-Type": "application/octet-stream",
+        }
+        range_header = request.headers.get("Range", "")
+        match = re.fullmatch(r"bytes=(\d+)-", range_header)
+        if match and request.headers.get("If-Range", etag) == etag:
+            start = int(match[1])
+            if start >= len(body):
+                return web.Response(status=416)
+            headers["Content-Range"] = f"bytes {start}-{len(body) - 1}/{len(body)}"
+            body = body[start:]
+            status = 206
+        resp = web.StreamResponse(status=status, headers=headers)
+        resp.content_length = len(body)
+        await resp.prepare(request)
+        chunk = 64 * 1024
+        for offset in range(0, len(body), chunk):
+            await resp.write(body[offset : offset + chunk])
+            if self.config.bandwidth:
+                await asyncio.sleep(chunk / self.config.bandwidth)
+        await resp.write_eof()
+        return resp
+
+
+async def serve(config: FakeConfig, port: int) -> web.AppRunner:
+    runner = web.AppRunner(FakeInternet(config).app(), access_log=None)
+    await runner.setup()
+    hosts = [API_HOST, RAW_HOST, STANDARDS_HOST]
+    hosts += [vendor_host(i) for i in range(config.vendor_sites)]
+    for host in hosts:
+        await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+def run_in_process(config: FakeConfig, port: int, ready: Connection) -> None:
+    """Entry point for running the server in a child process."""
+
+    async def main() -> None:
+        runner = await serve(config, port)
+        ready.send(True)
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
+
+    asyncio.run(main())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fake internet for crawler benchmarks")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--latency", type=float, default=FakeConfig.latency)
+    parser.add_argument("--error-rate", type=float, default=FakeConfig.error_rate)
+    args = parser.parse_args()
+    config = FakeConfig(latency=args.latency, error_rate=args.error_rate)
+
+    async def run() -> None:
+        await serve(config, args.port)
+        print(f"Serving on port {args.port}")
+        await asyncio.Event().wait()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
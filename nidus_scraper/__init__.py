@@ -1,5 +1,16 @@
 """Nidus scraper package."""
 
-from .runners import main
+from __future__ import annotations
+
+from typing import Any
 
 __all__ = ["main"]
+
+
+def __getattr__(name: str) -> Any:
+    # Importing the package stays cheap; the crawler is loaded on first use.
+    if name == "main":
+        from .runners import main
+
+        return main
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,451 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import multiprocessing
+import sqlite3
+import xml.etree.ElementTree as ET
+from collections import Counter
+from collections.abc import Iterator
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+from pathlib import Path, PurePosixPath
+from types import TracebackType
+from typing import Any, Callable, TypeVar
+
+from . import blobs, config
+from .config import logger
+
+T = TypeVar("T")
+
+FORMATS = {".urdf": "urdf", ".sdf": "sdf", ".xacro": "xacro"}
+MAX_ERRORS = 20
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS descriptions (
+    sha256 TEXT PRIMARY KEY,
+    format TEXT NOT NULL,
+    robot TEXT,
+    links INTEGER NOT NULL,
+    joints INTEGER NOT NULL,
+    valid INTEGER NOT NULL,
+    errors TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS descriptions_joints ON descriptions (joints);
+CREATE TABLE IF NOT EXISTS joint_types (
+    sha256 TEXT NOT NULL,
+    type TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (sha256, type)
+);
+CREATE INDEX IF NOT EXISTS joint_types_type ON joint_types (type);
+CREATE TABLE IF NOT EXISTS meshes (
+    sha256 TEXT NOT NULL,
+    uri TEXT NOT NULL,
+    format TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS meshes_sha256 ON meshes (sha256);
+CREATE INDEX IF NOT EXISTS meshes_format ON meshes (format);
+CREATE TABLE IF NOT EXISTS includes (
+    sha256 TEXT NOT NULL,
+    filename TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS includes_sha256 ON includes (sha256);
+"""
+
+_current: ContextVar[Analyzer | None] = ContextVar("analyzer", default=None)
+
+
+@dataclass
+class Description:
+    """What a robot description file declares, without expanding macros."""
+
+    sha256: str
+    format: str
+    robot: str | None = None
+    links: int = 0
+    joints: int = 0
+    joint_types: dict[str, int] = field(default_factory=dict)
+    meshes: list[str] = field(default_factory=list)
+    includes: list[str] = field(default_factory=list)
+    errors: list[str] = field(default_factory=list)
+
+    @property
+    def valid(self) -> bool:
+        return not self.errors
+
+
+def default_path() -> Path:
+    return config.MANIFEST.with_name("analysis.sqlite3")
+
+
+def current() -> Analyzer | None:
+    return _current.get()
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _is_xacro(tag: str) -> bool:
+    return tag.startswith("{") and "xacro" in tag.split("}", 1)[0]
+
+
+def mesh_format(uri: str) -> str:
+    return PurePosixPath(uri).suffix.lstrip(".").lower() or "unknown"
+
+
+def _events(path: Path, sha256: str) -> Iterator[tuple[str, Any]]:
+    with blobs.open_stored(path, sha256) as f:
+        yield from ET.iterparse(f, events=("start", "end"))
+
+
+def analyze(path: Path, sha256: str) -> Description:
+    """Parse ``path`` once, front to back, and summarise it.
+
+    Runs in a worker process; memory stays flat because elements are cleared
+    as soon as they are closed.
+    """
+    desc = Description(sha256, FORMATS.get(path.suffix.lower(), "unknown"))
+    joint_types: Counter[str] = Counter()
+    link_names: set[str] = set()
+    joint_refs: list[tuple[str, str]] = []
+    stack: list[str] = []
+    try:
+        for event, elem in _events(path, sha256):
+            tag = _local(elem.tag)
+            if event == "start":
+                stack.append(tag)
+                if len(stack) == 1:
+                    desc.robot = elem.get("name")
+                    if tag not in ("robot", "sdf"):
+                        desc.errors.append(f"unexpected root element <{tag}>")
+                continue
+            stack.pop()
+            if _is_xacro(elem.tag):
+                if tag == "include" and elem.get("filename"):
+                    desc.includes.append(elem.get("filename", ""))
+            elif tag == "link" and elem.get("name") and "transmission" not in stack:
+                desc.links += 1
+                name = elem.get("name", "")
+                if name in link_names and desc.format == "urdf":
+                    desc.errors.append(f"duplicate link {name!r}")
+                link_names.add(name)
+            elif tag == "joint" and elem.get("type"):
+                desc.joints += 1
+                joint_types[elem.get("type", "")] += 1
+                parent, child = elem.find("parent"), elem.find("child")
+                if parent is not None and child is not None:
+                    joint_refs.append(
+                        (
+                            parent.get("link") or parent.text or "",
+                            child.get("link") or child.text or "",
+                        )
+                    )
+            elif tag == "mesh":
+                uri = elem.get("filename") or elem.findtext("uri") or ""
+                if uri.strip():
+                    desc.meshes.append(uri.strip())
+            if tag in ("link", "joint", "visual", "collision", "model", "macro"):
+                elem.clear()
+    except ET.ParseError as exc:
+        desc.errors.append(f"parse error: {exc}")
+    except OSError as exc:
+        desc.errors.append(f"unreadable: {exc}")
+    desc.joint_types = dict(joint_types)
+    # Links and joints may come from macros or includes in xacro, so only
+    # plain URDF can be checked for dangling references.
+    if desc.format == "urdf":
+        for parent, child in joint_refs:
+            for name in (parent, child):
+                if name not in link_names:
+                    desc.errors.append(f"joint refers to missing link {name!r}")
+    desc.errors = desc.errors[:MAX_ERRORS]
+    return desc
+
+
+class AnalysisIndex:
+    """SQLite index of :class:`Description` rows keyed by sha256."""
+
+    def __init__(self, path: Path | None = None) -> None:
+        self.path = path or default_path()
+        self._pool = ThreadPoolExecutor(1, thread_name_prefix="analysis")
+        self._conn: sqlite3.Connection | None = None
+
+    async def _run(self, fn: Callable[[], T]) -> T:
+        return await asyncio.get_running_loop().run_in_executor(self._pool, fn)
+
+    def _open(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        conn.executescript(SCHEMA)
+        return conn
+
+    async def open(self) -> None:
+        self._conn = await self._run(self._open)
+
+    async def close(self) -> None:
+        if self._conn is not None:
+            await self._run(self._conn.close)
+            self._conn = None
+        self._pool.shutdown()
+
+    async def __aenter__(self) -> AnalysisIndex:
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc: object) -> None:
+        await self.close()
+
+    async def has(self, sha256: str) -> bool:
+        conn = self._conn
+        assert conn is not None, "analysis index is not open"
+        row = await self._run(
+            lambda: conn.execute(
+                "SELECT 1 FROM descriptions WHERE sha256 = ?", (sha256,)
+            ).fetchone()
+        )
+        return row is not None
+
+    async def put(self, desc: Description) -> None:
+        conn = self._conn
+        assert conn is not None, "analysis index is not open"
+
+        def _write() -> None:
+            with conn:
+                for table in ("joint_types", "meshes", "includes"):
+                    conn.execute(
+                        f"DELETE FROM {table} WHERE sha256 = ?", (desc.sha256,)
+                    )
+                conn.execute(
+                    "INSERT OR REPLACE INTO descriptions VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        desc.sha256,
+                        desc.format,
+                        desc.robot,
+                        desc.links,
+                        desc.joints,
+                        desc.valid,
+                        "\n".join(desc.errors),
+                    ),
+                )
+                conn.executemany(
+                    "INSERT INTO joint_types VALUES (?, ?, ?)",
+                    [(desc.sha256, t, n) for t, n in desc.joint_types.items()],
+                )
+                conn.executemany(
+                    "INSERT INTO meshes VALUES (?, ?, ?)",
+                    [(desc.sha256, m, mesh_format(m)) for m in desc.meshes],
+                )
+                conn.executemany(
+                    "INSERT INTO includes VALUES (?, ?)",
+                    [(desc.sha256, i) for i in desc.includes],
+                )
+
+        await self._run(_write)
+
+    async def query(
+        self,
+        min_joints: int | None = None,
+        joint_type: str | None = None,
+        mesh_format: str | None = None,
+        format: str | None = None,
+        valid: bool | None = None,
+    ) -> list[tuple[Any, ...]]:
+        """``(sha256, format, robot, links, joints)`` rows matching every filter."""
+        sql = "SELECT sha256, format, robot, links, joints FROM descriptions d WHERE 1"
+        params: list[Any] = []
+        if min_joints is not None:
+            sql += " AND joints >= ?"
+            params.append(min_joints)
+        if format is not None:
+            sql += " AND format = ?"
+            params.append(format)
+        if valid is not None:
+            sql += " AND valid = ?"
+            params.append(int(valid))
+        if joint_type is not None:
+            sql += (
+                " AND EXISTS (SELECT 1 FROM joint_types j"
+                " WHERE j.sha256 = d.sha256 AND j.type = ?)"
+            )
+            params.append(joint_type)
+        if mesh_format is not None:
+            sql += (
+                " AND EXISTS (SELECT 1 FROM meshes m"
+                " WHERE m.sha256 = d.sha256 AND m.format = ?)"
+            )
+            params.append(mesh_format.lower())
+        conn = self._conn
+        assert conn is not None, "analysis index is not open"
+        sql += " ORDER BY joints DESC"
+        return await self._run(lambda: conn.execute(sql, params).fetchall())
+
+
+def merge_indexes(target: Path, sources: list[Path]) -> int:
+    """Copy files not yet in ``target`` from per-shard indexes; returns how many."""
+    conn = sqlite3.connect(target)
+    conn.execute("PRAGMA busy_timeout=30000")
+    conn.executescript(SCHEMA)
+    added = 0
+    for source in sources:
+        conn.execute("ATTACH DATABASE ? AS shard", (str(source),))
+        with conn:
+            conn.execute(
+                "CREATE TEMP TABLE new AS SELECT sha256 FROM shard.descriptions"
+                " WHERE sha256 NOT IN (SELECT sha256 FROM main.descriptions)"
+            )
+            for table in ("descriptions", "joint_types", "meshes", "includes"):
+                cur = conn.execute(
+                    f"INSERT INTO main.{table} SELECT * FROM shard.{table}"
+                    " WHERE sha256 IN (SELECT sha256 FROM temp.new)"
+                )
+                if table == "descriptions":
+                    added += cur.rowcount
+            conn.execute("DROP TABLE temp.new")
+        conn.execute("DETACH DATABASE shard")
+    conn.close()
+    return added
+
+
+class Analyzer:
+    """Analyse saved description files in the background as they arrive.
+
+    ``submit`` returns as soon as the file is queued; it only waits when
+    ``2 * processes`` files are already being parsed, so the crawl is never
+    more than that far ahead of the analysis. Files whose sha256 is already
+    indexed are skipped.
+    """
+
+    def __init__(
+        self,
+        index: AnalysisIndex | None = None,
+        processes: int = 2,
+        executor: Executor | None = None,
+    ) -> None:
+        self.index = index or AnalysisIndex()
+        self.processes = processes
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._slots = asyncio.Semaphore(processes * 2)
+        self._tasks: set[asyncio.Task[None]] = set()
+        self._queued: set[str] = set()
+        self.analyzed = 0
+        self._token: Token[Analyzer | None] | None = None
+
+    async def __aenter__(self) -> Analyzer:
+        await self.index.open()
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                self.processes, mp_context=multiprocessing.get_context("spawn")
+            )
+        self._token = _current.set(self)
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        if self._token is not None:
+            _current.reset(self._token)
+            self._token = None
+        await self.drain()
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown()
+        await self.index.close()
+        logger.info("Analysed %s description files", self.analyzed)
+
+    async def drain(self) -> None:
+        """Wait for every queued file to be analysed."""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    async def submit(self, path: Path, sha256: str) -> None:
+        if path.suffix.lower() not in FORMATS or sha256 in self._queued:
+            return
+        self._queued.add(sha256)
+        if await self.index.has(sha256):
+            return
+        await self._slots.acquire()
+        task = asyncio.create_task(self._analyze(path, sha256))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _analyze(self, path: Path, sha256: str) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+            desc = await loop.run_in_executor(self._executor, analyze, path, sha256)
+            await self.index.put(desc)
+            self.analyzed += 1
+        except Exception as exc:  # noqa: BLE001 - analysis must never fail a crawl
+            logger.warning("Could not analyse %s: %s", path, exc)
+        finally:
+            self._slots.release()
+
+
+async def submit(path: Path, sha256: str) -> None:
+    """Queue ``path`` for analysis if an :class:`Analyzer` is running."""
+    analyzer = _current.get()
+    if analyzer is not None:
+        await analyzer.submit(path, sha256)
+
+
+def _manifest_files() -> Iterator[tuple[str, str]]:
+    from .manifest import default_path as manifest_path
+
+    conn = sqlite3.connect(manifest_path())
+    try:
+        yield from conn.execute("SELECT filename, sha256 FROM files ORDER BY id")
+    finally:
+        conn.close()
+
+
+async def backfill(processes: int) -> None:
+    """Analyse every description already in the manifest but not in the index."""
+    async with Analyzer(processes=processes) as analyzer:
+        for filename, sha256 in _manifest_files():
+            if blobs.present(Path(filename), sha256):
+                await analyzer.submit(Path(filename), sha256)
+
+
+async def _query(args: argparse.Namespace) -> None:
+    async with AnalysisIndex() as index:
+        rows = await index.query(
+            args.min_joints, args.joint_type, args.mesh_format, args.format,
+            None if args.valid is None else args.valid == "yes",
+        )
+    for sha256, fmt, robot, links, joints in rows:
+        print(
+            f"{sha256[:12]}  {fmt:5}  {links:4} links  {joints:4} joints  "
+            f"{robot or '-'}"
+        )
+    print(f"{len(rows)} files", flush=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Query the robot description index")
+    parser.add_argument("--min-joints", type=int)
+    parser.add_argument("--joint-type", help="e.g. revolute, prismatic, continuous")
+    parser.add_argument("--mesh-format", help="e.g. stl, dae, obj")
+    parser.add_argument("--format", choices=sorted(set(FORMATS.values())))
+    parser.add_argument("--valid", choices=("yes", "no"))
+    parser.add_argument(
+        "--backfill",
+        action="store_true",
+        help="Analyse files already in the manifest that are not indexed yet",
+    )
+    parser.add_argument("--processes", type=int, default=2)
+    args = parser.parse_args()
+    config.configure()
+    if args.backfill:
+        asyncio.run(backfill(args.processes))
+    asyncio.run(_query(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import hashlib
+import io
+import os
+import tempfile
+from pathlib import Path, PurePosixPath
+from typing import BinaryIO
+from urllib.parse import unquote, urlparse
+
+from . import config, packs
+from .config import logger
+from .frontier import DEFAULT_PORTS
+
+
+# File name for URLs that name a directory rather than a document.
+INDEX_NAME = "__index__"
+
+
+def blob_root() -> Path:
+    return config.DATA_DIR / "blobs"
+
+
+def blob_path(sha256: str) -> Path:
+    """Return where the blob with digest ``sha256`` lives, sharded by prefix."""
+    return blob_root() / sha256[:2] / sha256[2:4] / sha256
+
+
+def temp_path(prefix: str = "") -> Path:
+    """Create an empty temporary file on the same filesystem as the blobs."""
+    tmp_dir = blob_root() / "tmp"
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    fd, name = tempfile.mkstemp(dir=tmp_dir, prefix=prefix, suffix=".part")
+    os.close(fd)
+    return Path(name)
+
+
+def partial_path(url: str, dest: Path) -> Path:
+    """Stable spool file for fetching ``url`` into ``dest``.
+
+    It survives interrupted transfers. Jobs saving the same URL to different
+    places get separate files, so concurrent downloads cannot interleave.
+    """
+    digest = hashlib.sha256(f"{url}\0{dest}".encode()).hexdigest()
+    path = blob_root() / "partial" / digest
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def read_partial_validator(partial: Path) -> str | None:
+    """Return the ETag or Last-Modified the partial body was fetched under."""
+    meta = partial.with_suffix(".validator")
+    if not meta.exists():
+        return None
+    return meta.read_text() or None
+
+
+def write_partial_validator(partial: Path, validator: str | None) -> None:
+    meta = partial.with_suffix(".validator")
+    if validator:
+        meta.write_text(validator)
+    else:
+        meta.unlink(missing_ok=True)
+
+
+def discard_partial(partial: Path) -> None:
+    partial.unlink(missing_ok=True)
+    partial.with_suffix(".validator").unlink(missing_ok=True)
+
+
+def commit(tmp: Path, sha256: str) -> tuple[Path, bool]:
+    """Move ``tmp`` into the store under ``sha256``.
+
+    Returns the blob path and whether it was new. When the content is already
+    stored ``tmp`` is discarded, so identical bytes are kept only once.
+    """
+    path = blob_path(sha256)
+    if path.exists():
+        tmp.unlink(missing_ok=True)
+        return path, False
+    path.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(tmp, path)
+    return path, True
+
+
+def link(blob: Path, dest: Path) -> None:
+    """Atomically point the logical path ``dest`` at ``blob``.
+
+    Hardlinks are used where possible; across filesystems a symlink is used
+    instead.
+    """
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    if dest.exists() and os.path.samefile(blob, dest):
+        return
+    tmp = dest.with_name(f".{dest.name}.{os.getpid()}.{os.urandom(4).hex()}.link")
+    tmp.unlink(missing_ok=True)
+    try:
+        os.link(blob, tmp)
+    except OSError as exc:
+        logger.debug("Hardlink %s -> %s failed (%s), using symlink", dest, blob, exc)
+        os.symlink(blob.resolve(), tmp)
+    os.replace(tmp, dest)
+
+
+def store(tmp: Path, sha256: str, dest: Path) -> bool:
+    """Store ``tmp`` under ``sha256`` as the logical file ``dest``; returns whether new.
+
+    While a :class:`~nidus_scraper.packs.PackStore` is active, small text files
+    go into its packs and ``dest`` is not created; read them back with
+    :func:`open_stored`. Everything else is committed and linked as a plain file.
+    """
+    packed = packs.current()
+    if (
+        packed is not None
+        and packed.accepts(dest, tmp.stat().st_size)
+        and not blob_path(sha256).exists()
+    ):
+        created = packed.add(sha256, tmp.read_bytes())
+        tmp.unlink(missing_ok=True)
+        # A file left from the plain layout now holds older content.
+        dest.unlink(missing_ok=True)
+        return created
+    blob, created = commit(tmp, sha256)
+    link(blob, dest)
+    return created
+
+
+def exists(sha256: str) -> bool:
+    """Whether content ``sha256`` is stored, plain or packed."""
+    return blob_path(sha256).exists() or sha256 in packs.reader()
+
+
+def _open_packed(sha256: str, refresh: bool) -> BinaryIO | None:
+    data = packs.reader().read(sha256, refresh)
+    return None if data is None else io.BytesIO(data)
+
+
+def open_blob(sha256: str) -> BinaryIO:
+    """Open stored content by digest, whichever layout holds it.
+
+    Packed content is decompressed here, on open.
+    """
+    packed = _open_packed(sha256, refresh=False)
+    if packed is not None:
+        return packed
+    try:
+        return open(blob_path(sha256), "rb")
+    except FileNotFoundError:
+        pass
+    packed = _open_packed(sha256, refresh=True)
+    if packed is None:
+        raise FileNotFoundError(f"No stored blob {sha256}")
+    return packed
+
+
+def present(path: Path, sha256: str) -> bool:
+    """Whether the logical file ``path`` with content ``sha256`` can be read."""
+    return path.exists() or exists(sha256)
+
+
+def restore(dest: Path, sha256: str) -> None:
+    """Recreate the logical file ``dest`` from stored content if it is missing.
+
+    Content the active pack store keeps packed has no file of its own.
+    """
+    if dest.exists():
+        return
+    blob = blob_path(sha256)
+    if not blob.exists():
+        packed = packs.current()
+        if packed is not None and sha256 in packed:
+            return
+        data = packs.reader().read(sha256)
+        if data is None:
+            return
+        tmp = temp_path(prefix=f"{dest.name}.")
+        tmp.write_bytes(data)
+        blob, _ = commit(tmp, sha256)
+    link(blob, dest)
+    logger.info("Restored %s from stored content", dest)
+
+
+def open_stored(path: Path, sha256: str | None) -> BinaryIO:
+    """Open the logical file ``path``, or its content by digest if it is packed."""
+    if sha256 is not None:
+        # Cheap while the packs are indexed; a plain file is opened otherwise.
+        packed = _open_packed(sha256, refresh=False)
+        if packed is not None:
+            return packed
+    try:
+        return open(path, "rb")
+    except FileNotFoundError:
+        if sha256 is None:
+            raise
+        return open_blob(sha256)
+
+
+def _safe_parts(path: str) -> list[str]:
+    return [p for p in PurePosixPath(path).parts if p not in ("/", ".", "..", "")]
+
+
+def _dir_name(segment: str) -> str:
+    """Escape a directory ``segment`` so it never equals a file name.
+
+    File names from :func:`url_path` contain a dot or start with ``INDEX_NAME``;
+    directory names get neither, as ``%`` and ``.`` are percent-encoded.
+    """
+    name = segment.replace("%", "%25").replace(".", "%2E")
+    return "%5F" + name[1:] if name.startswith(INDEX_NAME) else name
+
+
+def url_path(root: Path, url: str) -> Path:
+    """Map ``url`` to a logical path below ``root``.
+
+    The host, any non-default port and every path segment are kept, so equally
+    named files from different sites or directories do not overwrite each
+    other; credentials in the URL are dropped. A URL ending in a slash or in a
+    segment without an extension is stored as ``__index__`` inside that
+    directory, so ``/a/b`` and ``/a/b/c.pdf`` can both be kept. Directory
+    names with a dot are escaped (``/a/b.html/c.pdf`` is kept as
+    ``a/b%2Ehtml/c.pdf``), so they never clash with a file. A query string
+    is folded into the file name as a short digest.
+    """
+    parsed = urlparse(url)
+    parts = _safe_parts(unquote(parsed.path))
+    if not parts or parsed.path.endswith("/") or "." not in parts[-1]:
+        parts.append(INDEX_NAME)
+    if parsed.query:
+        digest = hashlib.sha1(parsed.query.encode()).hexdigest()[:8]
+        stem, dot, suffix = parts[-1].rpartition(".")
+        parts[-1] = f"{stem}-{digest}.{suffix}" if dot else f"{suffix}-{digest}"
+    host = parsed.hostname or "_"
+    if parsed.port and parsed.port != DEFAULT_PORTS.get(parsed.scheme):
+        host = f"{host}_{parsed.port}"
+    return root.joinpath(host, *map(_dir_name, parts[:-1]), parts[-1])
+
+
+def repo_path(root: Path, repo: str, path: str) -> Path:
+    """Map a file inside GitHub repository ``repo`` to a logical path."""
+    return root.joinpath(*_safe_parts(repo), *_safe_parts(path))
@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import asyncio
+import weakref
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from types import TracebackType
+from typing import Any
+
+from .config import logger
+
+LAUNCH_OPTIONS = {"handleSIGINT": False, "handleSIGTERM": False, "handleSIGHUP": False}
+
+# The event loop only keeps weak references to tasks; these must outlive
+# the request handler that starts them.
+_decisions: set[asyncio.Task[None]] = set()
+
+
+def _block_request(request: Any) -> None:
+    """Fail every network request except inline ``data:`` resources."""
+
+    async def decide() -> None:
+        try:
+            if request.url.startswith("data:"):
+                await request.continue_()
+            else:
+                await request.abort()
+        except Exception:  # noqa: BLE001 - interception is off outside render_html
+            pass
+
+    task = asyncio.ensure_future(decide())
+    _decisions.add(task)
+    task.add_done_callback(_decisions.discard)
+
+
+@dataclass
+class _Browser:
+    browser: Any
+    renders: int = 0
+    busy: int = 0
+    retired: bool = False
+    pages: list[Any] = field(default_factory=list)
+
+    def alive(self) -> bool:
+        process = getattr(self.browser, "process", None)
+        return process is None or process.poll() is None
+
+
+class BrowserPool:
+    """Long-lived headless browsers, each serving several reusable tabs.
+
+    A browser is recycled after ``max_renders`` renders or as soon as it
+    crashes; a tab that fails or times out is replaced. Every browser is
+    closed when the pool exits, whatever happened to it.
+    """
+
+    def __init__(
+        self,
+        browsers: int = 2,
+        pages_per_browser: int = 4,
+        max_renders: int = 200,
+        render_timeout: float = 60.0,
+        launcher: Callable[..., Awaitable[Any]] | None = None,
+    ) -> None:
+        self.browsers = browsers
+        self.pages_per_browser = pages_per_browser
+        self.max_renders = max_renders
+        self.render_timeout = render_timeout
+        self.launcher = launcher
+        self.launched = 0
+        self._idle: asyncio.Queue[tuple[_Browser, Any]] = asyncio.Queue()
+        self._live: list[_Browser] = []
+        self._start_lock = asyncio.Lock()
+        self._started = False
+        # Tabs with the offline request handler installed. Weak, so a closed
+        # tab drops out and a new one is never mistaken for it.
+        self._offline: weakref.WeakSet[Any] = weakref.WeakSet()
+
+    @property
+    def capacity(self) -> int:
+        return self.browsers * self.pages_per_browser
+
+    async def __aenter__(self) -> BrowserPool:
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        await self.close()
+
+    async def _launch(self) -> None:
+        if self.launcher is None:
+            # pyppeteer takes a tenth of a second to import; only pay it to render.
+            from pyppeteer import launch  # type: ignore
+
+            self.launcher = launch
+        browser = await self.launcher(**LAUNCH_OPTIONS)
+        self.launched += 1
+        entry = _Browser(browser)
+        self._live.append(entry)
+        try:
+            for _ in range(self.pages_per_browser):
+                entry.pages.append(await browser.newPage())
+        except BaseException:
+            await self._close_browser(entry)
+            raise
+        for page in entry.pages:
+            self._idle.put_nowait((entry, page))
+
+    async def _ensure_started(self) -> None:
+        async with self._start_lock:
+            if self._started:
+                return
+            await asyncio.gather(*(self._launch() for _ in range(self.browsers)))
+            self._started = True
+
+    async def _close_browser(self, entry: _Browser) -> None:
+        entry.retired = True
+        if entry in self._live:
+            self._live.remove(entry)
+        try:
+            await entry.browser.close()
+        except Exception as exc:  # noqa: BLE001 - browser may already be gone
+            logger.debug("Error closing browser: %s", exc)
+
+    async def _retire(self, entry: _Browser) -> None:
+        if not entry.retired:
+            entry.retired = True
+            logger.debug("Recycling browser after %s renders", entry.renders)
+            await self._launch()
+        if entry.busy == 0 and entry in self._live:
+            await self._close_browser(entry)
+
+    async def _replace_page(self, entry: _Browser, page: Any) -> Any:
+        try:
+            await page.close()
+        except Exception as exc:  # noqa: BLE001 - page may be wedged
+            logger.debug("Error closing page: %s", exc)
+        new_page = await entry.browser.newPage()
+        entry.pages[entry.pages.index(page)] = new_page
+        return new_page
+
+    @asynccontextmanager
+    async def page(self) -> AsyncIterator[Any]:
+        """Check out a tab; it goes back to the pool when the block exits."""
+        await self._ensure_started()
+        while True:
+            entry, page = await self._idle.get()
+            if entry.retired:
+                continue
+            if entry.alive():
+                break
+            logger.warning("Browser crashed, relaunching")
+            await self._retire(entry)
+        entry.busy += 1
+        ok = False
+        try:
+            yield page
+            ok = True
+        finally:
+            entry.busy -= 1
+            entry.renders += 1
+            if not entry.alive():
+                await self._retire(entry)
+            elif not ok and not entry.retired:
+                try:
+                    page = await self._replace_page(entry, page)
+                except Exception:  # noqa: BLE001 - treat as a crashed browser
+                    await self._retire(entry)
+            if entry.renders >= self.max_renders:
+                await self._retire(entry)
+            if entry.retired:
+                if entry.busy == 0 and entry in self._live:
+                    await self._close_browser(entry)
+            else:
+                self._idle.put_nowait((entry, page))
+
+    async def render_pdf(self, url: str, path: str) -> None:
+        async with self.page() as page:
+            async with asyncio.timeout(self.render_timeout):
+                await page.goto(url, {"waitUntil": "networkidle2"})
+                await page.pdf({"path": path, "printBackground": True})
+
+    async def render_html(self, html: str, path: str) -> None:
+        """Render markup already in hand; the tab makes no network requests."""
+        async with self.page() as page:
+            async with asyncio.timeout(self.render_timeout):
+                if page not in self._offline:
+                    page.on("request", _block_request)
+                    self._offline.add(page)
+                await page.setRequestInterception(True)
+                try:
+                    await page.setContent(html)
+                    await page.pdf({"path": path, "printBackground": True})
+                finally:
+                    await page.setRequestInterception(False)
+
+    async def close(self) -> None:
+        for entry in list(self._live):
+            await self._close_browser(entry)
+        self._started = False
@@ -3,16 +3,40 @@ from __future__ import annotations
 import logging
 import os
 from pathlib import Path
-from dotenv import load_dotenv
 
-load_dotenv()
-
-DATA_DIR = Path(__file__).resolve().parent.parent / "data_raw"
-DATA_DIR.mkdir(exist_ok=True)
+# Importing this module has no side effects; command-line entry points call
+# configure() to load .env, set up logging and create the data directory.
+DEFAULT_DATA_DIR = Path(__file__).resolve().parent.parent / "data_raw"
+DATA_DIR = DEFAULT_DATA_DIR
 MANIFEST = DATA_DIR / "sources.csv"
 
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
 
-LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
-logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s [%(levelname)s] %(message)s")
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
 logger = logging.getLogger(__name__)
+
+
+def configure(
+    data_dir: Path | None = None,
+    env_file: Path | None = None,
+    log_level: str | None = None,
+) -> None:
+    """Resolve settings for a command-line run.
+
+    Loads ``.env`` (or ``env_file``), configures root logging from
+    ``log_level`` or ``LOG_LEVEL`` and creates the data directory, moved to
+    ``data_dir`` if given. Library users can skip this and set the module
+    attributes directly.
+    """
+    global DATA_DIR, MANIFEST, GITHUB_TOKEN
+
+    from dotenv import load_dotenv
+
+    load_dotenv(env_file)
+    level = (log_level or os.getenv("LOG_LEVEL") or "INFO").upper()
+    logging.basicConfig(level=level, format=LOG_FORMAT)
+    if data_dir is not None:
+        DATA_DIR = data_dir
+        MANIFEST = DATA_DIR / "sources.csv"
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import importlib.util
+from collections.abc import Iterable
+from dataclasses import dataclass
+from pathlib import PurePosixPath
+from types import SimpleNamespace, TracebackType
+from typing import Any
+from urllib.parse import urlparse
+
+import aiohttp
+
+from .config import logger
+from .telemetry import gauge_fn
+
+# Resolved addresses are kept this long (aiohttp's default is 10 s).
+DNS_TTL = 300
+# Idle connections stay open this long for the next request to the host.
+KEEPALIVE = 60.0
+PER_HOST = 32
+
+# A stalled read means a hung connection; only small responses get an
+# overall deadline, as multi-megabyte PDFs may legitimately take minutes.
+# Repository tarballs share the urdf session but drop its deadline
+# (github_bulk.stream_timeout).
+DEFAULT_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_connect=15, sock_read=60)
+TIMEOUTS = {
+    "urdf": aiohttp.ClientTimeout(total=120, sock_connect=10, sock_read=30),
+    "pages": aiohttp.ClientTimeout(total=60, sock_connect=10, sock_read=30),
+    "vendor": DEFAULT_TIMEOUT,
+    "standards": DEFAULT_TIMEOUT,
+}
+
+# Already compressed: asking for the identity encoding keeps Content-Length
+# exact, which short-transfer checks and Range resumes rely on.
+IDENTITY_SUFFIXES = {
+    ".pdf", ".zip", ".gz", ".tgz", ".xz", ".bz2", ".7z",
+    ".png", ".jpg", ".jpeg", ".webp", ".stl", ".step", ".stp", ".glb",
+}
+
+
+def have_brotli() -> bool:
+    """Whether aiohttp can decode ``br`` (the optional Brotli package is installed)."""
+    return any(importlib.util.find_spec(m) for m in ("brotli", "brotlicffi"))
+
+
+def text_encodings() -> str:
+    return "gzip, deflate, br" if have_brotli() else "gzip, deflate"
+
+
+def accept_encoding(url: str) -> str:
+    """The ``Accept-Encoding`` to send for ``url``."""
+    suffix = PurePosixPath(urlparse(url).path).suffix.lower()
+    return "identity" if suffix in IDENTITY_SUFFIXES else text_encodings()
+
+
+@dataclass
+class ConnectionStats:
+    requests: int = 0
+    opened: int = 0
+    reused: int = 0
+    dns_lookups: int = 0
+    dns_cached: int = 0
+
+    @property
+    def reuse_ratio(self) -> float:
+        total = self.opened + self.reused
+        return self.reused / total if total else 0.0
+
+
+class Connections:
+    """The connection pool shared by every source, and a session per source.
+
+    One connector serves all sessions. It caches DNS answers for ``dns_ttl``
+    seconds and keeps idle connections alive for ``keepalive`` seconds, with
+    at most ``per_host`` connections to one host. Each source's session gets
+    its own timeouts from ``timeouts`` (default :data:`TIMEOUTS`), so a hung
+    connection fails its request instead of holding a worker forever.
+    Connection reuse is counted in :attr:`stats`.
+    """
+
+    def __init__(
+        self,
+        per_host: int = PER_HOST,
+        dns_ttl: int = DNS_TTL,
+        keepalive: float = KEEPALIVE,
+        timeouts: dict[str, aiohttp.ClientTimeout] | None = None,
+        trace_configs: Iterable[aiohttp.TraceConfig] = (),
+    ) -> None:
+        self.per_host = per_host
+        self.dns_ttl = dns_ttl
+        self.keepalive = keepalive
+        self.timeouts = TIMEOUTS if timeouts is None else timeouts
+        self.stats = ConnectionStats()
+        self.trace_configs = [*trace_configs, self._trace_config()]
+        self.connector: aiohttp.TCPConnector | None = None
+        self._sessions: dict[str, aiohttp.ClientSession] = {}
+
+    async def __aenter__(self) -> Connections:
+        self.connector = aiohttp.TCPConnector(
+            limit=0,
+            limit_per_host=self.per_host,
+            use_dns_cache=True,
+            ttl_dns_cache=self.dns_ttl,
+            keepalive_timeout=self.keepalive,
+        )
+        gauge_fn("connections_opened", lambda: self.stats.opened)
+        gauge_fn("connection_reuse_ratio", lambda: self.stats.reuse_ratio)
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        for session in self._sessions.values():
+            await session.close()
+        self._sessions.clear()
+        if self.connector is not None:
+            await self.connector.close()
+            self.connector = None
+        s = self.stats
+        logger.info(
+            "Connections: %s requests over %s new connections (%.0f%% reused), "
+            "%s DNS lookups (%s cached)",
+            s.requests,
+            s.opened,
+            100 * s.reuse_ratio,
+            s.dns_lookups + s.dns_cached,
+            s.dns_cached,
+        )
+
+    def session(self, source: str) -> aiohttp.ClientSession:
+        """The session ``source`` crawls with, on the shared connection pool."""
+        assert self.connector is not None, "connections are not open"
+        session = self._sessions.get(source)
+        if session is None:
+            session = self._sessions[source] = aiohttp.ClientSession(
+                connector=self.connector,
+                connector_owner=False,
+                timeout=self.timeouts.get(source, DEFAULT_TIMEOUT),
+                headers={"Accept-Encoding": text_encodings()},
+                trace_configs=self.trace_configs,
+            )
+        return session
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        trace = aiohttp.TraceConfig()
+        stats = self.stats
+
+        async def request_start(
+            session: Any, ctx: SimpleNamespace, params: Any
+        ) -> None:
+            stats.requests += 1
+
+        async def connection_created(
+            session: Any, ctx: SimpleNamespace, params: Any
+        ) -> None:
+            stats.opened += 1
+
+        async def connection_reused(
+            session: Any, ctx: SimpleNamespace, params: Any
+        ) -> None:
+            stats.reused += 1
+
+        async def dns_miss(session: Any, ctx: SimpleNamespace, params: Any) -> None:
+            stats.dns_lookups += 1
+
+        async def dns_hit(session: Any, ctx: SimpleNamespace, params: Any) -> None:
+            stats.dns_cached += 1
+
+        hooks: list[tuple[Any, Any]] = [
+            (trace.on_request_start, request_start),
+            (trace.on_connection_create_end, connection_created),
+            (trace.on_connection_reuseconn, connection_reused),
+            (trace.on_dns_cache_miss, dns_miss),
+            (trace.on_dns_cache_hit, dns_hit),
+        ]
+        for signal, callback in hooks:
+            signal.append(callback)
+        return trace
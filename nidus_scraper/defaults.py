@@ -0,0 +1,7 @@
+"""Defaults shared by the sources and the command line.
+
+Kept apart from the sources so that parsing arguments imports none of them.
+"""
+
+# Changed files in one repository at one commit before it is fetched as a tarball.
+BULK_THRESHOLD = 10
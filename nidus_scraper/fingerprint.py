@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import hashlib
+import html as htmllib
+import re
+from collections import Counter
+
+# Pages whose fingerprints differ in at most this many of 64 bits count as
+# the same content (unchanged since last time, or a near-duplicate). A small
+# edit moves a handful of bits; unrelated pages differ in about half of them.
+NEAR_DISTANCE = 6
+BANDS = 8
+BAND_BITS = 64 // BANDS
+# Fewer visible words than this (e.g. a script-only shell) gives no fingerprint.
+MIN_WORDS = 8
+SHINGLE = 3
+
+_INVISIBLE = re.compile(
+    r"<(script|style|noscript|template|svg)\b.*?</\1\s*>|<!--.*?-->",
+    re.IGNORECASE | re.DOTALL,
+)
+_TAG = re.compile(r"<[^>]*>")
+_WORD = re.compile(r"\w+")
+
+
+def visible_text(html: str) -> str:
+    """Text a reader would see: markup, scripts, styles and comments removed."""
+    text = _TAG.sub(" ", _INVISIBLE.sub(" ", html))
+    return " ".join(htmllib.unescape(text).split())
+
+
+def simhash(text: str) -> int | None:
+    """64-bit simhash of the word shingles of ``text``; ``None`` if too short."""
+    words = _WORD.findall(text.lower())
+    if len(words) < MIN_WORDS:
+        return None
+    shingles = {
+        " ".join(words[i : i + SHINGLE]) for i in range(len(words) - SHINGLE + 1)
+    }
+    digests = b"".join(
+        hashlib.blake2b(s.encode(), digest_size=8).digest() for s in shingles
+    )
+    # A bit is set when most shingle hashes have it set. Counting the values
+    # of each byte column first keeps the per-shingle work in C.
+    fingerprint = 0
+    for column in range(8):
+        ones = [0] * 8
+        for value, n in Counter(digests[column::8]).items():
+            for bit in range(8):
+                if value >> bit & 1:
+                    ones[bit] += n
+        for bit in range(8):
+            if 2 * ones[bit] > len(shingles):
+                fingerprint |= 1 << ((7 - column) * 8 + bit)
+    return fingerprint
+
+
+def page_fingerprint(html: str) -> int | None:
+    return simhash(visible_text(html))
+
+
+def distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class SimhashIndex:
+    """Find a stored fingerprint within :data:`NEAR_DISTANCE` bits of another.
+
+    Fingerprints are split into :data:`BANDS` bands; two fingerprints that
+    differ in fewer bits than there are bands agree exactly on at least one
+    band, so only keys sharing a band are compared.
+    """
+
+    def __init__(self) -> None:
+        self.fingerprints: dict[str, int] = {}
+        self._bands: list[dict[int, set[str]]] = [{} for _ in range(BANDS)]
+
+    def __len__(self) -> int:
+        return len(self.fingerprints)
+
+    @staticmethod
+    def _band_values(fingerprint: int) -> list[int]:
+        mask = (1 << BAND_BITS) - 1
+        return [fingerprint >> (i * BAND_BITS) & mask for i in range(BANDS)]
+
+    def add(self, key: str, fingerprint: int) -> None:
+        self.remove(key)
+        self.fingerprints[key] = fingerprint
+        for band, value in zip(self._bands, self._band_values(fingerprint)):
+            band.setdefault(value, set()).add(key)
+
+    def remove(self, key: str) -> None:
+        old = self.fingerprints.pop(key, None)
+        if old is None:
+            return
+        for band, value in zip(self._bands, self._band_values(old)):
+            band[value].discard(key)
+
+    def near(self, fingerprint: int, exclude: str | None = None) -> str | None:
+        """A key whose fingerprint is closest to ``fingerprint``, if near enough."""
+        best: tuple[int, str] | None = None
+        for band, value in zip(self._bands, self._band_values(fingerprint)):
+            for key in band.get(value, ()):
+                if key == exclude:
+                    continue
+                d = distance(fingerprint, self.fingerprints[key])
+                if d <= NEAR_DISTANCE and (best is None or (d, key) < best):
+                    best = (d, key)
+        return best[1] if best else None
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+TRACKING_PARAMS = {
+    "gclid", "fbclid", "msclkid", "mc_cid", "mc_eid", "_ga", "_gl", "ref"
+}
+TRACKING_PREFIXES = ("utm_", "hsa_", "pk_")
+# Path prefixes that serve a site's default content under another name.
+LOCALE_ALIASES = {"en", "en-us", "en_us", "en-gb", "us", "int", "global"}
+INDEX_PAGES = {"index.html", "index.htm", "index.php", "default.aspx"}
+
+
+def normalize_url(url: str) -> str:
+    """Normal form of ``url``.
+
+    Lower-cases scheme and host, drops default ports, fragments and trailing
+    slashes, and sorts query parameters.
+    """
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    path = parts.path.rstrip("/") or "/"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+def is_tracking_param(name: str) -> bool:
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+
+def strip_tracking(url: str) -> str:
+    """:func:`normalize_url` without tracking parameters; still fetchable as is."""
+    parts = urlsplit(normalize_url(url))
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    kept = urlencode([(k, v) for k, v in query if not is_tracking_param(k)])
+    return urlunsplit(parts._replace(query=kept))
+
+
+def canonical_url(url: str) -> str:
+    """Identity of the page behind ``url``, for de-duplication only.
+
+    On top of :func:`strip_tracking`, ``www.``, default-locale path prefixes
+    (``/en-us/``) and index documents are dropped, so aliases of one page
+    share a key. The result is not necessarily a URL the site serves.
+    """
+    parts = urlsplit(strip_tracking(url))
+    host = parts.netloc.removeprefix("www.")
+    segments = [s for s in parts.path.split("/") if s]
+    if segments and segments[0].lower() in LOCALE_ALIASES:
+        segments = segments[1:]
+    if segments and segments[-1].lower() in INDEX_PAGES:
+        segments = segments[:-1]
+    path = "/" + "/".join(segments)
+    return urlunsplit((parts.scheme, host, path, parts.query, ""))
+
+
+class Frontier:
+    """Priority-ordered, concurrent crawl of one site.
+
+    URLs are fetched best-score first by ``fetchers`` concurrent workers.
+    ``max_depth`` and ``max_pages`` are exact: a page is only counted while
+    the budget has room, and fetching stops as soon as it is spent.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str], Awaitable[str]],
+        extract_links: Callable[[str, str], Awaitable[Iterable[str]]],
+        follow: Callable[[str], bool],
+        is_target: Callable[[str], bool],
+        score: Callable[[str], int],
+        max_depth: int = 2,
+        max_pages: int = 30,
+        fetchers: int = 4,
+    ) -> None:
+        self.fetch = fetch
+        self.extract_links = extract_links
+        self.follow = follow
+        self.is_target = is_target
+        self.score = score
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.fetchers = fetchers
+        self.visited: set[str] = set()
+        self.pages: set[str] = set()
+        self._heap: list[tuple[int, int, str, int]] = []
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._cond = asyncio.Condition()
+
+    def _push(self, url: str, depth: int) -> None:
+        url = strip_tracking(url)
+        key = canonical_url(url)
+        if key in self.visited or depth > self.max_depth:
+            return
+        self.visited.add(key)
+        # Lower sorts first: many keyword hits and shallow depth win.
+        priority = depth - self.score(url)
+        heapq.heappush(self._heap, (priority, next(self._seq), url, depth))
+
+    def _exhausted(self) -> bool:
+        return len(self.pages) >= self.max_pages
+
+    async def _next(self) -> tuple[str, int] | None:
+        async with self._cond:
+            while not self._heap and self._in_flight and not self._exhausted():
+                await self._cond.wait()
+            if not self._heap or self._exhausted():
+                self._cond.notify_all()
+                return None
+            _, _, url, depth = heapq.heappop(self._heap)
+            self._in_flight += 1
+            return url, depth
+
+    async def _worker(self, out: asyncio.Queue[tuple[str, str] | None]) -> None:
+        while (job := await self._next()) is not None:
+            url, depth = job
+            try:
+                html = await self.fetch(url)
+                if html and self.is_target(url) and not self._exhausted():
+                    self.pages.add(url)
+                    await out.put((url, html))
+                if html and depth < self.max_depth:
+                    for link in await self.extract_links(html, url):
+                        if self.follow(link):
+                            self._push(link, depth + 1)
+            finally:
+                async with self._cond:
+                    self._in_flight -= 1
+                    self._cond.notify_all()
+
+    async def crawl(self, seeds: Iterable[str]) -> AsyncIterator[tuple[str, str]]:
+        """Yield ``(url, html)`` for each target page as soon as it is fetched."""
+        for seed in seeds:
+            self._push(seed, 0)
+        out: asyncio.Queue[tuple[str, str] | None] = asyncio.Queue()
+
+        async def run() -> None:
+            try:
+                await asyncio.gather(*(self._worker(out) for _ in range(self.fetchers)))
+            finally:
+                await out.put(None)
+
+        task = asyncio.create_task(run())
+        try:
+            while (found := await out.get()) is not None:
+                yield found
+            await task
+        finally:
+            task.cancel()
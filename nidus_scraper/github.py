@@ -1,72 +1,497 @@
 from __future__ import annotations
 
 import asyncio
-from datetime import datetime, timedelta
+import time
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from collections.abc import AsyncIterator, Mapping
 from pathlib import Path
 from aiohttp import ClientSession
 from typing import Any, Dict
+from urllib.parse import unquote, urlparse
 
-from .config import DATA_DIR, GITHUB_TOKEN, logger
-from .utils import retry, save_file, update_manifest
+from . import analysis, blobs, config, sharding
+from .blobs import repo_path
+from .config import logger
+from .defaults import BULK_THRESHOLD
+from .github_bulk import (
+    CODELOAD_URL,
+    Extracted,
+    fetch_tarball,
+    git_blob_sha,
+    tarball_url,
+)
+from .jobs import run_jobs
+from .manifest import GitHubBlob, using
+from .scheduler import slot
+from .telemetry import count, stage
+from .utils import DownloadResult, fetch_to_file, retry, update_manifest
 
 SEARCH_URL = "https://api.github.com/search/code"
-HEADERS = {"Accept": "application/vnd.github.v3+json"}
-if GITHUB_TOKEN:
-    HEADERS["Authorization"] = f"token {GITHUB_TOKEN}"
+ACCEPT = "application/vnd.github.v3+json"
 
 EXTENSIONS = ["urdf", "sdf", "xacro"]
 
+PER_PAGE = 100
+# Code search never returns more than 1000 results for a single query.
+SEARCH_CAP = 1000
+# Files larger than 384 KB are not indexed by code search.
+MAX_INDEXED_SIZE = 384 * 1024
+# Size ranges per extension that sharded crawls divide between them. They grow
+# geometrically from SMALLEST_SLICE bytes, as most descriptions are a few KB.
+SEARCH_SLICES = 64
+SMALLEST_SLICE = 64
+RATE_LIMIT_ATTEMPTS = 5
+SECONDARY_LIMIT_BACKOFF = 60.0
 
-async def fetch_search_page(session: ClientSession, ext: str, page: int) -> Dict[str, Any]:
-    params = {"q": f"extension:{ext} stars:>5", "page": str(page), "per_page": "100"}
-    async with session.get(SEARCH_URL, params=params, headers=HEADERS) as resp:
-        resp.raise_for_status()
-        data = await resp.json()
-        assert isinstance(data, dict)
-        return data
+
+def api_headers() -> dict[str, str]:
+    headers = {"Accept": ACCEPT}
+    if config.GITHUB_TOKEN:
+        headers["Authorization"] = f"token {config.GITHUB_TOKEN}"
+    return headers
+
+
+class RateLimiter:
+    """Pace GitHub API requests from the rate-limit headers of past responses.
+
+    Requests are spread evenly over what is left of the current window, and
+    ``Retry-After`` or an exhausted window blocks every caller until it ends.
+    """
+
+    def __init__(self, concurrency: int = 4) -> None:
+        self._sem = asyncio.Semaphore(concurrency)
+        self._lock = asyncio.Lock()
+        self._remaining: int | None = None
+        self._reset_at = 0.0
+        self._blocked_until = 0.0
+        self._next_at = 0.0
+
+    async def __aenter__(self) -> None:
+        await self._sem.acquire()
+        try:
+            async with self._lock:
+                await self._wait_turn()
+        except BaseException:
+            self._sem.release()
+            raise
+
+    async def __aexit__(self, *exc: object) -> None:
+        self._sem.release()
+
+    async def _wait_turn(self) -> None:
+        now = time.time()
+        start = max(now, self._blocked_until, self._next_at)
+        exhausted = self._remaining is not None and self._remaining <= 0
+        if exhausted and self._reset_at > start:
+            start = self._reset_at
+        if self._remaining and self._reset_at > start:
+            interval = (self._reset_at - start) / self._remaining
+            self._next_at = start + interval
+            self._remaining -= 1
+        if start > now:
+            logger.debug("GitHub rate limit: waiting %.1fs", start - now)
+            await asyncio.sleep(start - now)
+
+    def update(self, status: int, headers: Mapping[str, str], body: str = "") -> bool:
+        """Record rate-limit state from a response; return True if it was throttled."""
+        now = time.time()
+        if "X-RateLimit-Remaining" in headers:
+            self._remaining = int(headers["X-RateLimit-Remaining"])
+        if "X-RateLimit-Reset" in headers:
+            self._reset_at = float(headers["X-RateLimit-Reset"])
+        if status not in (403, 429):
+            return False
+        if "Retry-After" in headers:
+            retry_after = float(headers["Retry-After"])
+            self._blocked_until = max(self._blocked_until, now + retry_after)
+        elif self._remaining == 0:
+            self._blocked_until = max(self._blocked_until, self._reset_at)
+        elif status == 429 or "rate limit" in body.lower():
+            self._blocked_until = max(
+                self._blocked_until, now + SECONDARY_LIMIT_BACKOFF
+            )
+        else:
+            return False
+        logger.warning(
+            "GitHub rate limited (%s), pausing %.0fs", status, self._blocked_until - now
+        )
+        return True
+
+
+async def fetch_search_page(
+    session: ClientSession, query: str, page: int, limiter: RateLimiter
+) -> Dict[str, Any]:
+    params = {"q": query, "page": str(page), "per_page": str(PER_PAGE)}
+    for _ in range(RATE_LIMIT_ATTEMPTS):
+        async with limiter, slot(SEARCH_URL):
+            with stage("search"):
+                async with session.get(
+                    SEARCH_URL, params=params, headers=api_headers()
+                ) as resp:
+                    body = await resp.text() if resp.status in (403, 429) else ""
+                    if limiter.update(resp.status, resp.headers, body):
+                        continue
+                    resp.raise_for_status()
+                    data = await resp.json()
+                    assert isinstance(data, dict)
+                    return data
+    raise RuntimeError(
+        f"GitHub search still rate limited after {RATE_LIMIT_ATTEMPTS} tries"
+    )
+
+
+def search_query(ext: str, lo: int, hi: int) -> str:
+    return f"extension:{ext} stars:>5 size:{lo}..{hi}"
+
+
+def search_slices() -> list[tuple[int, int]]:
+    """``SEARCH_SLICES`` disjoint ``(lo, hi)`` ranges covering every indexed size."""
+    ratio = (MAX_INDEXED_SIZE / SMALLEST_SLICE) ** (1 / (SEARCH_SLICES - 1))
+    slices = []
+    lo = 0
+    for k in range(SEARCH_SLICES):
+        last = k == SEARCH_SLICES - 1
+        hi = MAX_INDEXED_SIZE if last else round(SMALLEST_SLICE * ratio**k)
+        slices.append((lo, hi))
+        lo = hi + 1
+    return slices
+
+
+def search_roots() -> list[tuple[str, int, int]]:
+    """The ``(extension, lo, hi)`` ranges the current shard searches.
+
+    Unsharded, that is every extension at every size. Sharded, each extension
+    is cut into :func:`search_slices` and slice ``i`` goes to shard
+    ``i % N``. Neighbouring slices hold similar numbers of files, so every
+    shard gets about the same share of the search and the downloads, and the
+    shards share one search quota instead of each spending all of it.
+    """
+    shard = sharding.current()
+    if shard is None:
+        return [(ext, 0, MAX_INDEXED_SIZE) for ext in EXTENSIONS]
+    return [
+        (ext, lo, hi)
+        for ext in EXTENSIONS
+        for i, (lo, hi) in enumerate(search_slices())
+        if shard.owns_slot(i)
+    ]
+
+
+@dataclass
+class SearchReport:
+    """Queries a code search could not fully cover.
+
+    Only a complete search shows which files disappeared upstream.
+    """
+
+    failed: list[str] = field(default_factory=list)
+    truncated: list[str] = field(default_factory=list)
+    incomplete: list[str] = field(default_factory=list)
+
+    @property
+    def complete(self) -> bool:
+        return not (self.failed or self.truncated or self.incomplete)
+
+
+async def search_items(
+    session: ClientSession,
+    limiter: RateLimiter | None = None,
+    report: SearchReport | None = None,
+) -> AsyncIterator[dict[str, Any]]:
+    """Yield every code-search hit for ``EXTENSIONS`` in :func:`search_roots`.
+
+    Queries that match more than ``SEARCH_CAP`` files are split into disjoint
+    ``size:`` ranges until each shard fits under the cap; shards are fetched
+    concurrently, paced by ``limiter``. A failed shard or page does not stop
+    the others; it is recorded in ``report``, as are shards still over the cap
+    and responses GitHub marks as incomplete.
+    """
+    limiter = limiter or RateLimiter()
+    report = report if report is not None else SearchReport()
+    queue: asyncio.Queue[list[dict[str, Any]] | None] = asyncio.Queue()
+
+    async def page_items(query: str, page: int) -> None:
+        try:
+            result = await fetch_search_page(session, query, page, limiter)
+        except Exception as exc:  # noqa: BLE001 - keep other shards going
+            logger.warning("Search %r page %s failed: %s", query, page, exc)
+            report.failed.append(f"{query} page {page}")
+            return
+        if result.get("incomplete_results"):
+            report.incomplete.append(f"{query} page {page}")
+        await queue.put(result.get("items", []))
+
+    async def explore(ext: str, lo: int, hi: int) -> None:
+        query = search_query(ext, lo, hi)
+        try:
+            first = await fetch_search_page(session, query, 1, limiter)
+        except Exception as exc:  # noqa: BLE001 - keep other shards going
+            logger.warning("Search %r failed: %s", query, exc)
+            report.failed.append(query)
+            return
+        items = first.get("items", [])
+        total = int(first.get("total_count", len(items)))
+        if total > SEARCH_CAP and hi > lo:
+            mid = (lo + hi) // 2
+            await asyncio.gather(explore(ext, lo, mid), explore(ext, mid + 1, hi))
+            return
+        if total > SEARCH_CAP:
+            logger.warning(
+                "Search %r has %s hits, only %s reachable", query, total, SEARCH_CAP
+            )
+            report.truncated.append(query)
+        if first.get("incomplete_results"):
+            logger.warning("Search %r returned incomplete results", query)
+            report.incomplete.append(query)
+        logger.info("Search %r: %s hits", query, total)
+        await queue.put(items)
+        pages = min(-(-total // PER_PAGE), SEARCH_CAP // PER_PAGE)
+        await asyncio.gather(*(page_items(query, p) for p in range(2, pages + 1)))
+
+    async def produce() -> None:
+        try:
+            await asyncio.gather(*(explore(*root) for root in search_roots()))
+        finally:
+            await queue.put(None)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while (batch := await queue.get()) is not None:
+            for item in batch:
+                yield item
+        await producer
+    finally:
+        producer.cancel()
 
 
 def raw_url(html_url: str) -> str:
     return html_url.replace("github.com/", "raw.githubusercontent.com/").replace("/blob/", "/")
 
 
+def repo_name(item: dict[str, Any]) -> str:
+    repo = item.get("repository") or {}
+    if "full_name" in repo:
+        return str(repo["full_name"])
+    owner, name = urlparse(item["html_url"]).path.strip("/").split("/")[:2]
+    return f"{owner}/{name}"
+
+
+def item_dest(item: dict[str, Any]) -> Path:
+    return repo_path(config.DATA_DIR / "github", repo_name(item), item["path"])
+
+
 async def download_file(session: ClientSession, url: str, dest: Path) -> None:
-    async def _get() -> bytes:
-        headers = {
-            "If-Modified-Since": (datetime.utcnow() - timedelta(days=1)).strftime(
-                "%a, %d %b %Y %H:%M:%S GMT"
-            )
-        }
-        async with session.get(url, headers=headers) as resp:
-            if resp.status == 304:
-                logger.info("Not modified: %s", url)
-                return b""
-            resp.raise_for_status()
-            return await resp.read()
-
-    content = await retry(_get)
-    if content:
-        await save_file(dest, content)
-        await update_manifest(dest, url)
+    result: DownloadResult | None = await retry(
+        lambda: fetch_to_file(session, url, dest), url=url
+    )
+    if result is not None:
+        await update_manifest(dest, url, result.sha256)
+        await analysis.submit(dest, result.sha256)
         logger.info("Saved %s", dest)
 
 
-async def crawl_github(session: ClientSession, workers: int = 32) -> None:
-    tasks: list[asyncio.Task[None]] = []
-    sem = asyncio.Semaphore(workers)
-    for ext in EXTENSIONS:
-        for page in range(1, 11):
-            result = await fetch_search_page(session, ext, page)
-            items = result.get("items", [])
-            if not items:
-                break
-            for item in items:
-                url = raw_url(item["html_url"])
-                path = DATA_DIR / "github" / Path(item["path"]).name
-
-                async def worker(u: str = url, p: Path = path) -> None:
-                    async with sem:
-                        await download_file(session, u, p)
-
-                tasks.append(asyncio.create_task(worker()))
-    await asyncio.gather(*tasks)
+def file_url(repo: str, ref: str, path: str) -> str:
+    return raw_url(f"https://github.com/{repo}/blob/{ref}/{path}")
+
+
+def url_key(url: str) -> tuple[str, str] | None:
+    """The ``(repo, path)`` a raw file URL from :func:`file_url` points at."""
+    parts = urlparse(url).path.strip("/").split("/", 3)
+    return (f"{parts[0]}/{parts[1]}", unquote(parts[3])) if len(parts) == 4 else None
+
+
+def item_ref(item: dict[str, Any]) -> str | None:
+    """The commit or branch an item's ``html_url`` points at."""
+    parts = urlparse(item["html_url"]).path.strip("/").split("/")
+    return parts[3] if len(parts) > 4 and parts[2] == "blob" else None
+
+
+async def download_tarball(
+    session: ClientSession, repo: str, ref: str, meshes: bool = False
+) -> list[Extracted]:
+    root = repo_path(config.DATA_DIR / "github", repo, "")
+    extracted: list[Extracted] = await retry(
+        lambda: fetch_tarball(session, repo, ref, root, EXTENSIONS, meshes),
+        url=tarball_url(repo, ref),
+    )
+    for e in extracted:
+        await update_manifest(e.dest, file_url(repo, ref, e.path), e.sha256)
+        await analysis.submit(e.dest, e.sha256)
+    return extracted
+
+
+async def crawl_github(
+    session: ClientSession,
+    workers: int = 32,
+    bulk_threshold: int = BULK_THRESHOLD,
+    meshes: bool = False,
+) -> None:
+    """Sync every matching file from code search into ``DATA_DIR/github``.
+
+    Search results carry the git blob sha of each file. Paths whose recorded
+    blob sha still matches, and whose content is still stored, are skipped
+    without a request. Paths that no longer show up are reported and dropped
+    from the index (their files are kept), but only after a search in which
+    no query failed, hit the cap or came back incomplete.
+
+    Once ``bulk_threshold`` changed files are found in one repository at one
+    commit, the rest of that repository is fetched as a single streamed
+    tarball instead of file by file (``0`` disables this); later hits in it
+    are taken from that tarball too. ``meshes`` also
+    keeps the mesh files the extracted descriptions reference. Repositories
+    below the threshold are downloaded file by file when discovery ends.
+
+    A shard downloads what its slices of the search find. It cannot tell
+    removals on its own; it records what it saw for the merge step instead
+    (:func:`nidus_scraper.sharding.remove_unseen_github_blobs`).
+    """
+    async with using() as manifest:
+        known = await manifest.github_blobs()
+    synced: dict[str, GitHubBlob] = {}
+    seen: set[tuple[str, str]] = set()
+    # Hits per (repo, ref) waiting to see whether the repository is dense.
+    pending: dict[tuple[str, str], list[tuple[str, Path]]] = {}
+    bulk: dict[tuple[str, str], set[str]] = {}
+    # Searchable files of every (repo, ref) whose tarball has been extracted.
+    tarred: dict[tuple[str, str], set[str]] = {}
+    unchanged = 0
+    complete = False
+    report = SearchReport()
+    url_shas: dict[str, str] | None = None
+
+    async def stored(dest: Path, url: str) -> bool:
+        nonlocal url_shas
+        if dest.exists():
+            return True
+        # Packed files have no path of their own; look their content up instead.
+        if url_shas is None:
+            async with using() as manifest:
+                url_shas = await manifest.url_shas()
+        sha256 = url_shas.get(url)
+        return sha256 is not None and blobs.exists(sha256)
+
+    async def discover() -> AsyncIterator[tuple[str, Path]]:
+        nonlocal unchanged, complete
+        urls: set[str] = set()
+        async for item in search_items(session, report=report):
+            url = raw_url(item["html_url"])
+            key = (repo_name(item), item["path"])
+            if url in urls or key in seen:
+                continue
+            urls.add(url)
+            seen.add(key)
+            dest = item_dest(item)
+            previous = known.get(key)
+            if (
+                previous is not None
+                and previous.blob_sha == item.get("sha")
+                and await stored(dest, url)
+            ):
+                unchanged += 1
+                continue
+            if item.get("sha"):
+                synced[url] = GitHubBlob(*key, item["sha"], url, "")
+            ref = item_ref(item)
+            if not bulk_threshold or ref is None:
+                yield url, dest
+                continue
+            group = (key[0], ref)
+            if group in bulk:
+                bulk[group].add(url)
+                continue
+            if url in tarred.get(group, ()):
+                await record(url)
+                continue
+            hits = pending.setdefault(group, [])
+            hits.append((url, dest))
+            if len(hits) >= bulk_threshold:
+                bulk[group] = {u for u, _ in pending.pop(group)}
+                root = repo_path(config.DATA_DIR / "github", group[0], "")
+                yield tarball_url(*group), root
+        for hits in pending.values():
+            for job in hits:
+                yield job
+        complete = report.complete
+        if not complete:
+            logger.warning(
+                "GitHub search incomplete (%s failed, %s capped, %s incomplete "
+                "queries); not checking for removed files",
+                len(report.failed),
+                len(report.truncated),
+                len(report.incomplete),
+            )
+
+    async def record(url: str) -> None:
+        blob = synced.pop(url, None)
+        if blob is not None:
+            async with using() as manifest:
+                await manifest.put_github_blob(
+                    replace(blob, synced_at=datetime.utcnow().isoformat())
+                )
+
+    async def saved_blob(url: str, dest: Path) -> GitHubBlob | None:
+        key = url_key(url)
+        async with using() as manifest:
+            entry = await manifest.find_by_url(url)
+        if key is None or entry is None:
+            return None
+
+        def read() -> bytes:
+            with blobs.open_stored(dest, entry.sha256) as f:
+                return f.read()
+
+        return GitHubBlob(*key, git_blob_sha(await asyncio.to_thread(read)), url, "")
+
+    async def download(job: tuple[str, Path]) -> None:
+        url, dest = job
+        if urlparse(url).hostname != urlparse(CODELOAD_URL).hostname:
+            await download_file(session, url, dest)
+            if url not in synced:
+                # Jobs replayed on resume were not rediscovered; hash what was saved.
+                blob = await saved_blob(url, dest)
+                if blob is not None:
+                    synced[url] = blob
+            await record(url)
+            return
+        repo, ref = urlparse(url).path.strip("/").split("/tar.gz/")
+        extracted = await download_tarball(session, repo, ref, meshes)
+        fetched = {file_url(repo, ref, e.path) for e in extracted}
+        # Later hits in this repository are already on disk; see discover().
+        tarred[repo, ref] = {
+            file_url(repo, ref, e.path)
+            for e in extracted
+            if e.path.rpartition(".")[2] in EXTENSIONS
+        }
+        hits = bulk.pop((repo, ref), None)
+        if hits is None:
+            # A replayed tarball: its hits are the searchable files it held.
+            hits = set()
+            for e in extracted:
+                if e.path.rpartition(".")[2] in EXTENSIONS:
+                    hit = file_url(repo, ref, e.path)
+                    synced[hit] = GitHubBlob(repo, e.path, e.blob_sha, hit, "")
+                    hits.add(hit)
+        for hit in hits:
+            if hit in fetched:
+                await record(hit)
+            else:
+                logger.warning("%s was not in the tarball of %s@%s", hit, repo, ref)
+
+    await run_jobs("github", discover(), download, workers)
+    count("github_unchanged_total", unchanged)
+    logger.info("GitHub sync: %s unchanged files skipped", unchanged)
+    shard = sharding.current()
+    if shard is not None:
+        sharding.write_github_seen(shard, seen, complete)
+        return
+    if not complete:
+        return
+    removed = sorted(set(known) - seen)
+    for repo, path in removed:
+        logger.info("No longer in search results: %s/%s", repo, path)
+    if removed:
+        logger.warning("GitHub sync: %s files disappeared upstream", len(removed))
+        count("github_removed_total", len(removed))
+        async with using() as manifest:
+            await manifest.remove_github_blobs(removed)
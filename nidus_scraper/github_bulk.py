@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import re
+import tarfile
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+from typing import IO
+
+from aiohttp import ClientResponse, ClientSession, ClientTimeout
+
+from . import blobs
+from .config import logger
+from .scheduler import slot
+from .telemetry import stage
+from .utils import CHUNK_SIZE, store_file
+
+CODELOAD_URL = "https://codeload.github.com/{repo}/tar.gz/{ref}"
+MESH_EXTENSIONS = (".stl", ".dae", ".obj", ".ply")
+# package://pkg/meshes/a.stl, model://name/meshes/a.dae, file:///abs/a.stl or plain
+# paths
+MESH_REF = re.compile(
+    rb"""["'>]\s*(?:(?:package|model)://[^/"'<]+/|file://)?([^"'<>\s]+\.(?:stl|dae|obj|ply))\s*["'<]""",
+    re.IGNORECASE,
+)
+
+
+@dataclass(frozen=True)
+class Extracted:
+    path: str
+    dest: Path
+    sha256: str
+    blob_sha: str
+
+
+def tarball_url(repo: str, ref: str) -> str:
+    return CODELOAD_URL.format(repo=repo, ref=ref)
+
+
+def stream_timeout(session: ClientSession) -> ClientTimeout:
+    """``session``'s connect and read timeouts without its overall deadline.
+
+    A large repository can take minutes to download; only a stalled read
+    should fail it.
+    """
+    return ClientTimeout(
+        total=None,
+        sock_connect=session.timeout.sock_connect,
+        sock_read=session.timeout.sock_read,
+    )
+
+
+def git_blob_sha(data: bytes) -> str:
+    """The sha git would give ``data`` as a blob, as reported by code search."""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def mesh_references(data: bytes) -> set[str]:
+    """Mesh paths referenced by a URDF/SDF/xacro document, package prefix removed."""
+    refs = (m.group(1).decode(errors="replace") for m in MESH_REF.finditer(data))
+    return {
+        "/".join(p for p in ref.split("/") if p not in ("", ".", "..")) for ref in refs
+    }
+
+
+class _ResponseReader:
+    """Blocking file-like view of an aiohttp response body for a worker thread."""
+
+    def __init__(self, resp: ClientResponse, loop: asyncio.AbstractEventLoop) -> None:
+        self.resp = resp
+        self.loop = loop
+
+    def read(self, size: int = -1) -> bytes:
+        n = CHUNK_SIZE if size is None or size < 0 else size
+        future = asyncio.run_coroutine_threadsafe(self.resp.content.read(n), self.loop)
+        return future.result()
+
+
+def _spool(data: bytes, name: str) -> Path:
+    tmp = blobs.temp_path(prefix=f"{PurePosixPath(name).name}.")
+    tmp.write_bytes(data)
+    return tmp
+
+
+def extract_matching(
+    fileobj: IO[bytes],
+    root: Path,
+    wanted: Callable[[str], bool],
+    meshes: bool = False,
+) -> list[Extracted]:
+    """Extract files for which ``wanted(path)`` holds from a streamed ``.tar.gz``.
+
+    The archive is read front to back once (``r|gz``); nothing but the
+    extracted files touches the disk. Paths are relative to the repository
+    root. With ``meshes``, mesh files are held back until the end of the
+    archive and only those referenced by an extracted document are kept.
+    """
+    extracted: list[Extracted] = []
+    # Mesh files spooled to the blob store's tmp dir until we know they are used.
+    held: dict[str, tuple[Path, str]] = {}
+    references: set[str] = set()
+
+    def keep(path: str, tmp: Path, blob_sha: str) -> None:
+        dest = blobs.repo_path(root, "", path)
+        extracted.append(Extracted(path, dest, store_file(tmp, dest).sha256, blob_sha))
+
+    try:
+        with tarfile.open(fileobj=fileobj, mode="r|gz") as tar:
+            for member in tar:
+                if not member.isfile():
+                    continue
+                # Drop GitHub's "owner-repo-sha/" prefix.
+                parts = PurePosixPath(member.name).parts[1:]
+                if not parts or ".." in parts:
+                    continue
+                path = "/".join(parts)
+                is_mesh = meshes and path.lower().endswith(MESH_EXTENSIONS)
+                if not (wanted(path) or is_mesh):
+                    continue
+                f = tar.extractfile(member)
+                if f is None:
+                    continue
+                data = f.read()
+                if is_mesh and not wanted(path):
+                    held[path] = (_spool(data, path), git_blob_sha(data))
+                    continue
+                if meshes:
+                    references |= mesh_references(data)
+                keep(path, _spool(data, path), git_blob_sha(data))
+        for path in list(held):
+            if any(path == ref or path.endswith("/" + ref) for ref in references):
+                keep(path, *held.pop(path))
+    finally:
+        for tmp, _ in held.values():
+            tmp.unlink(missing_ok=True)
+    return extracted
+
+
+async def fetch_tarball(
+    session: ClientSession,
+    repo: str,
+    ref: str,
+    root: Path,
+    extensions: Iterable[str],
+    meshes: bool = False,
+) -> list[Extracted]:
+    """Stream ``repo`` at ``ref`` from codeload and extract the matching files."""
+    suffixes = tuple(f".{ext.lower()}" for ext in extensions)
+    url = tarball_url(repo, ref)
+    loop = asyncio.get_running_loop()
+    async with slot(url) as request:
+        with stage("fetch"):
+            async with session.get(url, timeout=stream_timeout(session)) as resp:
+                request.first_byte()
+                resp.raise_for_status()
+                extracted = await asyncio.to_thread(
+                    extract_matching,
+                    _ResponseReader(resp, loop),  # type: ignore[arg-type]
+                    root,
+                    lambda path: path.lower().endswith(suffixes),
+                    meshes,
+                )
+    logger.info("Extracted %s files from %s@%s", len(extracted), repo, ref)
+    return extracted
@@ -0,0 +1,271 @@
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+from collections.abc import AsyncIterable, AsyncIterator, Awaitable, Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar, Token
+from dataclasses import astuple, dataclass, replace
+from datetime import datetime
+from pathlib import Path
+from types import TracebackType
+from typing import Any, TypeVar
+
+from . import blobs, config
+from .config import logger
+from .pipeline import Pipeline
+
+T = TypeVar("T")
+
+PENDING = "pending"
+IN_FLIGHT = "in_flight"
+DONE = "done"
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    url TEXT PRIMARY KEY,
+    source TEXT NOT NULL,
+    dest TEXT NOT NULL,
+    state TEXT NOT NULL,
+    offset INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_source_state ON jobs (source, state);
+CREATE TABLE IF NOT EXISTS discovery (
+    source TEXT PRIMARY KEY,
+    finished_at TEXT NOT NULL
+);
+"""
+
+_current: ContextVar[JobStore | None] = ContextVar("jobs", default=None)
+
+
+@dataclass(frozen=True)
+class Job:
+    url: str
+    source: str
+    dest: str
+    state: str = PENDING
+    offset: int = 0
+    updated_at: str = ""
+
+
+def default_path() -> Path:
+    return config.MANIFEST.with_name("jobs.sqlite3")
+
+
+def current() -> JobStore | None:
+    return _current.get()
+
+
+class JobStore:
+    """Checkpointed record of discovered work and how far each job got.
+
+    State changes are coalesced in memory and flushed to SQLite every
+    ``flush_interval`` seconds, so a crash loses at most that much progress
+    and the affected jobs are simply redone.
+    """
+
+    def __init__(
+        self,
+        path: Path | None = None,
+        resume: bool = False,
+        flush_interval: float = 0.5,
+    ) -> None:
+        self.path = path or default_path()
+        self.resume = resume
+        self.flush_interval = flush_interval
+        self._dirty: dict[str, Job] = {}
+        self._pool = ThreadPoolExecutor(1, thread_name_prefix="jobs")
+        self._conn: sqlite3.Connection | None = None
+        self._flusher: asyncio.Task[None] | None = None
+        self._token: Token[JobStore | None] | None = None
+
+    async def __aenter__(self) -> JobStore:
+        await self.open()
+        self._token = _current.set(self)
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        if self._token is not None:
+            _current.reset(self._token)
+            self._token = None
+        await self.close()
+
+    async def _run(self, fn: Callable[[], T]) -> T:
+        return await asyncio.get_running_loop().run_in_executor(self._pool, fn)
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        return conn
+
+    async def open(self) -> None:
+        self._conn = await self._run(self._connect)
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def close(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        await self.flush()
+        if self._conn is not None:
+            await self._run(self._conn.close)
+            self._conn = None
+        self._pool.shutdown()
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self) -> None:
+        if not self._dirty or self._conn is None:
+            return
+        batch, self._dirty = list(self._dirty.values()), {}
+        conn = self._conn
+
+        def _write() -> None:
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO jobs"
+                    " (url, source, dest, state, offset, updated_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    [astuple(job) for job in batch],
+                )
+
+        await self._run(_write)
+
+    async def _query(self, sql: str, params: tuple[str, ...]) -> list[tuple[Any, ...]]:
+        conn = self._conn
+        assert conn is not None, "job store is not open"
+        return await self._run(lambda: conn.execute(sql, params).fetchall())
+
+    def update(self, job: Job, state: str, offset: int = 0) -> Job:
+        now = datetime.utcnow().isoformat()
+        job = replace(job, state=state, offset=offset, updated_at=now)
+        self._dirty[job.url] = job
+        return job
+
+    async def get(self, url: str) -> Job | None:
+        if url in self._dirty:
+            return self._dirty[url]
+        rows = await self._query(
+            "SELECT url, source, dest, state, offset, updated_at FROM jobs"
+            " WHERE url = ?",
+            (url,),
+        )
+        return Job(*rows[0]) if rows else None
+
+    async def unfinished(self, source: str) -> list[Job]:
+        await self.flush()
+        rows = await self._query(
+            "SELECT url, source, dest, state, offset, updated_at FROM jobs"
+            " WHERE source = ? AND state != ?",
+            (source, DONE),
+        )
+        return [Job(*row) for row in rows]
+
+    async def discovery_finished(self, source: str) -> bool:
+        rows = await self._query("SELECT 1 FROM discovery WHERE source = ?", (source,))
+        return bool(rows)
+
+    async def set_discovery_finished(self, source: str, finished: bool = True) -> None:
+        conn = self._conn
+        assert conn is not None, "job store is not open"
+
+        def _write() -> None:
+            with conn:
+                if finished:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO discovery VALUES (?, ?)",
+                        (source, datetime.utcnow().isoformat()),
+                    )
+                else:
+                    conn.execute("DELETE FROM discovery WHERE source = ?", (source,))
+
+        await self.flush()
+        await self._run(_write)
+
+    async def reset(self, source: str) -> None:
+        """Forget every job of ``source`` before a fresh (non-resumed) crawl."""
+        conn = self._conn
+        assert conn is not None, "job store is not open"
+        self._dirty = {u: j for u, j in self._dirty.items() if j.source != source}
+
+        def _write() -> None:
+            with conn:
+                conn.execute("DELETE FROM jobs WHERE source = ?", (source,))
+                conn.execute("DELETE FROM discovery WHERE source = ?", (source,))
+
+        await self._run(_write)
+
+
+async def run_jobs(
+    source: str,
+    discover: AsyncIterable[tuple[str, Path]] | Iterable[tuple[str, Path]],
+    handler: Callable[[tuple[str, Path]], Awaitable[None]],
+    workers: int,
+) -> None:
+    """Run ``source`` through a :class:`Pipeline`, checkpointing every job.
+
+    In resume mode unfinished jobs are replayed first, completed ones are
+    skipped, and discovery is not repeated once it has run to the end.
+    """
+    store = current()
+    if store is None:
+        await Pipeline(source, handler, workers).run(discover)
+        return
+    if not store.resume:
+        await store.reset(source)
+
+    async def items() -> AsyncIterator[tuple[str, Path]]:
+        replayed: set[str] = set()
+        if store.resume:
+            for job in await store.unfinished(source):
+                replayed.add(job.url)
+                yield job.url, Path(job.dest)
+            if await store.discovery_finished(source):
+                logger.info("%s: resuming %s unfinished jobs", source, len(replayed))
+                return
+        async for url, dest in _aiter(discover):
+            if url in replayed:
+                continue
+            known = await store.get(url)
+            if known is not None and known.state == DONE and store.resume:
+                continue
+            store.update(Job(url, source, str(dest)), PENDING)
+            yield url, dest
+        await store.set_discovery_finished(source)
+
+    async def handle(item: tuple[str, Path]) -> None:
+        url, dest = item
+        job = store.update(Job(url, source, str(dest)), IN_FLIGHT)
+        try:
+            await handler(item)
+        except BaseException:
+            partial = blobs.partial_path(url, dest)
+            store.update(job, FAILED, partial.stat().st_size if partial.exists() else 0)
+            raise
+        store.update(job, DONE)
+
+    await Pipeline(source, handle, workers).run(items())
+
+
+async def _aiter(items: AsyncIterable[T] | Iterable[T]) -> AsyncIterator[T]:
+    if isinstance(items, AsyncIterable):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
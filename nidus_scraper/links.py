@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import asyncio
+import atexit
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+from typing import Any
+
+from .telemetry import stage
+
+try:
+    from lxml import etree  # type: ignore
+except ImportError:  # pragma: no cover - optional fast path
+    etree = None
+
+BACKENDS = ("lxml", "html.parser") if etree is not None else ("html.parser",)
+DEFAULT_BACKEND = BACKENDS[0]
+# Documents larger than this are parsed in a worker process.
+PROCESS_THRESHOLD = 256 * 1024
+
+_pool: ProcessPoolExecutor | None = None
+
+
+class _AnchorParser(HTMLParser):
+    """Collect ``href`` values of ``<a>`` tags and ignore everything else."""
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.hrefs: list[str] = []
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        if tag != "a":
+            return
+        href = None
+        for name, value in attrs:
+            if name == "href":
+                href = value
+        if href:
+            self.hrefs.append(href)
+
+
+class _AnchorTarget:
+    """lxml parser target with the same contract as :class:`_AnchorParser`."""
+
+    def __init__(self) -> None:
+        self.hrefs: list[str] = []
+
+    def start(self, tag: str, attrib: dict[str, str]) -> None:
+        if tag == "a":
+            href = attrib.get("href")
+            if href:
+                self.hrefs.append(href)
+
+    def close(self) -> list[str]:
+        return self.hrefs
+
+
+def _hrefs_stdlib(html: str) -> list[str]:
+    parser = _AnchorParser()
+    parser.feed(html)
+    parser.close()
+    return parser.hrefs
+
+
+def _hrefs_lxml(html: str) -> list[str]:
+    if not html.strip():
+        return []
+    parser = etree.HTMLParser(target=_AnchorTarget())
+    parser.feed(html)
+    result: list[str] = parser.close()
+    return result
+
+
+_EXTRACTORS = {"html.parser": _hrefs_stdlib, "lxml": _hrefs_lxml}
+
+
+def anchor_hrefs(html: str, backend: str | None = None) -> list[str]:
+    """Return the raw ``href`` of every ``<a>`` tag in ``html``, in order."""
+    return _EXTRACTORS[backend or DEFAULT_BACKEND](html)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn"))
+        atexit.register(shutdown)
+    return _pool
+
+
+def shutdown() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+
+async def anchor_hrefs_async(html: str, backend: str | None = None) -> list[str]:
+    """Like :func:`anchor_hrefs`, but large documents never block the event loop."""
+    with stage("parse"):
+        if len(html) < PROCESS_THRESHOLD:
+            return anchor_hrefs(html, backend)
+        loop = asyncio.get_running_loop()
+        result: Any = await loop.run_in_executor(
+            _get_pool(), anchor_hrefs, html, backend
+        )
+        return list(result)
@@ -0,0 +1,503 @@
+from __future__ import annotations
+
+import asyncio
+import csv
+import sqlite3
+from collections.abc import AsyncIterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from contextvars import ContextVar, Token
+from dataclasses import astuple, dataclass
+from functools import partial
+from pathlib import Path
+from types import TracebackType
+from typing import Any, Callable, TypeVar
+
+from . import config
+from .config import logger
+
+T = TypeVar("T")
+
+CSV_HEADER = ["filename", "sha256", "source_url", "downloaded_at"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    filename TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    source_url TEXT NOT NULL,
+    downloaded_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_source_url ON files (source_url);
+CREATE INDEX IF NOT EXISTS files_sha256 ON files (sha256);
+CREATE TABLE IF NOT EXISTS validators (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    fetched_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS github_blobs (
+    repo TEXT NOT NULL,
+    path TEXT NOT NULL,
+    blob_sha TEXT NOT NULL,
+    url TEXT NOT NULL,
+    synced_at TEXT NOT NULL,
+    PRIMARY KEY (repo, path)
+);
+CREATE TABLE IF NOT EXISTS page_fingerprints (
+    canonical_url TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    simhash TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    fetched_at TEXT NOT NULL
+);
+"""
+
+_current: ContextVar[Manifest | None] = ContextVar("manifest", default=None)
+
+
+@dataclass(frozen=True)
+class ManifestEntry:
+    filename: str
+    sha256: str
+    source_url: str
+    downloaded_at: str
+
+
+@dataclass(frozen=True)
+class Validators:
+    """HTTP cache validators recorded from the last successful fetch of ``url``."""
+
+    url: str
+    etag: str | None
+    last_modified: str | None
+    size: int
+    sha256: str
+    fetched_at: str
+
+    def conditional_headers(self) -> dict[str, str]:
+        headers: dict[str, str] = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+@dataclass(frozen=True)
+class GitHubBlob:
+    """Git blob sha last saved for ``path`` in ``repo``."""
+
+    repo: str
+    path: str
+    blob_sha: str
+    url: str
+    synced_at: str
+
+
+@dataclass(frozen=True)
+class PageFingerprint:
+    """Simhash of a vendor page's visible text and the PDF that renders it.
+
+    Near-duplicates of an already rendered page point at that page's PDF.
+    """
+
+    canonical_url: str
+    url: str
+    simhash: str
+    filename: str
+    fetched_at: str
+
+
+_Record = ManifestEntry | Validators | GitHubBlob | PageFingerprint
+
+
+def default_path() -> Path:
+    return config.MANIFEST.with_suffix(".sqlite3")
+
+
+def current() -> Manifest | None:
+    """Return the manifest opened by the enclosing ``async with``, if any."""
+    return _current.get()
+
+
+@asynccontextmanager
+async def using() -> AsyncIterator[Manifest]:
+    """Yield the current manifest, or a short-lived one outside of a run."""
+    store = current()
+    if store is not None:
+        yield store
+        return
+    async with Manifest() as store:
+        yield store
+
+
+def _connect(path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    return conn
+
+
+class Manifest:
+    """SQLite manifest of downloaded files with an async facade.
+
+    Writes are queued and committed in batches by a single writer task, so
+    download workers never wait on disk. Lookups by URL or sha256 go through
+    indexes and also see entries that are still queued.
+    """
+
+    def __init__(
+        self,
+        path: Path | None = None,
+        export_csv: Path | None = None,
+        batch_size: int = 500,
+        flush_interval: float = 0.5,
+        seed: Path | None = None,
+    ) -> None:
+        self.path = path or default_path()
+        self.export_csv = export_csv
+        self.seed = seed
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: asyncio.Queue[_Record | None] = asyncio.Queue()
+        self._pending_urls: dict[str, ManifestEntry] = {}
+        self._pending_shas: dict[str, list[ManifestEntry]] = {}
+        self._pending_validators: dict[str, Validators] = {}
+        self._pending_blobs: dict[tuple[str, str], GitHubBlob] = {}
+        self._pending_pages: dict[str, PageFingerprint] = {}
+        # One thread per connection keeps sqlite access serialised without locks.
+        self._write_pool = ThreadPoolExecutor(1, thread_name_prefix="manifest-w")
+        self._read_pool = ThreadPoolExecutor(1, thread_name_prefix="manifest-r")
+        self._writer: asyncio.Task[None] | None = None
+        self._wconn: sqlite3.Connection | None = None
+        self._rconn: sqlite3.Connection | None = None
+        self._token: Token[Manifest | None] | None = None
+
+    async def __aenter__(self) -> Manifest:
+        await self.open()
+        self._token = _current.set(self)
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        if self._token is not None:
+            _current.reset(self._token)
+            self._token = None
+        await self.close()
+
+    async def _run(self, pool: ThreadPoolExecutor, fn: Callable[[], T]) -> T:
+        return await asyncio.get_running_loop().run_in_executor(pool, fn)
+
+    async def open(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._wconn = await self._run(self._write_pool, self._init_db)
+        self._rconn = await self._run(self._read_pool, lambda: _connect(self.path))
+        self._writer = asyncio.create_task(self._write_loop())
+
+    def _init_db(self) -> sqlite3.Connection:
+        conn = _connect(self.path)
+        conn.executescript(SCHEMA)
+        empty = conn.execute("SELECT 1 FROM files LIMIT 1").fetchone() is None
+        if empty and self.seed is not None and self.seed.exists():
+            self._import_db(conn, self.seed)
+        elif empty and self.export_csv is not None and self.export_csv.exists():
+            self._import_csv(conn, self.export_csv)
+        conn.commit()
+        return conn
+
+    @staticmethod
+    def _import_db(conn: sqlite3.Connection, path: Path) -> None:
+        """Start from a copy of another manifest, e.g. the merged one for a shard."""
+        conn.execute("ATTACH DATABASE ? AS seed", (str(path),))
+        for table in ("validators", "github_blobs", "page_fingerprints"):
+            conn.execute(f"INSERT OR REPLACE INTO {table} SELECT * FROM seed.{table}")
+        conn.execute(
+            "INSERT INTO files (filename, sha256, source_url, downloaded_at)"
+            " SELECT filename, sha256, source_url, downloaded_at FROM seed.files"
+            " ORDER BY id"
+        )
+        conn.commit()
+        conn.execute("DETACH DATABASE seed")
+        logger.info("Seeded manifest from %s", path)
+
+    @staticmethod
+    def _import_csv(conn: sqlite3.Connection, path: Path) -> None:
+        with open(path, newline="") as f:
+            rows = [r for r in csv.reader(f) if len(r) == 4 and r != CSV_HEADER]
+        conn.executemany(
+            "INSERT INTO files (filename, sha256, source_url, downloaded_at)"
+            " VALUES (?, ?, ?, ?)",
+            rows,
+        )
+        logger.info("Imported %s rows from %s", len(rows), path)
+
+    async def close(self) -> None:
+        try:
+            if self._writer is not None:
+                writer, self._writer = self._writer, None
+                if not writer.done():
+                    await self._queue.put(None)
+                # Raises the error that stopped the writer, if any.
+                await writer
+            if self.export_csv is not None and self._wconn is not None:
+                await self.write_csv(self.export_csv)
+        finally:
+            if self._wconn is not None:
+                await self._run(self._write_pool, self._wconn.close)
+            if self._rconn is not None:
+                await self._run(self._read_pool, self._rconn.close)
+            self._wconn = self._rconn = None
+            self._write_pool.shutdown()
+            self._read_pool.shutdown()
+
+    async def _put(self, record: _Record) -> None:
+        if self._writer is not None and self._writer.done():
+            # Nothing would commit this record; fail the caller instead.
+            self._writer.result()
+        await self._queue.put(record)
+
+    async def add(self, entry: ManifestEntry) -> None:
+        self._pending_urls[entry.source_url] = entry
+        self._pending_shas.setdefault(entry.sha256, []).append(entry)
+        await self._put(entry)
+
+    async def put_validators(self, validators: Validators) -> None:
+        self._pending_validators[validators.url] = validators
+        await self._put(validators)
+
+    async def put_github_blob(self, blob: GitHubBlob) -> None:
+        self._pending_blobs[blob.repo, blob.path] = blob
+        await self._put(blob)
+
+    async def github_blobs(self) -> dict[tuple[str, str], GitHubBlob]:
+        """Every recorded GitHub blob, keyed by ``(repo, path)``."""
+        conn = self._rconn
+        assert conn is not None, "manifest is not open"
+        rows = await self._run(
+            self._read_pool,
+            lambda: conn.execute(
+                "SELECT repo, path, blob_sha, url, synced_at FROM github_blobs"
+            ).fetchall(),
+        )
+        blobs = {(r[0], r[1]): GitHubBlob(*r) for r in rows}
+        blobs.update(self._pending_blobs)
+        return blobs
+
+    async def put_page_fingerprint(self, page: PageFingerprint) -> None:
+        self._pending_pages[page.canonical_url] = page
+        await self._put(page)
+
+    async def page_fingerprints(self) -> dict[str, PageFingerprint]:
+        """Every recorded vendor page fingerprint, keyed by canonical URL."""
+        conn = self._rconn
+        assert conn is not None, "manifest is not open"
+        rows = await self._run(
+            self._read_pool,
+            lambda: conn.execute(
+                "SELECT canonical_url, url, simhash, filename, fetched_at"
+                " FROM page_fingerprints"
+            ).fetchall(),
+        )
+        pages = {r[0]: PageFingerprint(*r) for r in rows}
+        pages.update(self._pending_pages)
+        return pages
+
+    async def remove_github_blobs(self, keys: list[tuple[str, str]]) -> None:
+        await self.flush()
+        conn = self._wconn
+        assert conn is not None, "manifest is not open"
+
+        def _delete() -> None:
+            with conn:
+                conn.executemany(
+                    "DELETE FROM github_blobs WHERE repo = ? AND path = ?", keys
+                )
+
+        await self._run(self._write_pool, _delete)
+
+    async def get_validators(self, url: str) -> Validators | None:
+        if url in self._pending_validators:
+            return self._pending_validators[url]
+        conn = self._rconn
+        assert conn is not None, "manifest is not open"
+        row = await self._run(
+            self._read_pool,
+            lambda: conn.execute(
+                "SELECT url, etag, last_modified, size, sha256, fetched_at"
+                " FROM validators WHERE url = ?",
+                (url,),
+            ).fetchone(),
+        )
+        return Validators(*row) if row else None
+
+    async def flush(self) -> None:
+        """Wait until every queued entry has been committed.
+
+        If the writer failed, its error is raised instead of waiting forever.
+        """
+        writer = self._writer
+        if writer is None:
+            return
+        joined = asyncio.create_task(self._queue.join())
+        try:
+            await asyncio.wait({joined, writer}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            joined.cancel()
+        if writer.done():
+            writer.result()
+
+    async def _write_loop(self) -> None:
+        stop = False
+        while not stop:
+            first = await self._queue.get()
+            batch: list[_Record] = []
+            if first is None:
+                stop = True
+            else:
+                batch.append(first)
+            try:
+                async with asyncio.timeout(self.flush_interval):
+                    while len(batch) < self.batch_size and not stop:
+                        item = await self._queue.get()
+                        if item is None:
+                            stop = True
+                        else:
+                            batch.append(item)
+            except TimeoutError:
+                pass
+            try:
+                if batch:
+                    await self._run(self._write_pool, partial(self._insert, batch))
+                    self._forget(batch)
+            except Exception:
+                logger.exception("Manifest write of %s records failed", len(batch))
+                raise
+            finally:
+                for _ in range(len(batch) + stop):
+                    self._queue.task_done()
+
+    def _insert(self, batch: list[_Record]) -> None:
+        assert self._wconn is not None
+        with self._wconn:
+            self._wconn.executemany(
+                "INSERT INTO files (filename, sha256, source_url, downloaded_at)"
+                " VALUES (?, ?, ?, ?)",
+                [astuple(e) for e in batch if isinstance(e, ManifestEntry)],
+            )
+            self._wconn.executemany(
+                "INSERT OR REPLACE INTO validators"
+                " (url, etag, last_modified, size, sha256, fetched_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                [astuple(e) for e in batch if isinstance(e, Validators)],
+            )
+            self._wconn.executemany(
+                "INSERT OR REPLACE INTO github_blobs"
+                " (repo, path, blob_sha, url, synced_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                [astuple(e) for e in batch if isinstance(e, GitHubBlob)],
+            )
+            self._wconn.executemany(
+                "INSERT OR REPLACE INTO page_fingerprints"
+                " (canonical_url, url, simhash, filename, fetched_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                [astuple(e) for e in batch if isinstance(e, PageFingerprint)],
+            )
+
+    def _forget(self, batch: list[_Record]) -> None:
+        for e in batch:
+            if isinstance(e, GitHubBlob):
+                if self._pending_blobs.get((e.repo, e.path)) is e:
+                    del self._pending_blobs[e.repo, e.path]
+                continue
+            if isinstance(e, PageFingerprint):
+                if self._pending_pages.get(e.canonical_url) is e:
+                    del self._pending_pages[e.canonical_url]
+                continue
+            if isinstance(e, Validators):
+                if self._pending_validators.get(e.url) is e:
+                    del self._pending_validators[e.url]
+                continue
+            if self._pending_urls.get(e.source_url) is e:
+                del self._pending_urls[e.source_url]
+            shas = self._pending_shas.get(e.sha256, [])
+            if e in shas:
+                shas.remove(e)
+            if not shas:
+                self._pending_shas.pop(e.sha256, None)
+
+    async def _query(self, sql: str, params: tuple[Any, ...]) -> list[ManifestEntry]:
+        conn = self._rconn
+        assert conn is not None, "manifest is not open"
+        rows = await self._run(
+            self._read_pool, lambda: conn.execute(sql, params).fetchall()
+        )
+        return [ManifestEntry(*r) for r in rows]
+
+    async def find_by_url(self, url: str) -> ManifestEntry | None:
+        """Return the latest entry downloaded from ``url``."""
+        if url in self._pending_urls:
+            return self._pending_urls[url]
+        rows = await self._query(
+            "SELECT filename, sha256, source_url, downloaded_at FROM files"
+            " WHERE source_url = ? ORDER BY id DESC LIMIT 1",
+            (url,),
+        )
+        return rows[0] if rows else None
+
+    async def url_shas(self) -> dict[str, str]:
+        """The sha256 last downloaded from every URL."""
+        conn = self._rconn
+        assert conn is not None, "manifest is not open"
+        sql = "SELECT source_url, sha256 FROM files ORDER BY id"
+        rows = await self._run(
+            self._read_pool, lambda: conn.execute(sql).fetchall()
+        )
+        shas = dict(rows)
+        shas.update((url, e.sha256) for url, e in self._pending_urls.items())
+        return shas
+
+    async def find_by_sha(self, sha256: str) -> list[ManifestEntry]:
+        rows = await self._query(
+            "SELECT filename, sha256, source_url, downloaded_at FROM files"
+            " WHERE sha256 = ? ORDER BY id",
+            (sha256,),
+        )
+        return rows + list(self._pending_shas.get(sha256, []))
+
+    async def has_url(self, url: str) -> bool:
+        return await self.find_by_url(url) is not None
+
+    async def has_sha(self, sha256: str) -> bool:
+        return bool(await self.find_by_sha(sha256))
+
+    async def write_csv(self, path: Path) -> None:
+        """Export all committed entries to ``path`` in the legacy CSV layout."""
+        await self.flush()
+
+        def _export() -> int:
+            assert self._wconn is not None
+            cur = self._wconn.execute(
+                "SELECT filename, sha256, source_url, downloaded_at"
+                " FROM files ORDER BY id"
+            )
+            tmp = path.with_suffix(path.suffix + ".tmp")
+            count = 0
+            with open(tmp, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(CSV_HEADER)
+                for row in cur:
+                    writer.writerow(row)
+                    count += 1
+            tmp.replace(path)
+            return count
+
+        count = await self._run(self._write_pool, _export)
+        logger.info("Exported %s manifest rows to %s", count, path)
@@ -0,0 +1,351 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import importlib
+import importlib.util
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from collections.abc import Iterator
+from contextvars import ContextVar, Token
+from dataclasses import dataclass
+from pathlib import Path
+from types import TracebackType
+from typing import IO, Any
+
+from . import config
+from .config import logger
+
+# Small text files (robot descriptions, schemas, READMEs) are packed; anything
+# larger or binary stays a file of its own.
+PACK_SUFFIXES = {".urdf", ".sdf", ".xacro", ".srdf", ".xml", ".xsd", ".dae", ".launch"}
+PACK_SUFFIXES |= {".world", ".yaml", ".yml", ".json", ".md", ".txt"}
+MAX_BLOB_BYTES = 1024**2
+MAX_PACK_BYTES = 256 * 1024**2
+# One index record: sha256, offset and length in the pack, stored size, codec.
+ENTRY = struct.Struct("<32sQIIB")
+RAW, ZLIB, ZSTD = 0, 1, 2
+CODEC_NAMES = {RAW: "raw", ZLIB: "zlib", ZSTD: "zstd"}
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+
+_current: ContextVar[PackStore | None] = ContextVar("pack_store", default=None)
+_readers: dict[Path, PackReader] = {}
+_readers_lock = threading.Lock()
+
+
+def default_dir() -> Path:
+    return config.DATA_DIR / "blobs" / "packs"
+
+
+def have_zstd() -> bool:
+    """Whether the optional ``zstandard`` dependency is installed.
+
+    The module is not imported.
+    """
+    return importlib.util.find_spec("zstandard") is not None
+
+
+def _zstd() -> Any:
+    return importlib.import_module("zstandard")
+
+
+def compress(data: bytes, codec: int) -> tuple[bytes, int]:
+    """Compress ``data`` with ``codec``; keep it (``RAW``) if that does not help."""
+    if codec == ZSTD:
+        packed = _zstd().ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    elif codec == ZLIB:
+        packed = zlib.compress(data, ZLIB_LEVEL)
+    else:
+        return data, RAW
+    return (packed, codec) if len(packed) < len(data) else (data, RAW)
+
+
+def decompress(data: bytes, codec: int, size: int) -> bytes:
+    if codec == ZSTD:
+        out: bytes = _zstd().ZstdDecompressor().decompress(data, max_output_size=size)
+        return out
+    if codec == ZLIB:
+        return zlib.decompress(data)
+    return data
+
+
+@dataclass(frozen=True)
+class PackEntry:
+    pack: str
+    offset: int
+    length: int
+    size: int
+    codec: int
+
+
+class PackReader:
+    """Look up and read blobs from the pack files in ``directory``.
+
+    Index sidecars are read incrementally, so packs still being appended to
+    by a crawl (in this or another process) become readable on the next
+    miss. Packs are memory-mapped and a blob is only decompressed when read.
+    """
+
+    def __init__(self, directory: Path | None = None) -> None:
+        self.directory = directory or default_dir()
+        self.entries: dict[str, PackEntry] = {}
+        self._read: dict[Path, int] = {}
+        self._maps: dict[str, mmap.mmap] = {}
+        self._lock = threading.Lock()
+
+    def refresh(self) -> None:
+        """Pick up index records appended since the last call."""
+        with self._lock:
+            for idx in sorted(self.directory.glob("*.idx")):
+                done = self._read.get(idx, 0)
+                with open(idx, "rb") as f:
+                    f.seek(done)
+                    data = f.read()
+                # A record cut short by a crash is ignored.
+                whole = len(data) - len(data) % ENTRY.size
+                pack = idx.with_suffix(".pack").name
+                for sha, offset, length, size, codec in ENTRY.iter_unpack(data[:whole]):
+                    entry = PackEntry(pack, offset, length, size, codec)
+                    self.entries[sha.hex()] = entry
+                self._read[idx] = done + whole
+
+    def find(self, sha256: str, refresh: bool = True) -> PackEntry | None:
+        entry = self.entries.get(sha256)
+        if entry is None and refresh:
+            self.refresh()
+            entry = self.entries.get(sha256)
+        return entry
+
+    def __contains__(self, sha256: object) -> bool:
+        return isinstance(sha256, str) and self.find(sha256) is not None
+
+    def _map(self, entry: PackEntry) -> mmap.mmap:
+        with self._lock:
+            mapped = self._maps.get(entry.pack)
+            if mapped is None or len(mapped) < entry.offset + entry.length:
+                if mapped is not None:
+                    mapped.close()
+                with open(self.directory / entry.pack, "rb") as f:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._maps[entry.pack] = mapped
+            return mapped
+
+    def read(self, sha256: str, refresh: bool = True) -> bytes | None:
+        """The content of ``sha256``.
+
+        With ``refresh=False`` only packs already indexed are checked.
+        """
+        entry = self.find(sha256, refresh)
+        if entry is None:
+            return None
+        data = self._map(entry)[entry.offset : entry.offset + entry.length]
+        return decompress(data, entry.codec, entry.size)
+
+    def close(self) -> None:
+        with self._lock:
+            for mapped in self._maps.values():
+                mapped.close()
+            self._maps.clear()
+
+
+def reader(directory: Path | None = None) -> PackReader:
+    """The shared reader of ``directory`` (default ``DATA_DIR/blobs/packs``)."""
+    directory = directory or default_dir()
+    with _readers_lock:
+        found = _readers.get(directory)
+        if found is None:
+            found = _readers[directory] = PackReader(directory)
+        return found
+
+
+class PackStore:
+    """Append small files to rotating, compressed pack files.
+
+    Each blob is compressed on its own (zstd if installed, else zlib) and
+    appended to the current ``.pack`` file. Its offset is then appended to the
+    ``.idx`` sidecar, so a crash never indexes a partial blob. Content
+    already packed is not written again. Entering the context makes this the
+    store :func:`nidus_scraper.blobs.store` writes small text files to.
+    """
+
+    def __init__(
+        self,
+        directory: Path | None = None,
+        prefix: str = "blobs",
+        max_bytes: int = MAX_PACK_BYTES,
+        codec: int | None = None,
+    ) -> None:
+        self.directory = directory or default_dir()
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.codec = codec if codec is not None else ZSTD if have_zstd() else ZLIB
+        self.written = 0
+        self.stored_bytes = 0
+        self.packed_bytes = 0
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._file: IO[bytes] | None = None
+        self._index: IO[bytes] | None = None
+        self._name = ""
+        self._known: set[str] = set()
+        self._token: Token[PackStore | None] | None = None
+
+    async def __aenter__(self) -> PackStore:
+        await asyncio.to_thread(self.open)
+        self._token = _current.set(self)
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        if self._token is not None:
+            _current.reset(self._token)
+            self._token = None
+        await asyncio.to_thread(self.close)
+
+    def open(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        packs = reader(self.directory)
+        packs.refresh()
+        self._known = set(packs.entries)
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_file()
+        if self.written:
+            logger.info(
+                "Packed %s files, %.1f MB into %.1f MB (%s)",
+                self.written,
+                self.stored_bytes / 1e6,
+                self.packed_bytes / 1e6,
+                CODEC_NAMES[self.codec],
+            )
+
+    def _close_file(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        if self._index is not None:
+            self._index.close()
+        self._file = self._index = None
+
+    def _rotate(self) -> None:
+        self._close_file()
+        self._seq += 1
+        stamp = time.strftime("%Y%m%d%H%M%S", time.gmtime())
+        self._name = f"{self.prefix}-{stamp}-{os.getpid()}-{self._seq:05d}"
+        self._file = open(self.directory / f"{self._name}.pack", "ab")
+        self._index = open(self.directory / f"{self._name}.idx", "ab")
+
+    def accepts(self, dest: Path, size: int) -> bool:
+        return size <= MAX_BLOB_BYTES and dest.suffix.lower() in PACK_SUFFIXES
+
+    def __contains__(self, sha256: object) -> bool:
+        return sha256 in self._known
+
+    def add(self, sha256: str, data: bytes) -> bool:
+        """Pack ``data`` under ``sha256``; returns whether it was new."""
+        if sha256 in self._known:
+            return False
+        packed, codec = compress(data, self.codec)
+        with self._lock:
+            if sha256 in self._known:
+                return False
+            if self._file is None or self._file.tell() >= self.max_bytes:
+                self._rotate()
+            assert self._file is not None and self._index is not None
+            offset = self._file.tell()
+            self._file.write(packed)
+            self._file.flush()
+            self._index.write(
+                ENTRY.pack(bytes.fromhex(sha256), offset, len(packed), len(data), codec)
+            )
+            self._index.flush()
+            self._known.add(sha256)
+            self.written += 1
+            self.stored_bytes += len(data)
+            self.packed_bytes += len(packed)
+        # Imported here so that readers in worker processes do not load aiohttp.
+        from .telemetry import count
+
+        count("packed_files_total")
+        count("packed_bytes_total", len(packed))
+        return True
+
+
+def current() -> PackStore | None:
+    return _current.get()
+
+
+def _manifest_files() -> Iterator[tuple[str, str]]:
+    from .manifest import default_path as manifest_path
+
+    conn = sqlite3.connect(manifest_path())
+    try:
+        yield from conn.execute("SELECT filename, sha256 FROM files ORDER BY id")
+    finally:
+        conn.close()
+
+
+def unpack(directory: Path | None = None) -> int:
+    """Write packed files of the manifest back to the plain layout; returns how many."""
+    from . import blobs
+
+    packs = reader(directory)
+    restored = 0
+    for filename, sha256 in _manifest_files():
+        dest = Path(filename)
+        if dest.exists() or sha256 not in packs:
+            continue
+        tmp = blobs.temp_path(prefix=f"{dest.name}.")
+        tmp.write_bytes(packs.read(sha256) or b"")
+        blob, _ = blobs.commit(tmp, sha256)
+        blobs.link(blob, dest)
+        restored += 1
+    logger.info("Unpacked %s files", restored)
+    return restored
+
+
+def stats(directory: Path | None = None) -> dict[str, int]:
+    packs = reader(directory)
+    packs.refresh()
+    return {
+        "packs": len(list(packs.directory.glob("*.pack"))),
+        "blobs": len(packs.entries),
+        "bytes": sum(e.size for e in packs.entries.values()),
+        "packed_bytes": sum(e.length for e in packs.entries.values()),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Inspect packed blob storage")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="Count packed blobs and their compressed size")
+    cat = sub.add_parser("cat", help="Write one blob to stdout")
+    cat.add_argument("sha256")
+    sub.add_parser("unpack", help="Restore packed files of the manifest as plain files")
+    args = parser.parse_args()
+    config.configure()
+
+    if args.command == "stats":
+        for key, value in stats().items():
+            print(f"{key:>12}: {value}")
+    elif args.command == "unpack":
+        unpack()
+    else:
+        data = reader().read(args.sha256)
+        if data is None:
+            raise SystemExit(f"No packed blob {args.sha256}")
+        os.write(1, data)
+
+
+if __name__ == "__main__":
+    main()
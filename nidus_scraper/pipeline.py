@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections.abc import AsyncIterable, AsyncIterator, Awaitable, Callable, Iterable
+from dataclasses import dataclass, field
+from typing import Any, Generic, TypeVar
+
+from .config import logger
+from .scheduler import set_source
+from .telemetry import count, gauge_fn
+
+T = TypeVar("T")
+
+REPORT_INTERVAL = 30.0
+
+
+@dataclass
+class PipelineStats:
+    name: str
+    queued: int = 0
+    done: int = 0
+    failed: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+
+    def as_dict(self, depth: int, maxsize: int) -> dict[str, Any]:
+        elapsed = max(time.monotonic() - self.started_at, 1e-9)
+        return {
+            "name": self.name,
+            "queue_depth": depth,
+            "queue_max": maxsize,
+            "discovered": self.queued,
+            "done": self.done,
+            "failed": self.failed,
+            "discovery_rate": self.queued / elapsed,
+            "throughput": (self.done + self.failed) / elapsed,
+        }
+
+
+async def merge(streams: Iterable[AsyncIterator[T]], limit: int) -> AsyncIterator[T]:
+    """Interleave items from ``streams``, draining at most ``limit`` at once."""
+    out: asyncio.Queue[tuple[T] | None] = asyncio.Queue(limit)
+    sem = asyncio.Semaphore(limit)
+
+    async def drain(stream: AsyncIterator[T]) -> None:
+        async with sem:
+            try:
+                async for item in stream:
+                    await out.put((item,))
+            except Exception as exc:  # noqa: BLE001 - keep the other streams going
+                logger.warning("Discovery stream failed: %s", exc)
+
+    async def run() -> None:
+        try:
+            await asyncio.gather(*(drain(s) for s in streams))
+        finally:
+            await out.put(None)
+
+    task = asyncio.create_task(run())
+    try:
+        while (item := await out.get()) is not None:
+            yield item[0]
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
+class Pipeline(Generic[T]):
+    """Feed discovered work through a bounded queue to a fixed worker pool.
+
+    ``put`` blocks while the queue is full, so discovery never runs further
+    ahead of the downloads than ``maxsize`` items and memory stays constant
+    however many files a crawl finds.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[T], Awaitable[None]],
+        workers: int,
+        maxsize: int | None = None,
+        report_interval: float = REPORT_INTERVAL,
+    ) -> None:
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.queue: asyncio.Queue[T] = asyncio.Queue(maxsize or workers * 2)
+        self.report_interval = report_interval
+        self._stats = PipelineStats(name)
+
+    def stats(self) -> dict[str, Any]:
+        return self._stats.as_dict(self.queue.qsize(), self.queue.maxsize)
+
+    async def put(self, item: T) -> None:
+        await self.queue.put(item)
+        self._stats.queued += 1
+
+    async def _worker(self) -> None:
+        while True:
+            item = await self.queue.get()
+            try:
+                await self.handler(item)
+                self._stats.done += 1
+                count("jobs_total", outcome="done")
+            except Exception as exc:  # noqa: BLE001 - one bad item must not stop the pool
+                self._stats.failed += 1
+                count("jobs_total", outcome="failed")
+                logger.warning("%s: failed on %s: %s", self.name, item, exc)
+            finally:
+                self.queue.task_done()
+
+    async def _report(self) -> None:
+        while True:
+            await asyncio.sleep(self.report_interval)
+            s = self.stats()
+            logger.info(
+                "%s: queue %s/%s, %s done, %s failed (%.1f/s)",
+                self.name,
+                s["queue_depth"],
+                s["queue_max"],
+                s["done"],
+                s["failed"],
+                s["throughput"],
+            )
+
+    async def run(self, source: AsyncIterable[T] | Iterable[T]) -> dict[str, Any]:
+        """Drain ``source`` through the worker pool and return the final stats."""
+        set_source(self.name)
+        gauge_fn("queue_depth", self.queue.qsize, source=self.name)
+        tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        tasks.append(asyncio.create_task(self._report()))
+        try:
+            if isinstance(source, AsyncIterable):
+                async for item in source:
+                    await self.put(item)
+            else:
+                for item in source:
+                    await self.put(item)
+            await self.queue.join()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        stats = self.stats()
+        logger.info(
+            "%s: finished, %s done, %s failed",
+            self.name,
+            stats["done"],
+            stats["failed"],
+        )
+        return stats
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import re
+from collections.abc import AsyncIterator
+from pathlib import Path
+from urllib.parse import urlparse
+
+from . import config, warc
+from .browser_pool import BrowserPool
+from .config import logger
+from .jobs import run_jobs
+from .manifest import Manifest, using
+from .vendor_pages import (
+    PAGES_PER_BROWSER,
+    RenderPlan,
+    is_candidate,
+    page_dest,
+    render_pdf,
+)
+from .warc import IndexEntry
+
+HTML_TYPES = {"text/html", "application/xhtml+xml"}
+
+
+def select(
+    entries: dict[str, IndexEntry], match: str | None = None, limit: int | None = None
+) -> list[IndexEntry]:
+    """Archived HTML pages to render: product pages, or those matching ``match``."""
+    pattern = re.compile(match) if match else None
+    chosen = sorted(
+        (
+            e
+            for e in entries.values()
+            if e.status == 200
+            and e.mime in HTML_TYPES
+            and (pattern.search(e.url) if pattern else is_candidate(e.url))
+        ),
+        key=lambda e: e.url,
+    )
+    return chosen[:limit] if limit else chosen
+
+
+async def render_archive(
+    directory: Path | None = None,
+    match: str | None = None,
+    limit: int | None = None,
+    browsers: int = 2,
+    force: bool = False,
+) -> int:
+    """Render archived pages to PDF without touching the network.
+
+    Only the HTML of a page is archived. Its stylesheets, images and scripts
+    are blocked, so the PDFs come out unstyled and without pictures; crawl
+    ``pages`` without ``--warc`` where the layout matters.
+
+    Pages already rendered with the same content, and near-duplicates of
+    rendered pages, are skipped unless ``force``. Returns the number rendered.
+    """
+    entries = select(warc.latest_entries(directory), match, limit)
+    async with using() as manifest:
+        plan = RenderPlan({} if force else await manifest.page_fingerprints())
+    pending: dict[str, str] = {}
+    rendered = 0
+
+    async def jobs() -> AsyncIterator[tuple[str, Path]]:
+        for entry in entries:
+            record = await asyncio.to_thread(warc.read_entry, entry, directory)
+            html = record.text()
+            domain = (urlparse(entry.url).hostname or "").removeprefix("www.")
+            dest = page_dest(domain, entry.url)
+            if await plan.consider(entry.url, dest, html):
+                pending[entry.url] = html
+                yield entry.url, dest
+
+    async with BrowserPool(browsers, PAGES_PER_BROWSER) as pool:
+
+        async def render(job: tuple[str, Path]) -> None:
+            nonlocal rendered
+            url, dest = job
+            ok = await render_pdf(url, dest, pool, html=pending.pop(url))
+            rendered += ok
+            await plan.finish(url, ok)
+
+        await run_jobs("render", jobs(), render, pool.capacity)
+    logger.info("Rendered %s of %s archived pages", rendered, len(entries))
+    return rendered
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Render archived product pages to PDF",
+        epilog="Only the HTML of each page is archived. Stylesheets, images and "
+        "scripts are blocked, so the PDFs are unstyled and have no pictures. Crawl "
+        "pages without --warc to render them live where the layout matters.",
+    )
+    parser.add_argument(
+        "--warc-dir", type=Path, help="Archive to read (default data_raw/warc)"
+    )
+    parser.add_argument(
+        "--match", help="Render pages whose URL matches this regex instead"
+    )
+    parser.add_argument("--limit", type=int, help="Render at most this many pages")
+    parser.add_argument("--browsers", type=int, default=2)
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Re-render pages even if their content is known",
+    )
+    args = parser.parse_args()
+    config.configure()
+
+    async def run() -> None:
+        async with Manifest(export_csv=config.MANIFEST):
+            await render_archive(
+                args.warc_dir, args.match, args.limit, args.browsers, args.force
+            )
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from collections.abc import Awaitable, Callable
+from contextvars import ContextVar, Token
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from types import TracebackType
+from typing import Mapping, TypeVar
+from urllib.parse import urlparse
+
+import aiohttp
+
+from .config import logger
+from .telemetry import count
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+DEFAULT_ATTEMPTS = 3
+DEFAULT_BASE_DELAY = 1.0
+MAX_DELAY = 60.0
+# Longest Retry-After we are willing to sleep through; beyond that we give up.
+MAX_RETRY_AFTER = 300.0
+DEFAULT_DEADLINE = 600.0
+BREAKER_THRESHOLD = 5
+BREAKER_RESET = 30.0
+
+_current: ContextVar[RetryPolicy | None] = ContextVar("retry_policy", default=None)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a host whose circuit breaker is open."""
+
+
+@dataclass(frozen=True)
+class Verdict:
+    retryable: bool
+    # Counts against the host's circuit breaker (the host, not the request, is at
+    # fault).
+    host_failure: bool
+    reason: str
+    retry_after: float | None = None
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Seconds to wait according to a ``Retry-After`` header, if it is valid."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(when.timestamp() - time.time(), 0.0)
+
+
+def classify(exc: BaseException) -> Verdict:
+    """Decide whether ``exc`` is worth retrying and whose fault it is."""
+    if isinstance(exc, CircuitOpenError):
+        return Verdict(False, False, "circuit_open")
+    if isinstance(exc, aiohttp.ClientResponseError):
+        headers: Mapping[str, str] = exc.headers or {}
+        retry_after = parse_retry_after(headers.get("Retry-After"))
+        if exc.status in RETRYABLE_STATUS:
+            return Verdict(True, exc.status != 429, f"http_{exc.status}", retry_after)
+        return Verdict(False, False, f"http_{exc.status}")
+    if isinstance(exc, (asyncio.TimeoutError, aiohttp.ServerTimeoutError)):
+        return Verdict(True, True, "timeout")
+    if isinstance(exc, (aiohttp.ClientConnectionError, ConnectionError)):
+        return Verdict(True, True, "connection")
+    if isinstance(exc, aiohttp.ClientPayloadError):
+        return Verdict(True, False, "payload")
+    # Unknown errors (parse failures, short transfers, ...) keep the old behaviour.
+    return Verdict(True, False, type(exc).__name__)
+
+
+class CircuitBreaker:
+    """Fail fast on a host after ``threshold`` consecutive host failures.
+
+    Once open, calls are refused for ``reset_timeout`` seconds; after that a
+    single probe is let through (half-open) and its outcome closes or re-opens
+    the circuit.
+    """
+
+    def __init__(
+        self, threshold: int = BREAKER_THRESHOLD, reset_timeout: float = BREAKER_RESET
+    ) -> None:
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if self._probing or time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def before(self, host: str) -> None:
+        state = self.state
+        if state == "closed":
+            return
+        if state == "open" or self._probing:
+            raise CircuitOpenError(f"Circuit open for {host}")
+        self._probing = True
+
+    def success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def failure(self, host: str) -> None:
+        self.failures += 1
+        tripped = self.opened_at is None and self.failures >= self.threshold
+        if self._probing or tripped:
+            logger.warning("Circuit open for %s after %s failures", host, self.failures)
+            self.opened_at = time.monotonic()
+            self._probing = False
+
+    def abandon(self) -> None:
+        """Let another call probe if the current probe was cancelled."""
+        self._probing = False
+
+
+class RetryPolicy:
+    """Retry transient failures with decorrelated jitter and per-host breakers.
+
+    Permanent errors (most 4xx) are raised immediately; ``Retry-After`` is
+    honoured when present; no retry is started or slept towards past
+    ``deadline`` seconds from the first try. The deadline bounds the retry
+    budget only: an attempt that is still running, such as a long download,
+    is left to the session's own timeouts. Entering the context makes it the
+    policy used by :func:`nidus_scraper.utils.retry`.
+    """
+
+    def __init__(
+        self,
+        attempts: int = DEFAULT_ATTEMPTS,
+        base_delay: float = DEFAULT_BASE_DELAY,
+        max_delay: float = MAX_DELAY,
+        deadline: float | None = DEFAULT_DEADLINE,
+        breaker_threshold: int = BREAKER_THRESHOLD,
+        breaker_reset: float = BREAKER_RESET,
+    ) -> None:
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset = breaker_reset
+        self.breakers: dict[str, CircuitBreaker] = {}
+        self._token: Token[RetryPolicy | None] | None = None
+
+    async def __aenter__(self) -> RetryPolicy:
+        self._token = _current.set(self)
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        if self._token is not None:
+            _current.reset(self._token)
+            self._token = None
+
+    def breaker(self, url: str) -> CircuitBreaker | None:
+        if self.breaker_threshold <= 0:
+            return None
+        host = urlparse(url).hostname or ""
+        if host not in self.breakers:
+            self.breakers[host] = CircuitBreaker(
+                self.breaker_threshold, self.breaker_reset
+            )
+        return self.breakers[host]
+
+    def backoff(self, previous: float, base_delay: float) -> float:
+        """Decorrelated jitter: uniform between the base and 3x the last sleep."""
+        if base_delay <= 0:
+            return 0.0
+        upper = max(previous, base_delay) * 3
+        return min(self.max_delay, random.uniform(base_delay, upper))
+
+    async def call(
+        self,
+        func: Callable[[], Awaitable[T]],
+        url: str | None = None,
+        attempts: int | None = None,
+        base_delay: float | None = None,
+    ) -> T:
+        attempts = attempts or self.attempts
+        base_delay = self.base_delay if base_delay is None else base_delay
+        breaker = self.breaker(url) if url else None
+        host = (urlparse(url).hostname or "") if url else ""
+        loop = asyncio.get_running_loop()
+        give_up_at = loop.time() + self.deadline if self.deadline else None
+        delay = 0.0
+        for attempt in range(1, attempts + 1):
+            if breaker is not None:
+                breaker.before(host)
+            try:
+                result = await func()
+            except asyncio.CancelledError:
+                if breaker is not None:
+                    breaker.abandon()
+                raise
+            except Exception as exc:  # noqa: BLE001 - classified below
+                verdict = classify(exc)
+                if breaker is not None:
+                    if verdict.host_failure:
+                        breaker.failure(host)
+                    else:
+                        breaker.success()
+                if not verdict.retryable or attempt == attempts:
+                    raise
+                delay = self.backoff(delay, base_delay)
+                if verdict.retry_after is not None:
+                    if verdict.retry_after > MAX_RETRY_AFTER:
+                        raise
+                    delay = max(delay, verdict.retry_after)
+                if give_up_at is not None and loop.time() + delay >= give_up_at:
+                    raise
+                count("retries_total", reason=verdict.reason)
+                logger.warning(
+                    "Retry %s/%s after %.1fs due to %s", attempt, attempts, delay, exc
+                )
+                await asyncio.sleep(delay)
+            else:
+                if breaker is not None:
+                    breaker.success()
+                return result
+        # The loop always returns or raises.
+        raise RuntimeError("Retry failed")  # pragma: no cover
+
+
+def current() -> RetryPolicy:
+    """The active policy, or a breaker-less default outside of a crawl."""
+    return _current.get() or RetryPolicy(breaker_threshold=0)
+
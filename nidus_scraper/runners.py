@@ -3,27 +3,217 @@ from __future__ import annotations
 
 import argparse
 import asyncio
-from typing import Iterable
-
-import aiohttp
+import contextlib
+import json
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Any, Iterable
 
+from . import analysis, config, manifest, sharding, sources as registry, warc
+from .analysis import AnalysisIndex, Analyzer
 from .config import logger
-from .github import crawl_github
-from .vendors import crawl_vendors
-from .vendor_pages import crawl_vendor_pages
-from .standards import crawl_standards
+from .connections import Connections
+from .defaults import BULK_THRESHOLD
+from .jobs import JobStore
+from .manifest import Manifest
+from .packs import PackStore
+from .retries import RetryPolicy
+from .scheduler import DEFAULT_GLOBAL_LIMIT, DEFAULT_HOST_LIMIT, Scheduler
+from .sharding import Shard, set_shard
+from .telemetry import Telemetry
+from .warc import WarcWriter
+from .textindex import TextIndex
+
+
+ANALYSIS_PROCESSES = 2
+TEXT_PROCESSES = 2
+# Sources whose downloads (PDFs, schemas, READMEs) go into the full-text index.
+TEXT_SOURCES = {"vendor", "pages", "standards"}
+
+
+def parse_host_limits(values: Iterable[str]) -> dict[str, int]:
+    limits: dict[str, int] = {}
+    for value in values:
+        host, _, limit = value.partition("=")
+        limits[host.strip()] = int(limit)
+    return limits
+
+
+async def run_crawlers(
+    sources: Iterable[str],
+    workers: int,
+    max_inflight: int = DEFAULT_GLOBAL_LIMIT,
+    host_limit: int = DEFAULT_HOST_LIMIT,
+    host_limits: dict[str, int] | None = None,
+    resume: bool = False,
+    metrics_port: int | None = None,
+    metrics_json: Path | None = None,
+    bulk_threshold: int | None = None,
+    meshes: bool = False,
+    shard: Shard | None = None,
+    analysis_processes: int = ANALYSIS_PROCESSES,
+    text_processes: int = TEXT_PROCESSES,
+    adaptive: bool = True,
+    warc_dir: Path | None = None,
+    blob_layout: str = "plain",
+) -> dict[str, Any]:
+    """Crawl ``sources`` concurrently and return the telemetry summary.
+
+    With ``shard`` only that shard's hosts and slices of the GitHub search are
+    crawled, into a manifest and job store of its own (see
+    :func:`merge_shards`). With
+    ``warc_dir`` product pages are archived there instead of rendered. With
+    ``blob_layout="packed"`` small text files go into compressed pack files
+    instead of a file each.
+    Sources are looked up in :mod:`nidus_scraper.sources`; only the selected
+    ones are imported.
+    """
+    set_shard(shard)
+    selected = list(dict.fromkeys(sources))
+    options: dict[str, dict[str, Any]] = {
+        "urdf": {"meshes": meshes}
+        | ({} if bulk_threshold is None else {"bulk_threshold": bulk_threshold}),
+        "pages": {"archive": warc_dir is not None},
+    }
+    crawlers = {
+        name: partial(registry.load(name), **options.get(name, {})) for name in selected
+    }
+    telemetry = Telemetry()
+    analyzer: contextlib.AbstractAsyncContextManager[Any] = contextlib.nullcontext()
+    if analysis_processes > 0 and "urdf" in selected:
+        index = AnalysisIndex(sharding.analysis_path(shard) if shard else None)
+        analyzer = Analyzer(index, analysis_processes)
+    archive: contextlib.AbstractAsyncContextManager[Any] = contextlib.nullcontext()
+    if warc_dir is not None:
+        archive = WarcWriter(warc_dir, prefix=shard.name if shard else "pages")
+    packs: contextlib.AbstractAsyncContextManager[Any] = contextlib.nullcontext()
+    if blob_layout == "packed":
+        packs = PackStore(prefix=shard.name if shard else "blobs")
+    async with (
+        telemetry,
+        analyzer,
+        archive,
+        packs,
+        Manifest(export_csv=config.MANIFEST)
+        if shard is None
+        else Manifest(sharding.manifest_path(shard), seed=manifest.default_path()),
+        JobStore(sharding.jobs_path(shard) if shard else None, resume=resume),
+        RetryPolicy(),
+        Scheduler(
+            max_inflight, host_limit, host_limits, ceiling=workers if adaptive else None
+        ),
+        Connections(
+            per_host=max(workers, host_limit, *(host_limits or {}).values()),
+            trace_configs=[telemetry.trace_config()],
+        ) as connections,
+    ):
+        server = await telemetry.serve(metrics_port) if metrics_port else None
+        try:
+            results = await asyncio.gather(
+                *(
+                    crawlers[name](connections.session(name), workers)
+                    for name in selected
+                ),
+                return_exceptions=True,
+            )
+        finally:
+            if server is not None:
+                await server.cleanup()
+    for name, result in zip(selected, results):
+        if isinstance(result, BaseException):
+            logger.error("Source %s failed: %s", name, result)
+    # Shards index text once their manifests are merged.
+    if shard is None and text_processes > 0 and TEXT_SOURCES & set(selected):
+        await index_text(text_processes)
+    summary = telemetry.summary()
+    text = json.dumps(summary, indent=2, sort_keys=True)
+    if metrics_json is not None:
+        metrics_json.write_text(text)
+    logger.info("Crawl telemetry:\n%s", text)
+    return summary
+
+
+async def index_text(processes: int = TEXT_PROCESSES) -> int:
+    """Add documents new to the manifest to the full-text index."""
+    index = TextIndex()
+    try:
+        return await index.update(processes=processes)
+    finally:
+        index.close()
+
+
+def _run_shard(kwargs: dict[str, Any]) -> None:
+    # Spawned processes start with default settings and no logging set up.
+    config.configure(kwargs.pop("data_dir"), log_level=kwargs.pop("log_level"))
+    asyncio.run(run_crawlers(**kwargs))
+
+
+def run_processes(shard: Shard, processes: int, **kwargs: Any) -> list[Shard]:
+    """Crawl ``shard`` split over ``processes`` local processes; return their shards."""
+    shards = shard.split(processes)
+    metrics_port = kwargs.pop("metrics_port", None)
+    metrics_json = kwargs.pop("metrics_json", None)
+    jobs = [
+        {
+            **kwargs,
+            "shard": s,
+            "data_dir": config.DATA_DIR,
+            "log_level": logging.getLevelName(logging.getLogger().getEffectiveLevel()),
+            "metrics_port": metrics_port + j if metrics_port else None,
+            "metrics_json": metrics_json.with_name(f"{metrics_json.stem}.{s.name}.json")
+            if metrics_json
+            else None,
+        }
+        for j, s in enumerate(shards)
+    ]
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(processes, mp_context=ctx) as pool:
+        for s, future in zip(shards, [pool.submit(_run_shard, job) for job in jobs]):
+            try:
+                future.result()
+            except Exception as exc:  # noqa: BLE001 - report every shard
+                logger.error("Shard %s failed: %s", s.name, exc)
+    return shards
 
 
-async def run_crawlers(sources: Iterable[str], workers: int) -> None:
-    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0)) as session:
-        if "urdf" in sources:
-            await crawl_github(session, workers)
-        if "vendor" in sources:
-            await crawl_vendors(session, workers)
-        if "pages" in sources:
-            await crawl_vendor_pages(session, workers)
-        if "standards" in sources:
-            await crawl_standards(session, workers)
+def merge_shards(
+    shards: Iterable[Shard] | None = None, text_processes: int = TEXT_PROCESSES
+) -> None:
+    """Merge per-shard manifests (all found, by default) into the main one."""
+    paths = (
+        [sharding.manifest_path(s) for s in shards]
+        if shards is not None
+        else sharding.shard_manifests()
+    )
+    paths = [p for p in paths if p.exists()]
+
+    async def export() -> None:
+        async with Manifest(export_csv=config.MANIFEST):
+            pass
+
+    # Opening the main manifest first imports a legacy CSV if there is one.
+    asyncio.run(export())
+    added = sharding.merge_manifests(manifest.default_path(), paths)
+    logger.info("Merged %s shard manifests, %s new files", len(paths), added)
+    seen = (
+        [sharding.github_seen_path(s) for s in shards]
+        if shards is not None
+        else sharding.github_seen_records()
+    )
+    sharding.remove_unseen_github_blobs(
+        manifest.default_path(), [p for p in seen if p.exists()]
+    )
+    indexes = [p.with_name(p.name.replace("sources.", "analysis.", 1)) for p in paths]
+    analysed = analysis.merge_indexes(
+        analysis.default_path(), [p for p in indexes if p.exists()]
+    )
+    logger.info("Merged analysis of %s new files", analysed)
+    asyncio.run(export())
+    if text_processes > 0:
+        asyncio.run(index_text(text_processes))
 
 
 def parse_args() -> argparse.Namespace:
@@ -31,17 +221,149 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--sources",
         default="urdf,vendor,standards,pages",
-        help="Comma separated list of sources to crawl",
+        help="Comma separated list of sources to crawl (built in: "
+        f"{', '.join(registry.BUILTIN)}; plugins register under the "
+        f"{registry.GROUP!r} entry point group)",
     )
     parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument(
+        "--max-inflight",
+        type=int,
+        default=DEFAULT_GLOBAL_LIMIT,
+        help="Maximum number of requests in flight across all sources",
+    )
+    parser.add_argument(
+        "--host-limit",
+        type=int,
+        default=DEFAULT_HOST_LIMIT,
+        help="Starting number of concurrent requests per host "
+        "(adapted up to --workers)",
+    )
+    parser.add_argument(
+        "--limit",
+        action="append",
+        default=[],
+        metavar="HOST=N",
+        help="Pin the concurrency limit for one host (repeatable)",
+    )
+    parser.add_argument(
+        "--static-limits",
+        action="store_true",
+        help="Keep every host at its starting limit instead of adapting it "
+        "(up to --workers)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted crawl instead of starting over",
+    )
+    parser.add_argument(
+        "--bulk-threshold",
+        type=int,
+        default=BULK_THRESHOLD,
+        help="Fetch a GitHub repository as one tarball once this many of its files "
+        "changed (0 disables)",
+    )
+    parser.add_argument(
+        "--meshes",
+        action="store_true",
+        help="Also keep mesh files referenced by descriptions fetched in bulk",
+    )
+    parser.add_argument(
+        "--analysis-processes",
+        type=int,
+        default=ANALYSIS_PROCESSES,
+        help="Processes parsing downloaded robot descriptions into the index "
+        "(0 disables)",
+    )
+    parser.add_argument(
+        "--text-processes",
+        type=int,
+        default=TEXT_PROCESSES,
+        help="Processes extracting PDF text for the full-text index (0 disables)",
+    )
+    parser.add_argument(
+        "--warc",
+        action="store_true",
+        help="Archive product pages as WARC files for python -m nidus_scraper.render "
+        "instead of rendering them during the crawl",
+    )
+    parser.add_argument(
+        "--warc-dir",
+        type=Path,
+        help="Where --warc writes its archive (default data_raw/warc)",
+    )
+    parser.add_argument(
+        "--blob-layout",
+        choices=("plain", "packed"),
+        default="plain",
+        help="Store small text files (descriptions, schemas) as one file each, or "
+        "compressed in append-only pack files",
+    )
+    parser.add_argument(
+        "--shard",
+        type=Shard.parse,
+        metavar="I/N",
+        help="Crawl only shard I (zero-based) of N, e.g. one per machine",
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=1,
+        help="Split the crawl (or this --shard) over this many local processes",
+    )
+    parser.add_argument(
+        "--merge",
+        action="store_true",
+        help="Merge all per-shard manifests into the main manifest and exit",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        help="Serve Prometheus metrics on this port while crawling",
+    )
+    parser.add_argument(
+        "--metrics-json",
+        type=Path,
+        help="Write the end-of-run telemetry summary to this file",
+    )
     return parser.parse_args()
 
 
 def main() -> None:
     args = parse_args()
+    config.configure()
     sources = [s.strip() for s in args.sources.split(",") if s.strip()]
+    unknown = registry.unknown(sources)
+    if unknown:
+        raise SystemExit(f"Unknown sources: {', '.join(unknown)}")
+    if args.merge:
+        merge_shards(text_processes=args.text_processes)
+        return
     logger.info("Crawling sources: %s", sources)
-    asyncio.run(run_crawlers(sources, args.workers))
+    kwargs: dict[str, Any] = dict(
+        sources=sources,
+        workers=args.workers,
+        max_inflight=args.max_inflight,
+        host_limit=args.host_limit,
+        host_limits=parse_host_limits(args.limit),
+        resume=args.resume,
+        metrics_port=args.metrics_port,
+        metrics_json=args.metrics_json,
+        bulk_threshold=args.bulk_threshold,
+        meshes=args.meshes,
+        analysis_processes=args.analysis_processes,
+        text_processes=args.text_processes,
+        adaptive=not args.static_limits,
+        warc_dir=(args.warc_dir or warc.default_dir()) if args.warc else None,
+        blob_layout=args.blob_layout,
+    )
+    if args.processes > 1:
+        shards = run_processes(args.shard or Shard(0, 1), args.processes, **kwargs)
+        if args.shard is None:
+            merge_shards(shards, text_processes=args.text_processes)
+        return
+    asyncio.run(run_crawlers(**kwargs, shard=args.shard))
 
 
 if __name__ == "__main__":
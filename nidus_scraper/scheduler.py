@@ -0,0 +1,325 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from contextvars import ContextVar, Token
+from types import TracebackType
+from urllib.parse import urlparse
+
+import aiohttp
+
+from . import telemetry
+from .config import logger
+
+DEFAULT_GLOBAL_LIMIT = 64
+DEFAULT_HOST_LIMIT = 4
+HOST_LIMITS = {
+    "api.github.com": 4,
+    "raw.githubusercontent.com": 32,
+}
+
+# Adaptive host limits: a round whose average latency exceeds the host's
+# baseline by this factor means requests are queueing at the server.
+LATENCY_TOLERANCE = 1.5
+# The baseline (best round seen) creeps up by this factor per minute so it
+# follows a host whose normal latency changes.
+BASELINE_DRIFT = 1.1
+OVERLOAD_STATUS = {429, 503}
+# Requests averaged per adjustment at least, so one slow response at a low
+# limit is not mistaken for queueing.
+MIN_ROUND = 8
+
+_current: ContextVar[Scheduler | None] = ContextVar("scheduler", default=None)
+_source: ContextVar[str] = ContextVar("source", default="default")
+
+
+class FairLimiter:
+    """Counting semaphore that hands out free slots round-robin between keys.
+
+    A source with a deep backlog cannot starve another one: whenever a slot is
+    released the next waiter is taken from the key after the last one served.
+    """
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.active = 0
+        self._waiters: dict[str, deque[asyncio.Future[None]]] = {}
+        self._rotation: deque[str] = deque()
+
+    async def acquire(self, key: str) -> None:
+        if self.active < self.limit and not self._rotation:
+            self.active += 1
+            return
+        fut: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        if key not in self._waiters:
+            self._waiters[key] = deque()
+            self._rotation.append(key)
+        self._waiters[key].append(fut)
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release()
+            raise
+
+    def release(self) -> None:
+        self.active -= 1
+        while self.active < self.limit and self._rotation:
+            key = self._rotation.popleft()
+            queue = self._waiters[key]
+            fut = queue.popleft()
+            if queue:
+                self._rotation.append(key)
+            else:
+                del self._waiters[key]
+            if not fut.done():
+                fut.set_result(None)
+                self.active += 1
+
+
+class RequestTimer:
+    """Latency of the request made in one slot.
+
+    Callers that stream a body call :meth:`first_byte` once the response
+    headers are in, so a long transfer is not taken for a slow server;
+    otherwise the whole time in the slot counts.
+    """
+
+    def __init__(self) -> None:
+        self.started = time.monotonic()
+        self.headers_at: float | None = None
+
+    def first_byte(self) -> None:
+        if self.headers_at is None:
+            self.headers_at = time.monotonic()
+
+    def latency(self) -> float:
+        return (self.headers_at or time.monotonic()) - self.started
+
+
+def overloaded(exc: BaseException) -> bool:
+    """Whether ``exc`` says the host is over capacity (as opposed to a bad request)."""
+    if isinstance(exc, aiohttp.ClientResponseError):
+        return exc.status in OVERLOAD_STATUS
+    return isinstance(
+        exc, (asyncio.TimeoutError, aiohttp.ClientConnectionError, ConnectionError)
+    )
+
+
+class HostLimiter:
+    """Concurrency limit for one host, fixed or adapted like TCP congestion control.
+
+    An adaptive limit is re-evaluated after every round of ``limit`` (at least
+    :data:`MIN_ROUND`) completed requests. Any overload (429, 503, timeouts,
+    refused connections) halves it. A round whose average latency (time to
+    the response headers, see :class:`RequestTimer`) exceeds the
+    host's baseline by :data:`LATENCY_TOLERANCE` lowers it in proportion, since
+    the extra requests only queued. Otherwise it grows by one if every slot
+    was in use. The limit settles around the knee where more concurrency stops
+    adding throughput, and never exceeds ``ceiling``.
+    """
+
+    def __init__(self, host: str, limit: int, ceiling: int | None = None) -> None:
+        self.host = host
+        self.ceiling = ceiling
+        self.limit = max(1, min(limit, ceiling) if ceiling else limit)
+        self.active = 0
+        self.baseline: float | None = None
+        self.throughput = 0.0
+        self._baseline_at = time.monotonic()
+        self._waiters: deque[asyncio.Future[None]] = deque()
+        self._reset_round()
+
+    @property
+    def adaptive(self) -> bool:
+        return self.ceiling is not None
+
+    def _reset_round(self) -> None:
+        self._done = 0
+        self._samples = 0
+        self._latency = 0.0
+        self._overloaded = False
+        self._saturated = False
+        self._started = time.monotonic()
+
+    async def acquire(self) -> None:
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self._saturated |= self.active >= self.limit
+            return
+        self._saturated = True
+        fut: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release()
+            else:
+                self._waiters.remove(fut)
+            raise
+
+    def release(self) -> None:
+        self.active -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        while self.active < self.limit and self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                fut.set_result(None)
+                self.active += 1
+
+    def record(self, latency: float | None, overloaded: bool = False) -> None:
+        """Feed back one finished request; ``latency`` is ``None`` for failures."""
+        if not self.adaptive:
+            return
+        self._done += 1
+        if latency is not None:
+            self._samples += 1
+            self._latency += latency
+        self._overloaded |= overloaded
+        if self._done >= max(self.limit, MIN_ROUND):
+            self._adjust()
+
+    def _adjust(self) -> None:
+        assert self.ceiling is not None
+        now = time.monotonic()
+        elapsed = now - self._started
+        self.throughput = self._done / elapsed if elapsed > 0 else 0.0
+        average = self._latency / self._samples if self._samples else None
+        if average is not None:
+            if self.baseline is None:
+                self.baseline = average
+            drift = BASELINE_DRIFT ** ((now - self._baseline_at) / 60)
+            self.baseline = min(average, self.baseline * drift)
+            self._baseline_at = now
+        old = self.limit
+        if self._overloaded:
+            self.limit, reason = max(1, self.limit // 2), "overload"
+        elif (
+            average is not None
+            and self.baseline
+            and average > self.baseline * LATENCY_TOLERANCE
+        ):
+            # Shrink in proportion to how far latency overshot the tolerance.
+            target = int(self.limit * self.baseline * LATENCY_TOLERANCE / average)
+            self.limit, reason = max(1, min(target, self.limit - 1)), "latency"
+        elif self._saturated:
+            self.limit, reason = min(self.ceiling, self.limit + 1), "headroom"
+        if self.limit != old:
+            logger.info(
+                "Host limit for %s: %s -> %s "
+                "(%s; %.0f ms avg, %.0f ms baseline, %.1f req/s)",
+                self.host,
+                old,
+                self.limit,
+                reason,
+                1000 * (average or 0.0),
+                1000 * (self.baseline or 0.0),
+                self.throughput,
+            )
+            telemetry.count("host_limit_changes_total", host=self.host, reason=reason)
+        self._reset_round()
+        self._wake()
+
+
+class Scheduler:
+    """Global in-flight limit plus per-host limits shared by every source.
+
+    Host slots are taken before the global one, so requests queued behind a
+    slow host never hold global capacity that other hosts could use.
+
+    With ``ceiling``, host limits adapt to each host (see :class:`HostLimiter`):
+    ``host_limit`` and :data:`HOST_LIMITS` are only starting points, while
+    hosts named in ``host_limits`` keep exactly the limit given.
+    """
+
+    def __init__(
+        self,
+        global_limit: int = DEFAULT_GLOBAL_LIMIT,
+        host_limit: int = DEFAULT_HOST_LIMIT,
+        host_limits: dict[str, int] | None = None,
+        ceiling: int | None = None,
+    ) -> None:
+        self.host_limit = host_limit
+        self.host_limits = {**HOST_LIMITS, **(host_limits or {})}
+        self.pinned = set(host_limits or ())
+        self.ceiling = ceiling
+        self._global = FairLimiter(global_limit)
+        self._hosts: dict[str, HostLimiter] = {}
+        self._token: Token[Scheduler | None] | None = None
+
+    async def __aenter__(self) -> Scheduler:
+        self._token = _current.set(self)
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        if self._token is not None:
+            _current.reset(self._token)
+            self._token = None
+
+    def host(self, host: str) -> HostLimiter:
+        if host not in self._hosts:
+            limit = self.host_limits.get(host, self.host_limit)
+            ceiling = None if host in self.pinned else self.ceiling
+            limiter = self._hosts[host] = HostLimiter(host, limit, ceiling)
+            logger.debug("Host limit for %s: %s", host, limiter.limit)
+            telemetry.gauge_fn("host_limit", lambda: limiter.limit, host=host)
+        return self._hosts[host]
+
+    def limits(self) -> dict[str, int]:
+        return {host: limiter.limit for host, limiter in self._hosts.items()}
+
+    @asynccontextmanager
+    async def slot(self, source: str, url: str) -> AsyncIterator[RequestTimer]:
+        limiter = self.host(urlparse(url).hostname or "")
+        await limiter.acquire()
+        try:
+            await self._global.acquire(source)
+            timer = RequestTimer()
+            try:
+                yield timer
+            except asyncio.CancelledError:
+                raise
+            except BaseException as exc:
+                limiter.record(None, overloaded(exc))
+                raise
+            else:
+                limiter.record(timer.latency())
+            finally:
+                self._global.release()
+        finally:
+            limiter.release()
+
+
+def current() -> Scheduler | None:
+    return _current.get()
+
+
+def set_source(name: str) -> None:
+    """Attribute requests made from the current task (and its children) to ``name``."""
+    _source.set(name)
+
+
+def current_source() -> str:
+    return _source.get()
+
+
+@asynccontextmanager
+async def slot(url: str) -> AsyncIterator[RequestTimer]:
+    """Hold a request slot for ``url`` under the active scheduler, if any."""
+    scheduler = _current.get()
+    if scheduler is None:
+        yield RequestTimer()
+        return
+    async with scheduler.slot(_source.get(), url) as timer:
+        yield timer
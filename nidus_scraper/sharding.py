@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import sqlite3
+from collections import Counter
+from collections.abc import Iterable
+from contextvars import ContextVar
+from dataclasses import dataclass
+from pathlib import Path
+from urllib.parse import urlparse
+
+from . import config
+from .config import logger
+from .manifest import SCHEMA
+
+_current: ContextVar[Shard | None] = ContextVar("shard", default=None)
+
+
+@dataclass(frozen=True)
+class Shard:
+    """One of ``count`` disjoint slices of the crawl."""
+
+    index: int
+    count: int
+
+    def __post_init__(self) -> None:
+        if not 0 <= self.index < self.count:
+            raise ValueError(
+                f"Shard index {self.index} out of range for {self.count} shards"
+            )
+
+    @classmethod
+    def parse(cls, value: str) -> Shard:
+        """Parse ``"i/N"`` (zero-based ``i``)."""
+        index, _, count = value.partition("/")
+        return cls(int(index), int(count))
+
+    @property
+    def name(self) -> str:
+        return f"shard-{self.index}-of-{self.count}"
+
+    def split(self, processes: int) -> list[Shard]:
+        """Divide this shard between ``processes`` local worker processes.
+
+        Every key of a sub-shard also belongs to this shard, so machines may
+        use different process counts.
+        """
+        count = self.count * processes
+        return [Shard(self.index + j * self.count, count) for j in range(processes)]
+
+    def owns(self, key: str) -> bool:
+        digest = hashlib.sha1(key.encode()).digest()
+        return int.from_bytes(digest[:8], "big") % self.count == self.index
+
+    def owns_slot(self, slot: int) -> bool:
+        """Whether numbered work item ``slot`` is ours; neighbours go elsewhere."""
+        return slot % self.count == self.index
+
+
+def covers(shards: list[Shard]) -> bool:
+    """Whether ``shards`` together own every key, each exactly once."""
+    if not shards:
+        return False
+    total = math.lcm(*(s.count for s in shards))
+    owners = Counter(r for s in shards for r in range(s.index, total, s.count))
+    return len(owners) == total and set(owners.values()) == {1}
+
+
+def current() -> Shard | None:
+    return _current.get()
+
+
+def set_shard(shard: Shard | None) -> None:
+    _current.set(shard)
+
+
+def owns(key: str) -> bool:
+    """Whether the current shard is responsible for ``key`` (always true unsharded)."""
+    shard = _current.get()
+    return shard is None or shard.owns(key)
+
+
+def owns_host(url: str) -> bool:
+    return owns(urlparse(url).hostname or url)
+
+
+def manifest_path(shard: Shard) -> Path:
+    return config.MANIFEST.with_name(f"sources.{shard.name}.sqlite3")
+
+
+def jobs_path(shard: Shard) -> Path:
+    return config.MANIFEST.with_name(f"jobs.{shard.name}.sqlite3")
+
+
+def analysis_path(shard: Shard) -> Path:
+    return config.MANIFEST.with_name(f"analysis.{shard.name}.sqlite3")
+
+
+def github_seen_path(shard: Shard) -> Path:
+    return config.MANIFEST.with_name(f"github-seen.{shard.name}.json")
+
+
+def shard_manifests() -> list[Path]:
+    return sorted(config.MANIFEST.parent.glob("sources.shard-*-of-*.sqlite3"))
+
+
+def github_seen_records() -> list[Path]:
+    return sorted(config.MANIFEST.parent.glob("github-seen.shard-*-of-*.json"))
+
+
+def merge_manifests(target: Path, sources: list[Path]) -> int:
+    """Fold per-shard manifests into ``target``; returns the number of new files.
+
+    File rows already present in ``target`` (same filename, sha256 and URL)
+    are not duplicated, so merging the same shard twice is harmless.
+    Validators, GitHub blobs and page fingerprints are upserted.
+    """
+    conn = sqlite3.connect(target)
+    conn.execute("PRAGMA busy_timeout=30000")
+    conn.executescript(SCHEMA)
+    added = 0
+    for source in sources:
+        conn.execute("ATTACH DATABASE ? AS shard", (str(source),))
+        with conn:
+            cur = conn.execute(
+                "INSERT INTO files (filename, sha256, source_url, downloaded_at)"
+                " SELECT s.filename, s.sha256, s.source_url, s.downloaded_at"
+                " FROM shard.files AS s WHERE NOT EXISTS ("
+                "  SELECT 1 FROM files AS f WHERE f.source_url = s.source_url"
+                "  AND f.sha256 = s.sha256 AND f.filename = s.filename)"
+                " ORDER BY s.id"
+            )
+            added += cur.rowcount
+            conn.execute(
+                "INSERT OR REPLACE INTO validators SELECT * FROM shard.validators"
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO github_blobs SELECT * FROM shard.github_blobs"
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO page_fingerprints"
+                " SELECT * FROM shard.page_fingerprints"
+            )
+        conn.execute("DETACH DATABASE shard")
+        logger.info("Merged %s", source.name)
+    conn.close()
+    return added
+
+
+def write_github_seen(
+    shard: Shard, seen: Iterable[tuple[str, str]], complete: bool
+) -> None:
+    """Record the GitHub files ``shard``'s slices of code search found."""
+    record = {
+        "shard": f"{shard.index}/{shard.count}",
+        "complete": complete,
+        "seen": sorted(seen),
+    }
+    github_seen_path(shard).write_text(json.dumps(record))
+
+
+def remove_unseen_github_blobs(target: Path, records: list[Path]) -> int:
+    """Drop GitHub blobs from ``target`` that no shard's search found.
+
+    This only happens when the shards of ``records`` together cover every key
+    and each finished its search without gaps; otherwise nothing is removed.
+    The records are consumed either way, so a later merge never mixes them
+    with those of another run. Returns the number of blobs removed.
+    """
+    shards: list[Shard] = []
+    seen: set[tuple[str, str]] = set()
+    complete = True
+    for path in records:
+        record = json.loads(path.read_text())
+        shards.append(Shard.parse(record["shard"]))
+        complete = complete and bool(record["complete"])
+        seen.update((repo, name) for repo, name in record["seen"])
+    removed: list[tuple[str, str]] = []
+    if complete and covers(shards):
+        conn = sqlite3.connect(target)
+        known = conn.execute("SELECT repo, path FROM github_blobs").fetchall()
+        removed = sorted(k for k in known if k not in seen)
+        with conn:
+            conn.executemany(
+                "DELETE FROM github_blobs WHERE repo = ? AND path = ?", removed
+            )
+        conn.close()
+        for repo, name in removed:
+            logger.info("No longer in search results: %s/%s", repo, name)
+        if removed:
+            logger.warning("GitHub sync: %s files disappeared upstream", len(removed))
+    elif records:
+        logger.warning(
+            "GitHub search of %s shards incomplete; not checking for removed files",
+            len(records),
+        )
+    for path in records:
+        path.unlink()
+    return len(removed)
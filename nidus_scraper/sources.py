@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import importlib
+from collections.abc import Awaitable, Callable
+from importlib import metadata
+
+# Third-party sources register a crawler under this entry point group, e.g.
+#   [project.entry-points."nidus_scraper.sources"]
+#   cad = "my_package.cad:crawl_cad"
+# A crawler is called as crawler(session, workers) and downloads into the
+# manifest like the built-in ones.
+GROUP = "nidus_scraper.sources"
+
+# Built-in sources, imported only when selected. They are also registered as
+# entry points, but are found here without scanning installed packages.
+BUILTIN = {
+    "urdf": "nidus_scraper.github:crawl_github",
+    "vendor": "nidus_scraper.vendors:crawl_vendors",
+    "pages": "nidus_scraper.vendor_pages:crawl_vendor_pages",
+    "standards": "nidus_scraper.standards:crawl_standards",
+}
+
+Crawler = Callable[..., Awaitable[None]]
+
+
+def _plugins() -> dict[str, metadata.EntryPoint]:
+    return {ep.name: ep for ep in metadata.entry_points(group=GROUP)}
+
+
+def available() -> list[str]:
+    """Names of every source: built-ins first, then installed plugins."""
+    return [*BUILTIN, *sorted(_plugins().keys() - BUILTIN.keys())]
+
+
+def unknown(names: list[str]) -> list[str]:
+    """The names in ``names`` that are neither built in nor an installed plugin.
+
+    Installed packages are only scanned when a name is not built in.
+    """
+    missing = [name for name in names if name not in BUILTIN]
+    if not missing:
+        return []
+    plugins = _plugins()
+    return [name for name in missing if name not in plugins]
+
+
+def load(name: str) -> Crawler:
+    """Import the crawler of source ``name``; built-ins take precedence over plugins."""
+    target = BUILTIN.get(name)
+    if target is not None:
+        module, _, attr = target.partition(":")
+        crawler: Crawler = getattr(importlib.import_module(module), attr)
+        return crawler
+    plugin = _plugins().get(name)
+    if plugin is None:
+        names = ", ".join(available())
+        raise ValueError(f"Unknown source {name!r} (available: {names})")
+    loaded: Crawler = plugin.load()
+    return loaded
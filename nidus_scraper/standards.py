@@ -1,59 +1,52 @@
 from __future__ import annotations
 # pragma: no cover
 
-import asyncio
 from pathlib import Path
 
 from aiohttp import ClientSession
 
-from .config import DATA_DIR, logger
-from .utils import retry, save_file, update_manifest
+from .blobs import url_path
+from . import config
+from .config import logger
+from .jobs import run_jobs
+from .sharding import owns_host
+from .utils import DownloadResult, fetch_to_file, retry, update_manifest
 
 STANDARD_URLS = [
-
-    "https://raw.githubusercontent.com/openjaus/openjaus-toolset/master/schema/jaus.xsd",
-    "https://raw.githubusercontent.com/openjaus/openjaus-toolset/master/schema/jaus-mobility.xsd",
-    "https://example.com/stanag-4586-rev-c.pdf",
-=======
- # XML schema files (stay the same)
+    # XML schema files
     "https://raw.githubusercontent.com/openjaus/openjaus-toolset/master/schema/jaus.xsd",
     "https://raw.githubusercontent.com/openjaus/openjaus-toolset/master/schema/jaus-mobility.xsd",
     # Actual STANAG 4586 PDF
     "https://archives.defense.gouv.fr/content/download/552732/9407966/file/4586eed3draft.pdf",
-
 ]
 
 
 async def download_standard(session: ClientSession, url: str, dest: Path) -> None:
-    async def _get() -> bytes:
-        async with session.get(url) as resp:
-            resp.raise_for_status()
-            return await resp.read()
-
     try:
-        content = await retry(_get)
+        result: DownloadResult | None = await retry(
+            lambda: fetch_to_file(session, url, dest), url=url
+        )
     except Exception as exc:  # noqa: BLE001 - network errors
         logger.warning("Failed to download %s: %s", url, exc)
         return
+    if result is None:
+        return
 
     try:
-        await save_file(dest, content)
-        await update_manifest(dest, url)
+        await update_manifest(dest, url, result.sha256)
         logger.info("Saved %s", dest)
     except Exception as exc:  # noqa: BLE001 - file errors
         logger.warning("Failed to save %s: %s", dest, exc)
 
 
 async def crawl_standards(session: ClientSession, workers: int = 4) -> None:
-    sem = asyncio.Semaphore(workers)
-    tasks = []
-    for url in STANDARD_URLS:
-        filename = url.split("/")[-1]
-        dest = DATA_DIR / "standards" / filename
-
-        async def worker(u: str = url, p: Path = dest) -> None:
-            async with sem:
-                await download_standard(session, u, p)
-
-        tasks.append(asyncio.create_task(worker()))
-    await asyncio.gather(*tasks, return_exceptions=True)
+    jobs = [
+        (url, url_path(config.DATA_DIR / "standards", url))
+        for url in STANDARD_URLS
+        if owns_host(url)
+    ]
+
+    async def download(job: tuple[str, Path]) -> None:
+        await download_standard(session, *job)
+
+    await run_jobs("standards", jobs, download, workers)
@@ -0,0 +1,318 @@
+from __future__ import annotations
+
+import asyncio
+import bisect
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from types import SimpleNamespace, TracebackType
+from typing import Any
+
+from aiohttp import ClientSession, TraceConfig, web
+
+from .config import logger
+from . import scheduler
+
+# Upper bounds in seconds, shared by every histogram.
+BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+LAG_INTERVAL = 0.1
+
+Labels = tuple[tuple[str, str], ...]
+
+_current: ContextVar[Telemetry | None] = ContextVar("telemetry", default=None)
+
+
+def _labels(**labels: str) -> Labels:
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(labels: Labels, extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style."""
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the ``q`` quantile."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(BUCKETS, self.counts):
+            seen += n
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self) -> dict[str, float]:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "max": round(self.max, 6),
+        }
+
+
+class Telemetry:
+    """Counters, histograms and gauges for one crawl.
+
+    Entering the context makes it the active instance for the module-level
+    helpers (``stage``, ``count``, ``gauge_fn``), which are no-ops otherwise,
+    and starts the event-loop lag sampler. ``trace_config`` hooks per-host
+    DNS, connect and time-to-first-byte timings into a ``ClientSession``.
+    """
+
+    def __init__(self, lag_interval: float = LAG_INTERVAL) -> None:
+        self.lag_interval = lag_interval
+        self.counters: dict[str, dict[Labels, float]] = {}
+        self.histograms: dict[str, dict[Labels, Histogram]] = {}
+        self.gauges: dict[str, dict[Labels, float]] = {}
+        self._gauge_fns: dict[str, dict[Labels, Callable[[], float]]] = {}
+        self._started = time.monotonic()
+        self._lag_task: asyncio.Task[None] | None = None
+        self._token: Token[Telemetry | None] | None = None
+
+    async def __aenter__(self) -> Telemetry:
+        self._token = _current.set(self)
+        self._lag_task = asyncio.create_task(self._sample_lag())
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        if self._lag_task is not None:
+            self._lag_task.cancel()
+            await asyncio.gather(self._lag_task, return_exceptions=True)
+        if self._token is not None:
+            _current.reset(self._token)
+            self._token = None
+
+    def count(self, name: str, value: float = 1, **labels: str) -> None:
+        series = self.counters.setdefault(name, {})
+        key = _labels(**labels)
+        series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        series = self.histograms.setdefault(name, {})
+        key = _labels(**labels)
+        if key not in series:
+            series[key] = Histogram()
+        series[key].observe(value)
+
+    def gauge(self, name: str, delta: float, **labels: str) -> None:
+        series = self.gauges.setdefault(name, {})
+        key = _labels(**labels)
+        series[key] = series.get(key, 0) + delta
+
+    def gauge_fn(self, name: str, fn: Callable[[], float], **labels: str) -> None:
+        """Report ``fn()`` as a gauge whenever metrics are read."""
+        self._gauge_fns.setdefault(name, {})[_labels(**labels)] = fn
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        source = scheduler.current_source()
+        self.gauge("active_tasks", 1, stage=name, source=source)
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.count("stage_errors_total", stage=name, source=source)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self.observe("stage_seconds", elapsed, stage=name, source=source)
+            self.gauge("active_tasks", -1, stage=name, source=source)
+
+    async def _sample_lag(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.lag_interval)
+            lag = loop.time() - start - self.lag_interval
+            self.observe("loop_lag_seconds", max(lag, 0.0))
+
+    def trace_config(self) -> TraceConfig:
+        trace = TraceConfig()
+
+        async def request_start(
+            session: ClientSession, ctx: SimpleNamespace, params: Any
+        ) -> None:
+            ctx.host = params.url.host or ""
+            ctx.start = time.perf_counter()
+
+        async def request_end(
+            session: ClientSession, ctx: SimpleNamespace, params: Any
+        ) -> None:
+            self.observe("ttfb_seconds", time.perf_counter() - ctx.start, host=ctx.host)
+            status = str(params.response.status)
+            self.count("requests_total", host=ctx.host, status=status)
+
+        async def request_exception(
+            session: ClientSession, ctx: SimpleNamespace, params: Any
+        ) -> None:
+            error = type(params.exception).__name__
+            self.count("request_errors_total", host=ctx.host, error=error)
+
+        async def dns_start(
+            session: ClientSession, ctx: SimpleNamespace, params: Any
+        ) -> None:
+            ctx.dns_start = time.perf_counter()
+
+        async def dns_end(
+            session: ClientSession, ctx: SimpleNamespace, params: Any
+        ) -> None:
+            elapsed = time.perf_counter() - ctx.dns_start
+            self.observe("dns_seconds", elapsed, host=params.host)
+
+        async def connect_start(
+            session: ClientSession, ctx: SimpleNamespace, params: Any
+        ) -> None:
+            ctx.connect_start = time.perf_counter()
+
+        async def connect_end(
+            session: ClientSession, ctx: SimpleNamespace, params: Any
+        ) -> None:
+            elapsed = time.perf_counter() - ctx.connect_start
+            self.observe("connect_seconds", elapsed, host=ctx.host)
+
+        async def connection_reused(
+            session: ClientSession, ctx: SimpleNamespace, params: Any
+        ) -> None:
+            self.count("connections_reused_total", host=ctx.host)
+
+        hooks: list[tuple[Any, Any]] = [
+            (trace.on_request_start, request_start),
+            (trace.on_request_end, request_end),
+            (trace.on_request_exception, request_exception),
+            (trace.on_dns_resolvehost_start, dns_start),
+            (trace.on_dns_resolvehost_end, dns_end),
+            (trace.on_connection_create_start, connect_start),
+            (trace.on_connection_create_end, connect_end),
+            (trace.on_connection_reuseconn, connection_reused),
+        ]
+        for signal, callback in hooks:
+            signal.append(callback)
+        return trace
+
+    def _all_gauges(self) -> dict[str, dict[Labels, float]]:
+        gauges = {name: dict(series) for name, series in self.gauges.items()}
+        for name, fns in self._gauge_fns.items():
+            for key, fn in fns.items():
+                gauges.setdefault(name, {})[key] = fn()
+        return gauges
+
+    def summary(self) -> dict[str, Any]:
+        """Everything collected so far as plain JSON-serialisable data."""
+
+        def flat(labels: Labels) -> str:
+            return ",".join(f"{k}={v}" for k, v in labels) or "all"
+
+        return {
+            "elapsed_seconds": round(time.monotonic() - self._started, 3),
+            "counters": {
+                name: {flat(k): v for k, v in series.items()}
+                for name, series in sorted(self.counters.items())
+            },
+            "histograms": {
+                name: {flat(k): h.summary() for k, h in series.items()}
+                for name, series in sorted(self.histograms.items())
+            },
+            "gauges": {
+                name: {flat(k): v for k, v in series.items()}
+                for name, series in sorted(self._all_gauges().items())
+            },
+        }
+
+    def render_prometheus(self) -> str:
+        """Metrics in the Prometheus text exposition format."""
+        lines: list[str] = []
+        for name, series in sorted(self.counters.items()):
+            lines.append(f"# TYPE nidus_{name} counter")
+            for key, value in series.items():
+                lines.append(f"nidus_{name}{_format_labels(key)} {value}")
+        for name, gauges in sorted(self._all_gauges().items()):
+            lines.append(f"# TYPE nidus_{name} gauge")
+            for key, value in gauges.items():
+                lines.append(f"nidus_{name}{_format_labels(key)} {value}")
+        for name, hists in sorted(self.histograms.items()):
+            lines.append(f"# TYPE nidus_{name} histogram")
+            for key, h in hists.items():
+                cumulative = 0
+                for bound, n in zip((*BUCKETS, float("inf")), h.counts):
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    le_label = f'le="{le}"'
+                    labels = _format_labels(key, le_label)
+                    lines.append(f"nidus_{name}_bucket{labels} {cumulative}")
+                lines.append(f"nidus_{name}_sum{_format_labels(key)} {h.sum}")
+                lines.append(f"nidus_{name}_count{_format_labels(key)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    async def serve(self, port: int, host: str = "127.0.0.1") -> web.AppRunner:
+        """Expose ``/metrics`` on ``host:port``; clean up the returned runner."""
+
+        async def metrics(request: web.Request) -> web.Response:
+            return web.Response(
+                text=self.render_prometheus(), content_type="text/plain"
+            )
+
+        app = web.Application()
+        app.router.add_get("/metrics", metrics)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        logger.info("Serving metrics on http://%s:%s/metrics", host, port)
+        return runner
+
+
+def current() -> Telemetry | None:
+    return _current.get()
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time the enclosed block as stage ``name`` of the current source."""
+    telemetry = _current.get()
+    if telemetry is None:
+        yield
+        return
+    with telemetry.stage(name):
+        yield
+
+
+def count(name: str, value: float = 1, **labels: str) -> None:
+    """Add ``value`` to counter ``name``, labelled with the current source."""
+    telemetry = _current.get()
+    if telemetry is not None:
+        telemetry.count(name, value, source=scheduler.current_source(), **labels)
+
+
+def gauge_fn(name: str, fn: Callable[[], float], **labels: str) -> None:
+    telemetry = _current.get()
+    if telemetry is not None:
+        telemetry.gauge_fn(name, fn, **labels)
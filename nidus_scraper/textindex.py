@@ -0,0 +1,464 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gzip
+import heapq
+import importlib.util
+import io
+import json
+import math
+import mmap
+import multiprocessing
+import os
+import re
+import sqlite3
+import struct
+import time
+from collections import Counter
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from . import blobs, config
+from .config import logger
+
+PDF_SUFFIXES = {".pdf"}
+TEXT_SUFFIXES = {".xsd", ".xml", ".txt", ".md", ".html", ".htm"}
+TOKEN = re.compile(r"[a-z0-9]{2,32}")
+# New documents are indexed in segments of this many; more than MAX_SEGMENTS
+# segments are compacted into one.
+SEGMENT_DOCS = 2000
+MAX_SEGMENTS = 8
+# One posting: document id, term frequency.
+POSTING = struct.Struct("<II")
+LEX_OFFSET = struct.Struct("<Q")
+
+
+@dataclass(frozen=True)
+class Hit:
+    sha256: str
+    filename: str
+    score: float
+
+
+def index_root() -> Path:
+    return config.DATA_DIR / "textindex"
+
+
+def have_pdf() -> bool:
+    """Whether the optional ``pypdf`` dependency is installed (without importing it)."""
+    return importlib.util.find_spec("pypdf") is not None
+
+
+def tokenize(text: str) -> Iterator[str]:
+    return (m.group() for m in TOKEN.finditer(text.lower()))
+
+
+def extract_text(path: Path, sha256: str | None = None) -> str | None:
+    """Plain text of a PDF or text-like file; ``None`` when it cannot be read yet.
+
+    With ``sha256`` the content is read from the store when ``path`` was
+    deleted or is only kept in a pack. A file that cannot be read is ``None``
+    too, so it is retried later; only broken PDFs come out empty.
+    """
+    suffix = path.suffix.lower()
+    if suffix not in TEXT_SUFFIXES | PDF_SUFFIXES:
+        return None
+    if suffix in PDF_SUFFIXES and not have_pdf():
+        return None
+    try:
+        with blobs.open_stored(path, sha256) as f:
+            data = f.read()
+    except OSError as exc:
+        logger.warning("Could not read %s: %s", path, exc)
+        return None
+    if suffix in TEXT_SUFFIXES:
+        return data.decode(errors="replace")
+    from pypdf import PdfReader
+
+    try:
+        reader = PdfReader(io.BytesIO(data))
+        return "\n".join(page.extract_text() or "" for page in reader.pages)
+    except Exception as exc:  # noqa: BLE001 - broken PDFs are indexed as empty
+        logger.warning("Could not extract text from %s: %s", path, exc)
+        return ""
+
+
+def text_cache_path(root: Path, sha256: str) -> Path:
+    return root / "text" / sha256[:2] / f"{sha256}.txt.gz"
+
+
+def document_terms(root: Path, path: Path, sha256: str) -> dict[str, int] | None:
+    """Term frequencies of a document, extracting (and caching) its text if needed.
+
+    Runs in a worker process. Text is cached by sha256, so the same content
+    is never extracted twice, whichever path or crawl it came from.
+    """
+    cache = text_cache_path(root, sha256)
+    if cache.exists():
+        text = gzip.decompress(cache.read_bytes()).decode()
+    else:
+        extracted = extract_text(path, sha256)
+        if extracted is None:
+            return None
+        text = extracted
+        cache.parent.mkdir(parents=True, exist_ok=True)
+        tmp = cache.with_name(f".{cache.name}.{os.getpid()}")
+        tmp.write_bytes(gzip.compress(text.encode(), compresslevel=6))
+        tmp.replace(cache)
+    return dict(Counter(tokenize(text)))
+
+
+class Segment:
+    """Immutable on-disk inverted index over a range of documents.
+
+    ``<name>.lex`` holds ``term\\toffset\\tcount`` lines in term order,
+    ``<name>.lexidx`` the byte offset of each line and ``<name>.post`` the
+    postings; all three are memory-mapped and terms are found by binary
+    search, so opening a segment costs nothing however large it is.
+    """
+
+    def __init__(self, directory: Path, name: str) -> None:
+        self.directory = directory
+        self.name = name
+        self._files = [
+            open(directory / f"{name}.{ext}", "rb") for ext in ("lex", "lexidx", "post")
+        ]
+        self._lex, self._lexidx, self._post = (
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) for f in self._files
+        )
+        self.terms = len(self._lexidx) // LEX_OFFSET.size
+
+    def close(self) -> None:
+        for m in (self._lex, self._lexidx, self._post):
+            m.close()
+        for f in self._files:
+            f.close()
+
+    def _entry(self, i: int) -> tuple[bytes, int, int]:
+        start = LEX_OFFSET.unpack_from(self._lexidx, i * LEX_OFFSET.size)[0]
+        end = self._lex.find(b"\n", start)
+        term, offset, count = self._lex[start:end].split(b"\t")
+        return term, int(offset), int(count)
+
+    def entries(self) -> Iterator[tuple[bytes, int, int]]:
+        for i in range(self.terms):
+            yield self._entry(i)
+
+    def lookup(self, term: str) -> tuple[int, int] | None:
+        key = term.encode()
+        lo, hi = 0, self.terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            found, offset, count = self._entry(mid)
+            if found == key:
+                return offset, count
+            if found < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def read_postings(self, offset: int, count: int) -> Iterator[tuple[int, int]]:
+        start = offset * POSTING.size
+        return POSTING.iter_unpack(self._post[start : start + count * POSTING.size])
+
+    def postings(self, term: str) -> Iterator[tuple[int, int]]:
+        found = self.lookup(term)
+        return self.read_postings(*found) if found else iter(())
+
+    @staticmethod
+    def write(
+        directory: Path,
+        name: str,
+        postings: Iterable[tuple[str, Iterable[tuple[int, int]]]],
+    ) -> bool:
+        """Write ``(term, [(doc, tf), ...])`` pairs in term order.
+
+        Returns ``False`` if there was nothing to write.
+        """
+        offset = 0
+        with (
+            open(directory / f"{name}.lex", "wb") as lex,
+            open(directory / f"{name}.lexidx", "wb") as lexidx,
+            open(directory / f"{name}.post", "wb") as post,
+        ):
+            for term, docs in postings:
+                count = 0
+                for doc, tf in docs:
+                    post.write(POSTING.pack(doc, tf))
+                    count += 1
+                lexidx.write(LEX_OFFSET.pack(lex.tell()))
+                lex.write(f"{term}\t{offset}\t{count}\n".encode())
+                offset += count
+        if offset == 0:
+            Segment.remove(directory, name)
+            return False
+        return True
+
+    @staticmethod
+    def remove(directory: Path, name: str) -> None:
+        for ext in ("lex", "lexidx", "post"):
+            (directory / f"{name}.{ext}").unlink(missing_ok=True)
+
+
+class TextIndex:
+    """Incremental full-text index over the PDFs and documents in the manifest.
+
+    ``segments.json`` names the live segments and how many documents they
+    cover; it is replaced atomically after new segment files and document
+    rows are written, so an interrupted update leaves the previous index
+    intact.
+    """
+
+    def __init__(self, root: Path | None = None) -> None:
+        self.root = root or index_root()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.segments: list[Segment] = []
+        self.docs: list[tuple[str, str]] = []
+        self._next_segment = 0
+        self.load()
+
+    @property
+    def _state(self) -> Path:
+        return self.root / "segments.json"
+
+    @property
+    def _docs(self) -> Path:
+        return self.root / "docs.tsv"
+
+    def load(self) -> None:
+        self.close()
+        state: dict[str, Any] = {"segments": [], "docs": 0, "next": 0}
+        if self._state.exists():
+            state = json.loads(self._state.read_text())
+        self._next_segment = state["next"]
+        self.docs = []
+        if self._docs.exists():
+            with open(self._docs) as f:
+                for line in f:
+                    if len(self.docs) == state["docs"]:
+                        break
+                    sha256, filename = line.rstrip("\n").split("\t", 1)
+                    self.docs.append((sha256, filename))
+        self.segments = [Segment(self.root, name) for name in state["segments"]]
+        self._indexed = {sha for sha, _ in self.docs}
+
+    def close(self) -> None:
+        for segment in self.segments:
+            segment.close()
+        self.segments = []
+
+    def _commit(self, segments: list[str]) -> None:
+        state = {
+            "segments": segments, "docs": len(self.docs), "next": self._next_segment
+        }
+        tmp = self._state.with_suffix(".tmp")
+        tmp.write_text(json.dumps(state))
+        tmp.replace(self._state)
+
+    def _new_segment_name(self) -> str:
+        self._next_segment += 1
+        return f"seg-{self._next_segment:06d}"
+
+    def has(self, sha256: str) -> bool:
+        return sha256 in self._indexed
+
+    async def update(
+        self,
+        files: Iterable[tuple[str, str]] | None = None,
+        processes: int = 2,
+        executor: Executor | None = None,
+    ) -> int:
+        """Index new ``(filename, sha256)`` pairs (by default, the whole manifest)."""
+        todo: dict[str, Path] = {}
+        for filename, sha256 in files if files is not None else manifest_files():
+            path = Path(filename)
+            suffix = path.suffix.lower()
+            if (
+                sha256 in self._indexed
+                or sha256 in todo
+                or suffix not in PDF_SUFFIXES | TEXT_SUFFIXES
+                or not blobs.present(path, sha256)
+            ):
+                continue
+            todo[sha256] = path
+        if not todo:
+            return 0
+        has_pdfs = any(p.suffix.lower() in PDF_SUFFIXES for p in todo.values())
+        if has_pdfs and not have_pdf():
+            logger.warning("pypdf is not installed; PDFs are skipped until it is")
+        pool = executor or ProcessPoolExecutor(
+            processes, mp_context=multiprocessing.get_context("spawn")
+        )
+        loop = asyncio.get_running_loop()
+        added = 0
+        try:
+            items = list(todo.items())
+            for i in range(0, len(items), SEGMENT_DOCS):
+                batch = items[i : i + SEGMENT_DOCS]
+                results = await asyncio.gather(
+                    *(
+                        loop.run_in_executor(pool, document_terms, self.root, path, sha)
+                        for sha, path in batch
+                    )
+                )
+                added += await asyncio.to_thread(self._add_segment, batch, results)
+        finally:
+            if executor is None:
+                pool.shutdown()
+        if len(self.segments) > MAX_SEGMENTS:
+            await asyncio.to_thread(self.compact)
+        logger.info("Text index: %s new documents, %s in total", added, len(self.docs))
+        return added
+
+    def _add_segment(
+        self, batch: list[tuple[str, Path]], results: list[dict[str, int] | None]
+    ) -> int:
+        postings: dict[str, list[tuple[int, int]]] = {}
+        new_docs: list[tuple[str, str]] = []
+        for (sha256, path), terms in zip(batch, results):
+            if terms is None:
+                continue
+            doc = len(self.docs) + len(new_docs)
+            new_docs.append((sha256, str(path)))
+            for term, tf in terms.items():
+                postings.setdefault(term, []).append((doc, tf))
+        if not new_docs:
+            return 0
+        name = self._new_segment_name()
+        written = Segment.write(self.root, name, sorted(postings.items()))
+        with open(self._docs, "r+" if self._docs.exists() else "w") as f:
+            # Drop rows left behind by an update that never committed.
+            for _ in self.docs:
+                f.readline()
+            f.truncate(f.tell())
+            f.writelines(f"{sha}\t{filename}\n" for sha, filename in new_docs)
+        self.docs.extend(new_docs)
+        self._indexed.update(sha for sha, _ in new_docs)
+        names = [s.name for s in self.segments] + ([name] if written else [])
+        self._commit(names)
+        if written:
+            self.segments.append(Segment(self.root, name))
+        return len(new_docs)
+
+    def compact(self) -> None:
+        """Merge every segment into one."""
+        if len(self.segments) < 2:
+            return
+        started = time.perf_counter()
+        old = self.segments
+        name = self._new_segment_name()
+
+        def merged() -> Iterator[tuple[str, Iterator[tuple[int, int]]]]:
+            streams = [_tagged(seg) for seg in old]
+            current: bytes | None = None
+            parts: list[tuple[Segment, int, int]] = []
+            for term, seg, offset, count in heapq.merge(*streams, key=lambda e: e[0]):
+                if term != current and parts:
+                    yield _flush(current, parts)
+                    parts = []
+                current = term
+                parts.append((seg, offset, count))
+            if parts:
+                yield _flush(current, parts)
+
+        def _tagged(seg: Segment) -> Iterator[tuple[bytes, Segment, int, int]]:
+            for term, offset, count in seg.entries():
+                yield term, seg, offset, count
+
+        def _flush(
+            term: bytes | None, parts: list[tuple[Segment, int, int]]
+        ) -> tuple[str, Iterator[tuple[int, int]]]:
+            assert term is not None
+            # Segments are in document order, so concatenating keeps postings sorted.
+            chunks = [seg.read_postings(offset, count) for seg, offset, count in parts]
+            return term.decode(), (p for chunk in chunks for p in chunk)
+
+        Segment.write(self.root, name, merged())
+        self._commit([name])
+        self.segments = [Segment(self.root, name)]
+        for seg in old:
+            seg.close()
+            Segment.remove(self.root, seg.name)
+        logger.info(
+            "Compacted %s segments in %.1fs", len(old), time.perf_counter() - started
+        )
+
+    def search(self, query: str, limit: int = 20) -> list[Hit]:
+        """Documents containing every term of ``query``, best tf-idf score first."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self.docs:
+            return []
+        n = len(self.docs)
+        scores: dict[int, float] | None = None
+        for term in terms:
+            tfs: dict[int, int] = {}
+            for seg in self.segments:
+                for doc, tf in seg.postings(term):
+                    if doc < n:
+                        tfs[doc] = tf
+            if not tfs:
+                return []
+            idf = math.log(1 + n / len(tfs))
+            if scores is None:
+                scores = {doc: (1 + math.log(tf)) * idf for doc, tf in tfs.items()}
+            else:
+                scores = {
+                    doc: score + (1 + math.log(tfs[doc])) * idf
+                    for doc, score in scores.items()
+                    if doc in tfs
+                }
+        assert scores is not None
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return [Hit(*self.docs[doc], round(score, 4)) for doc, score in best]
+
+
+def manifest_files() -> Iterator[tuple[str, str]]:
+    from .manifest import default_path as manifest_path
+
+    if not manifest_path().exists():
+        return
+    conn = sqlite3.connect(manifest_path())
+    try:
+        yield from conn.execute("SELECT filename, sha256 FROM files ORDER BY id")
+    finally:
+        conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Full-text index of downloaded documents"
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    update = sub.add_parser("update", help="Index documents added to the manifest")
+    update.add_argument("--processes", type=int, default=2)
+    search = sub.add_parser("search", help="Find documents containing every word")
+    search.add_argument("query")
+    search.add_argument("--limit", type=int, default=20)
+    sub.add_parser("compact", help="Merge all index segments into one")
+    args = parser.parse_args()
+    config.configure()
+
+    index = TextIndex()
+    try:
+        if args.command == "update":
+            asyncio.run(index.update(processes=args.processes))
+        elif args.command == "compact":
+            index.compact()
+        else:
+            started = time.perf_counter()
+            hits = index.search(args.query, args.limit)
+            for hit in hits:
+                print(f"{hit.score:8.3f}  {hit.filename}")
+            elapsed = 1000 * (time.perf_counter() - started)
+            print(f"{len(hits)} hits in {elapsed:.1f} ms")
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,11 +4,25 @@ import asyncio
 import hashlib
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Awaitable, Callable
+from typing import Any, Awaitable, Callable, NamedTuple
 
 import aiofiles  # type: ignore
+from aiohttp import ClientResponse, ClientSession
 
-from .config import MANIFEST, logger
+from . import blobs, retries
+from .connections import accept_encoding
+from .config import logger
+from .manifest import Manifest, ManifestEntry, Validators, using
+from .scheduler import slot
+from .telemetry import count, stage
+
+CHUNK_SIZE = 64 * 1024
+
+
+class DownloadResult(NamedTuple):
+    size: int
+    sha256: str
+    deduplicated: bool = False
 
 
 async def save_file(path: Path, content: bytes) -> None:
@@ -17,38 +31,200 @@ async def save_file(path: Path, content: bytes) -> None:
         await f.write(content)
 
 
+async def stream_to_file(
+    resp: ClientResponse,
+    dest: Path,
+    chunk_size: int = CHUNK_SIZE,
+    partial: Path | None = None,
+    resume: bool = False,
+    expected_size: int | None = None,
+) -> DownloadResult:
+    """Write the body of ``resp`` to ``dest`` chunk by chunk, hashing as it goes.
+
+    The body is spooled to a temporary file in the blob store, committed under
+    its sha256 and then linked to ``dest``. A failed transfer never leaves a
+    truncated file, and content that is already stored is not kept twice.
+
+    When ``partial`` is given the body is spooled there instead and the file
+    survives a failed transfer; with ``resume`` the body is appended to what
+    ``partial`` already holds. ``expected_size`` rejects short transfers before
+    they are committed.
+    """
+    tmp = partial or blobs.temp_path(prefix=f"{dest.name}.")
+    h = hashlib.sha256()
+    size = 0
+    if resume:
+        size = tmp.stat().st_size
+        await asyncio.to_thread(_hash_into, h, tmp)
+    try:
+        async with aiofiles.open(tmp, "ab" if resume else "wb") as f:
+            async for chunk in resp.content.iter_chunked(chunk_size):
+                h.update(chunk)
+                size += len(chunk)
+                await f.write(chunk)
+        if expected_size is not None and size != expected_size:
+            raise ValueError(f"Short transfer: got {size} of {expected_size} bytes")
+        with stage("save"):
+            created = await asyncio.to_thread(blobs.store, tmp, h.hexdigest(), dest)
+    except BaseException:
+        if partial is None:
+            tmp.unlink(missing_ok=True)
+        raise
+    if not created:
+        logger.info("Deduplicated %s -> %s", dest, h.hexdigest())
+    return DownloadResult(size, h.hexdigest(), not created)
+
+
+def store_file(src: Path, dest: Path) -> DownloadResult:
+    """Move an already written file ``src`` into the blob store as ``dest``."""
+    sha256 = hash_file(src)
+    size = src.stat().st_size
+    created = blobs.store(src, sha256, dest)
+    return DownloadResult(size, sha256, not created)
+
+
+def _expected_size(resp: ClientResponse, offset: int) -> int | None:
+    content_range = resp.headers.get("Content-Range", "")
+    if content_range.startswith("bytes ") and not content_range.endswith("/*"):
+        return int(content_range.rsplit("/", 1)[1])
+    if resp.headers.get("Content-Encoding", "identity") != "identity":
+        return None
+    if resp.content_length is not None:
+        return offset + resp.content_length
+    return None
+
+
+async def fetch_to_file(
+    session: ClientSession,
+    url: str,
+    dest: Path,
+    headers: dict[str, str] | None = None,
+) -> DownloadResult | None:
+    """Conditionally GET ``url`` into ``dest``.
+
+    Validators from the previous fetch are replayed as ``If-None-Match`` /
+    ``If-Modified-Since``; ``None`` is returned when the server answers 304,
+    after relinking ``dest`` from the stored content if it was deleted.
+
+    Bodies are spooled to a partial file per URL and destination that
+    outlives failed transfers. If one is found, the download continues with
+    a ``Range`` request for the unencoded body, guarded by ``If-Range``;
+    servers that ignore it send the whole body again, which replaces the
+    partial file. Bodies sent compressed are never resumed.
+    """
+    # Outside a run this opens one manifest for both the lookup and the update.
+    async with using() as manifest:
+        return await _fetch_to_file(manifest, session, url, dest, headers)
+
+
+async def _fetch_to_file(
+    manifest: Manifest,
+    session: ClientSession,
+    url: str,
+    dest: Path,
+    headers: dict[str, str] | None,
+) -> DownloadResult | None:
+    request_headers = {"Accept-Encoding": accept_encoding(url), **(headers or {})}
+    partial = blobs.partial_path(url, dest)
+    partial_validator = blobs.read_partial_validator(partial)
+    offset = partial.stat().st_size if partial.exists() and partial_validator else 0
+    cached: Validators | None = None
+    if offset:
+        assert partial_validator is not None
+        # The partial file holds decoded bytes; a range of an encoded body would
+        # not line up with it.
+        request_headers["Accept-Encoding"] = "identity"
+        request_headers["Range"] = f"bytes={offset}-"
+        request_headers["If-Range"] = partial_validator
+    else:
+        cached = await manifest.get_validators(url)
+        if cached is not None and blobs.present(dest, cached.sha256):
+            request_headers.update(cached.conditional_headers())
+    async with slot(url) as request:
+        with stage("fetch"):
+            async with session.get(url, headers=request_headers) as resp:
+                request.first_byte()
+                if resp.status == 304:
+                    logger.info("Not modified: %s", url)
+                    count("not_modified_total")
+                    if cached is not None:
+                        # The file may be gone while its content is still stored.
+                        await asyncio.to_thread(blobs.restore, dest, cached.sha256)
+                    return None
+                if resp.status == 416:
+                    blobs.discard_partial(partial)
+                resp.raise_for_status()
+                resume = resp.status == 206 and offset > 0
+                if resume and not resp.headers.get("Content-Range", "").startswith(
+                    f"bytes {offset}-"
+                ):
+                    blobs.discard_partial(partial)
+                    raise ValueError(f"Unexpected Content-Range from {url}")
+                if resume:
+                    logger.info("Resuming %s at %s bytes", url, offset)
+                etag = resp.headers.get("ETag")
+                last_modified = resp.headers.get("Last-Modified")
+                # Only strong validators may guard a byte range, and only an
+                # unencoded body can be resumed from its length on disk.
+                encoded = resp.headers.get("Content-Encoding", "identity") != "identity"
+                strong = etag if etag and not etag.startswith("W/") else last_modified
+                blobs.write_partial_validator(partial, None if encoded else strong)
+                result = await stream_to_file(
+                    resp,
+                    dest,
+                    partial=partial,
+                    resume=resume,
+                    expected_size=_expected_size(resp, offset if resume else 0),
+                )
+                blobs.discard_partial(partial)
+                validators = Validators(
+                    url,
+                    etag,
+                    last_modified,
+                    result.size,
+                    result.sha256,
+                    datetime.utcnow().isoformat(),
+                )
+    await manifest.put_validators(validators)
+    count("files_total")
+    count("bytes_total", result.size)
+    return result
+
+
+def _hash_into(h: Any, path: Path) -> None:
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+
+
 def hash_file(path: Path) -> str:
     h = hashlib.sha256()
     with open(path, "rb") as f:
-        for chunk in iter(lambda: f.read(8192), b""):
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
             h.update(chunk)
     return h.hexdigest()
 
 
 async def retry(
-    func: Callable[[], Awaitable[Any]], attempts: int = 3, base_delay: float = 1.0
+    func: Callable[[], Awaitable[Any]],
+    attempts: int | None = None,
+    base_delay: float | None = None,
+    url: str | None = None,
 ) -> Any:
-    exc: Exception | None = None
-    for i in range(attempts):
-        try:
-            return await func()
-        except Exception as e:  # noqa: BLE001
-            exc = e
-            delay = base_delay * 2**i
-            logger.warning("Retry %s/%s after %.1fs due to %s", i + 1, attempts, delay, e)
-            await asyncio.sleep(delay)
-    raise exc if exc else RuntimeError("Retry failed")
-
-
-async def update_manifest(path: Path, source_url: str) -> None:
-    sha = hash_file(path)
-    downloaded_at = datetime.utcnow().isoformat()
-    exists = MANIFEST.exists()
-    rows = []
-    if not exists:
-        rows.append(["filename", "sha256", "source_url", "downloaded_at"])
-    rows.append([str(path), sha, source_url, downloaded_at])
-    async with aiofiles.open(MANIFEST, "a") as f:
-        for row in rows:
-            line = ",".join(row) + "\n"
-            await f.write(line)
+    """Call ``func`` under the active :class:`~nidus_scraper.retries.RetryPolicy`.
+
+    Passing ``url`` puts the call behind that host's circuit breaker.
+    """
+    return await retries.current().call(func, url, attempts, base_delay)
+
+
+async def update_manifest(
+    path: Path, source_url: str, sha256: str | None = None
+) -> None:
+    with stage("manifest"):
+        if sha256 is None:
+            sha256 = await asyncio.to_thread(hash_file, path)
+        now = datetime.utcnow().isoformat()
+        entry = ManifestEntry(str(path), sha256, source_url, now)
+        async with using() as manifest:
+            await manifest.add(entry)
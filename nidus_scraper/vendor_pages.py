@@ -2,20 +2,34 @@ from __future__ import annotations
 
 import asyncio
 import json
+from collections.abc import AsyncIterator
+from datetime import datetime
 from pathlib import Path
 from typing import Iterable
 from urllib.parse import urljoin, urlparse
 
 import aiohttp
-from bs4 import BeautifulSoup, Tag
-from pyppeteer import launch  # type: ignore
 
-from .config import DATA_DIR, logger
-from .utils import retry, update_manifest
+from . import blobs, config, warc
+from .browser_pool import BrowserPool
+from .config import logger
+from .fingerprint import NEAR_DISTANCE, SimhashIndex, distance, page_fingerprint
+from .frontier import Frontier, canonical_url
+from .jobs import run_jobs
+from .links import anchor_hrefs, anchor_hrefs_async
+from .manifest import PageFingerprint, using
+from .pipeline import merge
+from .scheduler import slot
+from .sharding import owns
+from .telemetry import count, stage
+from .utils import retry, store_file, update_manifest
 
 VENDOR_JSON = Path(__file__).resolve().parent / "vendor_domains.json"
 KEYWORDS = {"product", "system", "platform", "solution", "capability", "hardware"}
 EXCLUDE = {"blog", "news", "careers", "privacy"}
+PAGES_PER_BROWSER = 4
+FETCHERS_PER_DOMAIN = 4
+DISCOVERY_DOMAINS = 16
 
 
 async def load_vendor_domains(path: Path = VENDOR_JSON) -> dict[str, list[str]]:
@@ -25,6 +39,13 @@ async def load_vendor_domains(path: Path = VENDOR_JSON) -> dict[str, list[str]]:
     try:
         data = json.loads(path.read_text())
         assert isinstance(data, dict)
+        if list(data) == ["urls"]:
+            # Flat list of seed URLs: group them by site.
+            grouped: dict[str, list[str]] = {}
+            for url in data["urls"]:
+                host = urlparse(url).netloc.lower().removeprefix("www.")
+                grouped.setdefault(host, []).append(url)
+            return grouped
         return {k: list(v) for k, v in data.items()}
     except Exception as exc:  # pragma: no cover - invalid json
         logger.warning("Failed to parse %s: %s", path, exc)
@@ -44,29 +65,60 @@ def is_candidate(href: str) -> bool:
 
 
 async def fetch_html(session: aiohttp.ClientSession, url: str) -> str:
+    async def get() -> str:
+        async with slot(url):
+            with stage("fetch"):
+                async with session.get(url) as resp:
+                    resp.raise_for_status()
+                    body = await resp.read()
+                    await warc.archive_response(
+                        str(resp.url),
+                        resp.status,
+                        resp.reason or "",
+                        resp.headers,
+                        body,
+                    )
+                    return await resp.text()
+
     try:
-        async with session.get(url) as resp:
-            if resp.status >= 400:
-                logger.warning("Fetch %s failed with %s", url, resp.status)
-                return ""
-            return await resp.text()
-    except Exception as exc:  # pragma: no cover - network
+        text: str = await retry(get, url=url)
+        return text
+    except Exception as exc:  # noqa: BLE001 - a dead page just yields no links
         logger.warning("Error fetching %s: %s", url, exc)
         return ""
 
 
 def extract_links(html: str, base_url: str) -> list[str]:
-    soup = BeautifulSoup(html, "html.parser")
-    links: list[str] = []
-    for a in soup.find_all("a", href=True):
-        if not isinstance(a, Tag):
-            continue
-        href_val = a.get("href")
-        if not href_val:
-            continue
-        href = urljoin(base_url, str(href_val))
-        links.append(href)
-    return links
+    return [urljoin(base_url, href) for href in anchor_hrefs(html)]
+
+
+async def extract_links_async(html: str, base_url: str) -> list[str]:
+    """:func:`extract_links` without blocking the event loop on large pages."""
+    return [urljoin(base_url, href) for href in await anchor_hrefs_async(html)]
+
+
+def keyword_score(url: str) -> int:
+    lower = url.lower()
+    return sum(kw in lower for kw in KEYWORDS)
+
+
+def product_frontier(
+    session: aiohttp.ClientSession,
+    domain: str,
+    max_depth: int = 2,
+    max_pages: int = 30,
+    fetchers: int = FETCHERS_PER_DOMAIN,
+) -> Frontier:
+    return Frontier(
+        fetch=lambda url: fetch_html(session, url),
+        extract_links=extract_links_async,
+        follow=lambda url: within_domain(url, domain) and is_candidate(url),
+        is_target=is_candidate,
+        score=keyword_score,
+        max_depth=max_depth,
+        max_pages=max_pages,
+        fetchers=fetchers,
+    )
 
 
 async def discover_product_pages(
@@ -76,61 +128,175 @@ async def discover_product_pages(
     max_depth: int = 2,
     max_pages: int = 30,
 ) -> set[str]:
-    visited: set[str] = set()
-    pages: set[str] = set()
-
-    async def crawl(url: str, depth: int) -> None:
-        if url in visited or depth > max_depth or len(pages) >= max_pages:
-            return
-        visited.add(url)
-        html = await fetch_html(session, url)
-        if not html:
-            return
-        if is_candidate(url):
-            pages.add(url)
-        for link in extract_links(html, url):
-            if not within_domain(link, domain):
-                continue
-            if link in visited:
-                continue
-            if is_candidate(link):
-                await crawl(link, depth + 1)
-
-    for seed in seeds:
-        await crawl(seed, 0)
-    return pages
-
-
-async def render_pdf(url: str, dest: Path) -> None:
-    async def _render() -> None:
-        browser = await launch(handleSIGINT=False, handleSIGTERM=False, handleSIGHUP=False)
-        page = await browser.newPage()
-        await page.goto(url, {"waitUntil": "networkidle2"})
-        await page.pdf({"path": str(dest), "printBackground": True})
-        await browser.close()
+    frontier = product_frontier(session, domain, max_depth, max_pages)
+    return {url async for url, _ in frontier.crawl(seeds)}
+
+
+def page_dest(domain: str, url: str) -> Path:
+    path = urlparse(url).path.strip("/").replace("/", "_") or "index"
+    return config.DATA_DIR / "html_product_pages" / domain / f"{path}.pdf"
+
+
+class RenderPlan:
+    """Decide which discovered pages are worth sending to Chromium.
+
+    A page is rendered only if its canonical URL is new or its visible text
+    changed. A page whose text nearly matches one that is already rendered
+    is recorded as pointing at that PDF instead.
+    """
+
+    def __init__(self, known: dict[str, PageFingerprint]) -> None:
+        self.known = known
+        self.index = SimhashIndex()
+        for key, page in known.items():
+            if Path(page.filename).exists():
+                self.index.add(key, int(page.simhash, 16))
+        self.pending: dict[str, PageFingerprint] = {}
+
+    def _filename(self, key: str) -> str:
+        page = self.pending.get(key) or self.known[key]
+        return page.filename
 
+    def decide(
+        self, url: str, dest: Path, fingerprint: int | None
+    ) -> tuple[str, PageFingerprint | None]:
+        """Return ``("render" | "unchanged" | "duplicate", record)``.
+
+        The record of a page to render is held back until :meth:`rendered`.
+        """
+        if fingerprint is None:
+            return "render", None
+        key = canonical_url(url)
+        old = self.known.get(key)
+        if (
+            old is not None
+            and Path(old.filename).exists()
+            and distance(fingerprint, int(old.simhash, 16)) <= NEAR_DISTANCE
+        ):
+            return "unchanged", None
+        now = datetime.utcnow().isoformat()
+        original = self.index.near(fingerprint, exclude=key)
+        if original is not None:
+            target = self._filename(original)
+            duplicate = PageFingerprint(key, url, f"{fingerprint:016x}", target, now)
+            return "duplicate", duplicate
+        page = PageFingerprint(key, url, f"{fingerprint:016x}", str(dest), now)
+        self.pending[key] = page
+        self.index.add(key, fingerprint)
+        return "render", None
+
+    async def consider(self, url: str, dest: Path, html: str) -> bool:
+        """Whether ``url`` needs rendering; records near-duplicates in the manifest."""
+        with stage("parse"):
+            fingerprint = await asyncio.to_thread(page_fingerprint, html)
+        action, page = self.decide(url, dest, fingerprint)
+        if action == "render":
+            return True
+        count("pages_skipped_total", reason=action)
+        if page is not None:
+            logger.info("%s duplicates %s", url, page.filename)
+            async with using() as manifest:
+                await manifest.put_page_fingerprint(page)
+        return False
+
+    async def finish(self, url: str, ok: bool) -> None:
+        page = self.rendered(url, ok)
+        if page is not None:
+            async with using() as manifest:
+                await manifest.put_page_fingerprint(page)
+
+    def rendered(self, url: str, ok: bool) -> PageFingerprint | None:
+        """Release the held-back record of ``url`` once its render finished."""
+        key = canonical_url(url)
+        page = self.pending.pop(key, None)
+        if page is None:
+            return None
+        if not ok:
+            self.index.remove(key)
+            return None
+        self.known[key] = page
+        return page
+
+
+async def _render_in_slot(url: str, tmp: Path, pool: BrowserPool) -> None:
+    async with slot(url):
+        with stage("render"):
+            await pool.render_pdf(url, str(tmp))
+
+
+async def render_pdf(
+    url: str, dest: Path, pool: BrowserPool, html: str | None = None
+) -> bool:
+    """Render ``url`` to ``dest``; with ``html``, from that markup and offline."""
+    tmp = blobs.temp_path(prefix=f"{dest.name}.")
     try:
-        await retry(_render)
-        await update_manifest(dest, url)
+        if html is None:
+            # Each attempt takes its own slot, so backoff sleeps hold none.
+            await retry(lambda: _render_in_slot(url, tmp, pool), url=url)
+        else:
+            with stage("render"):
+                await pool.render_html(html, str(tmp))
+        with stage("save"):
+            result = await asyncio.to_thread(store_file, tmp, dest)
+        await update_manifest(dest, url, result.sha256)
         logger.info("Saved %s", dest)
+        return True
     except Exception as exc:  # pragma: no cover - browser errors
         logger.warning("Failed to render %s: %s", url, exc)
+        tmp.unlink(missing_ok=True)
+        return False
+
 
+async def archive_vendor_pages(session: aiohttp.ClientSession) -> None:
+    """Discover product pages into the active WARC archive without rendering them."""
+
+    async def discover_domain(
+        domain: str, seeds: list[str]
+    ) -> AsyncIterator[tuple[str, str]]:
+        async for found in product_frontier(session, domain).crawl(seeds):
+            yield found
 
-async def crawl_vendor_pages(session: aiohttp.ClientSession, workers: int = 4) -> None:
     domains = await load_vendor_domains()
-    tasks: list[asyncio.Task[None]] = []
-    sem = asyncio.Semaphore(workers)
-    for domain, seeds in domains.items():
-        pages = await discover_product_pages(session, seeds, domain)
-        for url in pages:
-            path = urlparse(url).path.strip("/").replace("/", "_") or "index"
-            dest = DATA_DIR / "html_product_pages" / domain / f"{path}.pdf"
+    streams = [discover_domain(d, seeds) for d, seeds in domains.items() if owns(d)]
+    pages = 0
+    async for _ in merge(streams, DISCOVERY_DOMAINS):
+        pages += 1
+    logger.info("Archived %s product pages for later rendering", pages)
+
+
+async def crawl_vendor_pages(
+    session: aiohttp.ClientSession, workers: int = 4, archive: bool = False
+) -> None:
+    """Discover and render product pages; with ``archive``, only discover them.
+
+    In archive mode every fetched page goes to the active
+    :class:`~nidus_scraper.warc.WarcWriter` and is rendered later by
+    ``python -m nidus_scraper.render``.
+    """
+    if archive:
+        await archive_vendor_pages(session)
+        return
+    async with using() as manifest:
+        plan = RenderPlan(await manifest.page_fingerprints())
+
+    async def discover_domain(
+        domain: str, seeds: list[str]
+    ) -> AsyncIterator[tuple[str, Path]]:
+        async for url, html in product_frontier(session, domain).crawl(seeds):
+            dest = page_dest(domain, url)
+            if await plan.consider(url, dest, html):
+                yield url, dest
+
+    async def discover() -> AsyncIterator[tuple[str, Path]]:
+        domains = await load_vendor_domains()
+        streams = [discover_domain(d, seeds) for d, seeds in domains.items() if owns(d)]
+        async for job in merge(streams, DISCOVERY_DOMAINS):
+            yield job
 
-            async def worker(u: str = url, p: Path = dest) -> None:
-                async with sem:
-                    await render_pdf(u, p)
+    browsers = -(-workers // PAGES_PER_BROWSER)
+    async with BrowserPool(browsers, PAGES_PER_BROWSER) as pool:
 
-            tasks.append(asyncio.create_task(worker()))
-    await asyncio.gather(*tasks, return_exceptions=True)
+        async def render(job: tuple[str, Path]) -> None:
+            await plan.finish(job[0], await render_pdf(*job, pool))
 
+        await run_jobs("pages", discover(), render, pool.capacity)
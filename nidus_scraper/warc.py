@@ -0,0 +1,298 @@
+from __future__ import annotations
+
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections.abc import Iterator, Mapping
+from contextvars import ContextVar, Token
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from types import TracebackType
+from typing import IO
+
+from . import config
+from .config import logger
+from .frontier import canonical_url
+from .telemetry import count, stage
+
+MAX_FILE_BYTES = 1024**3
+# Headers describing the transfer rather than the (already decoded) body.
+HOP_HEADERS = {"content-encoding", "transfer-encoding", "content-length", "connection"}
+SOFTWARE = "nidus-scraper"
+
+_current: ContextVar[WarcWriter | None] = ContextVar("warc_writer", default=None)
+
+
+@dataclass(frozen=True)
+class IndexEntry:
+    """Where one archived response lives: a line of a ``.cdxj`` sidecar."""
+
+    url: str
+    timestamp: str
+    status: int
+    mime: str
+    digest: str
+    filename: str
+    offset: int
+    length: int
+
+    @property
+    def key(self) -> str:
+        return canonical_url(self.url)
+
+    def line(self) -> str:
+        fields = {k: v for k, v in asdict(self).items() if k != "timestamp"}
+        return f"{self.key} {self.timestamp} {json.dumps(fields, sort_keys=True)}\n"
+
+    @classmethod
+    def parse(cls, line: str) -> IndexEntry:
+        _, timestamp, fields = line.split(" ", 2)
+        return cls(timestamp=timestamp, **json.loads(fields))
+
+
+@dataclass(frozen=True)
+class Record:
+    url: str
+    status: int
+    headers: dict[str, str]
+    body: bytes
+
+    @property
+    def mime(self) -> str:
+        return self.headers.get("content-type", "").split(";")[0].strip().lower()
+
+    def text(self) -> str:
+        charset = "utf-8"
+        for part in self.headers.get("content-type", "").split(";")[1:]:
+            name, _, value = part.strip().partition("=")
+            if name.lower() == "charset" and value:
+                charset = value.strip("\"'")
+        try:
+            return self.body.decode(charset, errors="replace")
+        except LookupError:
+            return self.body.decode("utf-8", errors="replace")
+
+
+def _timestamp() -> str:
+    """UTC time as CDXJ digits, to the microsecond so records of a URL stay ordered."""
+    return datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S%f")
+
+
+def default_dir() -> Path:
+    return config.DATA_DIR / "warc"
+
+
+def _warc_record(warc_type: str, headers: dict[str, str], block: bytes) -> bytes:
+    lines = [
+        "WARC/1.1",
+        f"WARC-Type: {warc_type}",
+        f"WARC-Record-ID: <urn:uuid:{uuid.uuid4()}>",
+        f"WARC-Date: {datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')}",
+        *(f"{k}: {v}" for k, v in headers.items()),
+        f"Content-Length: {len(block)}",
+    ]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode() + block + b"\r\n\r\n"
+
+
+def http_block(
+    status: int, reason: str, headers: Mapping[str, str], body: bytes
+) -> bytes:
+    """The HTTP response as it would have been sent for the decoded ``body``."""
+    lines = [f"HTTP/1.1 {status} {reason}"]
+    lines += [f"{k}: {v}" for k, v in headers.items() if k.lower() not in HOP_HEADERS]
+    lines.append(f"Content-Length: {len(body)}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1", errors="replace") + body
+
+
+def _parse_headers(block: bytes) -> tuple[str, dict[str, str]]:
+    first, *lines = block.decode("latin-1").split("\r\n")
+    headers: dict[str, str] = {}
+    for line in lines:
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return first, headers
+
+
+def read_record(path: Path, offset: int, length: int) -> Record:
+    """Read the single gzip member at ``offset`` of a ``.warc.gz`` file."""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = gzip.decompress(f.read(length))
+    warc_head, _, rest = data.partition(b"\r\n\r\n")
+    _, warc_headers = _parse_headers(warc_head)
+    block = rest[: int(warc_headers["content-length"])]
+    http_head, _, body = block.partition(b"\r\n\r\n")
+    status_line, headers = _parse_headers(http_head)
+    status = int(status_line.split()[1])
+    return Record(warc_headers["warc-target-uri"], status, headers, body)
+
+
+def read_entry(entry: IndexEntry, directory: Path | None = None) -> Record:
+    path = (directory or default_dir()) / entry.filename
+    return read_record(path, entry.offset, entry.length)
+
+
+def index_entries(directory: Path | None = None) -> Iterator[IndexEntry]:
+    """Every indexed record, oldest file first."""
+    for path in sorted((directory or default_dir()).glob("*.cdxj")):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    yield IndexEntry.parse(line)
+
+
+def latest_entries(directory: Path | None = None) -> dict[str, IndexEntry]:
+    """The most recent record of every URL, keyed by canonical URL."""
+    latest: dict[str, IndexEntry] = {}
+    for entry in index_entries(directory):
+        old = latest.get(entry.key)
+        if old is None or entry.timestamp >= old.timestamp:
+            latest[entry.key] = entry
+    return latest
+
+
+class WarcWriter:
+    """Append fetched responses to rotating ``.warc.gz`` files.
+
+    Every record is its own gzip member, so a record can be read back from
+    its offset alone; each WARC file has a ``.cdxj`` sidecar listing the
+    offsets. A response whose body is identical to the latest archived copy
+    of the same URL is not written again. Entering the context makes it the
+    archive used by :func:`archive_response`.
+    """
+
+    def __init__(
+        self,
+        directory: Path | None = None,
+        prefix: str = "pages",
+        max_bytes: int = MAX_FILE_BYTES,
+    ) -> None:
+        self.directory = directory or default_dir()
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.written = 0
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._file: IO[bytes] | None = None
+        self._index: IO[str] | None = None
+        self._name = ""
+        self._digests: dict[str, str] = {}
+        self._token: Token[WarcWriter | None] | None = None
+
+    async def __aenter__(self) -> WarcWriter:
+        await asyncio.to_thread(self.open)
+        self._token = _current.set(self)
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        if self._token is not None:
+            _current.reset(self._token)
+            self._token = None
+        await asyncio.to_thread(self.close)
+
+    def open(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        latest = latest_entries(self.directory)
+        self._digests = {key: e.digest for key, e in latest.items()}
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_file()
+        if self.written:
+            logger.info("Archived %s responses under %s", self.written, self.directory)
+
+    def _close_file(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        if self._index is not None:
+            self._index.close()
+        self._file = self._index = None
+
+    def _rotate(self) -> None:
+        self._close_file()
+        self._seq += 1
+        stamp = _timestamp()
+        self._name = f"{self.prefix}-{stamp}-{os.getpid()}-{self._seq:05d}.warc.gz"
+        self._file = open(self.directory / self._name, "ab")
+        self._index = open(self.directory / f"{self._name}.cdxj", "a")
+        info = f"software: {SOFTWARE}\r\nformat: WARC File Format 1.1\r\n".encode()
+        self._file.write(
+            gzip.compress(_warc_record("warcinfo", {"WARC-Filename": self._name}, info))
+        )
+
+    def write(
+        self,
+        url: str,
+        status: int,
+        reason: str,
+        headers: Mapping[str, str],
+        body: bytes,
+    ) -> IndexEntry | None:
+        """Archive one response; ``None`` if it is unchanged since the last copy."""
+        digest = "sha256:" + hashlib.sha256(body).hexdigest()
+        key = canonical_url(url)
+        mime = headers.get("Content-Type", "").split(";")[0].strip().lower()
+        block = http_block(status, reason, headers, body)
+        member = gzip.compress(
+            _warc_record(
+                "response",
+                {
+                    "WARC-Target-URI": url,
+                    "WARC-Payload-Digest": digest,
+                    "Content-Type": "application/http;msgtype=response",
+                },
+                block,
+            )
+        )
+        with self._lock:
+            if self._digests.get(key) == digest:
+                return None
+            if self._file is None or self._file.tell() >= self.max_bytes:
+                self._rotate()
+            assert self._file is not None and self._index is not None
+            offset = self._file.tell()
+            self._file.write(member)
+            self._file.flush()
+            entry = IndexEntry(
+                url,
+                _timestamp(),
+                status,
+                mime,
+                digest,
+                self._name,
+                offset,
+                len(member),
+            )
+            self._index.write(entry.line())
+            self._index.flush()
+            self._digests[key] = digest
+            self.written += 1
+        return entry
+
+
+def current() -> WarcWriter | None:
+    return _current.get()
+
+
+async def archive_response(
+    url: str, status: int, reason: str, headers: Mapping[str, str], body: bytes
+) -> None:
+    """Add a response to the active archive, if any."""
+    writer = _current.get()
+    if writer is None:
+        return
+    with stage("archive"):
+        entry = await asyncio.to_thread(
+            writer.write, url, status, reason, headers, body
+        )
+    count("warc_records_total", outcome="written" if entry else "unchanged")
@@ -0,0 +1,109 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from nidus_scraper import analysis
+from nidus_scraper.analysis import AnalysisIndex, Analyzer, analyze, merge_indexes
+
+ARM = """<?xml version="1.0"?>
+<robot name="arm">
+  <link name="base"><visual><geometry><mesh filename="package://arm/meshes/base.STL"/></geometry></visual></link>
+  <link name="upper"/>
+  <link name="gripper">
+    <collision><geometry><mesh filename="meshes/grip.dae"/></geometry></collision>
+  </link>
+  <joint name="shoulder" type="revolute">
+    <parent link="base"/><child link="upper"/>
+  </joint>
+  <joint name="slide" type="prismatic">
+    <parent link="upper"/><child link="gripper"/>
+  </joint>
+  <joint name="wrist" type="revolute">
+    <parent link="gripper"/><child link="hand"/>
+  </joint>
+  <transmission name="t">
+    <joint name="shoulder"><hardwareInterface>E</hardwareInterface></joint>
+  </transmission>
+</robot>
+"""
+
+XACRO = """<robot name="r" xmlns:xacro="http://www.ros.org/wiki/xacro">
+  <xacro:include filename="$(find arm)/urdf/arm.xacro"/>
+  <xacro:macro name="wheel"><link name="${name}"/></xacro:macro>
+</robot>
+"""
+
+SDF = """<sdf version="1.6"><model name="rover">
+  <link name="chassis"><visual name="v"><geometry><mesh><uri>model://rover/meshes/body.obj</uri></mesh></geometry></visual></link>
+  <link name="wheel"/>
+  <joint name="axle" type="continuous">
+    <parent>chassis</parent><child>wheel</child>
+  </joint>
+</model></sdf>
+"""
+
+
+def write(tmp_path: Path, name: str, text: str) -> Path:
+    path = tmp_path / name
+    path.write_text(text)
+    return path
+
+
+def test_analyze_urdf(tmp_path: Path) -> None:
+    desc = analyze(write(tmp_path, "arm.urdf", ARM), "a")
+
+    assert (desc.format, desc.robot, desc.links, desc.joints) == ("urdf", "arm", 3, 3)
+    assert desc.joint_types == {"revolute": 2, "prismatic": 1}
+    assert desc.meshes == ["package://arm/meshes/base.STL", "meshes/grip.dae"]
+    assert desc.errors == ["joint refers to missing link 'hand'"]
+
+
+def test_analyze_xacro_sdf_and_broken(tmp_path: Path) -> None:
+    xacro = analyze(write(tmp_path, "r.xacro", XACRO), "x")
+    assert xacro.includes == ["$(find arm)/urdf/arm.xacro"]
+    assert xacro.links == 1 and xacro.valid
+
+    sdf = analyze(write(tmp_path, "rover.sdf", SDF), "s")
+    assert (sdf.links, sdf.joints, sdf.meshes) == (2, 1, ["model://rover/meshes/body.obj"])
+    assert sdf.valid
+
+    broken = analyze(write(tmp_path, "bad.urdf", "<robot><link name='a'>"), "b")
+    assert not broken.valid
+    assert broken.errors[0].startswith("parse error")
+
+
+@pytest.mark.asyncio
+async def test_analyzer_indexes_each_sha_once(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    calls: list[str] = []
+
+    def counting_analyze(path: Path, sha256: str) -> analysis.Description:
+        calls.append(sha256)
+        return analyze(path, sha256)
+
+    monkeypatch.setattr(analysis, "analyze", counting_analyze)
+    index = AnalysisIndex(tmp_path / "analysis.sqlite3")
+    arm = write(tmp_path, "arm.urdf", ARM)
+    rover = write(tmp_path, "rover.sdf", SDF)
+
+    with ThreadPoolExecutor(2) as pool:
+        async with Analyzer(index, 2, executor=pool):
+            await analysis.submit(arm, "sha-arm")
+            await analysis.submit(arm, "sha-arm")
+            await analysis.submit(rover, "sha-rover")
+            await analysis.submit(tmp_path / "notes.txt", "sha-notes")
+        async with Analyzer(AnalysisIndex(index.path), 2, executor=pool):
+            await analysis.submit(arm, "sha-arm")
+
+    assert sorted(calls) == ["sha-arm", "sha-rover"]
+    async with AnalysisIndex(index.path) as idx:
+        assert [r[0] for r in await idx.query(min_joints=2)] == ["sha-arm"]
+        assert [r[0] for r in await idx.query(joint_type="continuous")] == ["sha-rover"]
+        assert [r[0] for r in await idx.query(mesh_format="stl")] == ["sha-arm"]
+        assert await idx.query(mesh_format="stl", valid=True) == []
+
+    target = tmp_path / "merged.sqlite3"
+    assert merge_indexes(target, [index.path]) == 2
+    assert merge_indexes(target, [index.path]) == 0
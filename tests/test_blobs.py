@@ -0,0 +1,63 @@
+from pathlib import Path
+
+import pytest
+
+from nidus_scraper import blobs, utils
+
+
+def test_identical_content_stored_once(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr("nidus_scraper.config.DATA_DIR", tmp_path)
+    results = []
+    for name in ("a/robot.urdf", "b/robot.urdf"):
+        src = blobs.temp_path()
+        src.write_bytes(b"<robot/>")
+        results.append(utils.store_file(src, tmp_path / name))
+
+    assert [r.deduplicated for r in results] == [False, True]
+    assert (tmp_path / "a/robot.urdf").samefile(tmp_path / "b/robot.urdf")
+    assert len(list((tmp_path / "blobs").glob("??/??/*"))) == 1
+
+
+def test_logical_paths_do_not_collide() -> None:
+    root = Path("/data")
+    assert blobs.url_path(root, "https://a.com/x/manual.pdf") == Path(
+        "/data/a.com/x/manual.pdf"
+    )
+    assert blobs.url_path(root, "https://b.com/../manual.pdf") == Path(
+        "/data/b.com/manual.pdf"
+    )
+    assert blobs.url_path(root, "https://a.com/get.pdf?id=1") != blobs.url_path(
+        root, "https://a.com/get.pdf?id=2"
+    )
+    assert blobs.url_path(root, "https://a.com/docs/") == Path(
+        "/data/a.com/docs/__index__"
+    )
+    # A page and the files below it, and the same host on another port.
+    assert blobs.url_path(root, "https://a.com/x") == Path("/data/a.com/x/__index__")
+    assert blobs.url_path(root, "https://user:pw@A.com:8443/x/manual.pdf") == Path(
+        "/data/a.com_8443/x/manual.pdf"
+    )
+    assert blobs.url_path(root, "https://a.com:443/x/manual.pdf") == Path(
+        "/data/a.com/x/manual.pdf"
+    )
+    # A file and a directory of the same name never clash.
+    assert blobs.url_path(root, "https://h.com/docs/v1.2") == Path(
+        "/data/h.com/docs/v1.2"
+    )
+    assert blobs.url_path(root, "https://h.com/docs/v1.2/manual.pdf") == Path(
+        "/data/h.com/docs/v1%2E2/manual.pdf"
+    )
+    assert blobs.url_path(root, "https://h.com/a/b.html") == Path(
+        "/data/h.com/a/b.html"
+    )
+    assert blobs.url_path(root, "https://h.com/a/b.html/c.pdf") == Path(
+        "/data/h.com/a/b%2Ehtml/c.pdf"
+    )
+    assert blobs.url_path(root, "https://h.com/__index__") == Path(
+        "/data/h.com/%5F_index__/__index__"
+    )
+    assert blobs.repo_path(root, "org/repo", "urdf/robot.urdf") == Path(
+        "/data/org/repo/urdf/robot.urdf"
+    )
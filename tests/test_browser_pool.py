@@ -0,0 +1,130 @@
+import asyncio
+from typing import Any
+
+import pytest
+
+from nidus_scraper.browser_pool import BrowserPool
+
+
+class FakePage:
+    def __init__(self, browser: "FakeBrowser") -> None:
+        self.browser = browser
+        self.closed = False
+        self.handlers: list[Any] = []
+        self.intercepting = False
+
+    def on(self, event: str, handler: Any) -> None:
+        self.handlers.append(handler)
+
+    async def setRequestInterception(self, value: bool) -> None:  # noqa: N802 - pyppeteer API
+        self.intercepting = value
+
+    async def setContent(self, html: str) -> None:  # noqa: N802 - pyppeteer API
+        assert self.intercepting
+        if "crash" in html:
+            raise RuntimeError("boom")
+        for url in ("https://cdn.example.com/app.css", "data:image/png;base64,AA=="):
+            request = FakeRequest(url)
+            for handler in self.handlers:
+                handler(request)
+            await asyncio.sleep(0)
+            self.browser.requests.append((url, request.outcome))
+
+    async def goto(self, url: str, options: dict[str, Any]) -> None:
+        if "crash" in url:
+            raise RuntimeError("boom")
+
+    async def pdf(self, options: dict[str, Any]) -> None:
+        self.browser.rendered.append(options["path"])
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+class FakeRequest:
+    def __init__(self, url: str) -> None:
+        self.url = url
+        self.outcome = ""
+
+    async def abort(self) -> None:
+        self.outcome = "aborted"
+
+    async def continue_(self) -> None:
+        self.outcome = "continued"
+
+
+class FakeBrowser:
+    def __init__(self) -> None:
+        self.rendered: list[str] = []
+        self.requests: list[tuple[str, str]] = []
+        self.closed = False
+
+    async def newPage(self) -> FakePage:  # noqa: N802 - pyppeteer API
+        return FakePage(self)
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+@pytest.mark.asyncio
+async def test_pool_reuses_and_recycles_browsers() -> None:
+    launched: list[FakeBrowser] = []
+
+    async def launcher(**options: Any) -> FakeBrowser:
+        launched.append(FakeBrowser())
+        return launched[-1]
+
+    pool = BrowserPool(
+        browsers=1, pages_per_browser=2, max_renders=3, launcher=launcher
+    )
+    async with pool:
+        for i in range(3):
+            await pool.render_pdf(f"https://example.com/{i}", f"{i}.pdf")
+        assert len(launched) == 2
+        assert launched[0].closed and not launched[1].closed
+
+        with pytest.raises(RuntimeError):
+            await pool.render_pdf("https://example.com/crash", "x.pdf")
+        await pool.render_pdf("https://example.com/after", "after.pdf")
+
+    assert launched[0].rendered == ["0.pdf", "1.pdf", "2.pdf"]
+    assert launched[1].rendered == ["after.pdf"]
+    assert all(b.closed for b in launched)
+
+
+@pytest.mark.asyncio
+async def test_render_html_stays_offline() -> None:
+    browser = FakeBrowser()
+
+    async def launcher(**options: Any) -> FakeBrowser:
+        return browser
+
+    async with BrowserPool(browsers=1, pages_per_browser=1, launcher=launcher) as pool:
+        await pool.render_html("<p>x</p>", "a.pdf")
+        await pool.render_html("<p>y</p>", "b.pdf")
+
+    assert browser.rendered == ["a.pdf", "b.pdf"]
+    # The handler is installed once per tab, and only inline data is let through.
+    assert browser.requests == [
+        ("https://cdn.example.com/app.css", "aborted"),
+        ("data:image/png;base64,AA==", "continued"),
+    ] * 2
+
+
+@pytest.mark.asyncio
+async def test_replaced_tab_stays_offline() -> None:
+    browser = FakeBrowser()
+
+    async def launcher(**options: Any) -> FakeBrowser:
+        return browser
+
+    async with BrowserPool(browsers=1, pages_per_browser=1, launcher=launcher) as pool:
+        with pytest.raises(RuntimeError):
+            await pool.render_html("<p>crash</p>", "a.pdf")
+        await pool.render_html("<p>y</p>", "b.pdf")
+
+    assert browser.rendered == ["b.pdf"]
+    assert browser.requests[-2:] == [
+        ("https://cdn.example.com/app.css", "aborted"),
+        ("data:image/png;base64,AA==", "continued"),
+    ]
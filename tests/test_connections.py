@@ -0,0 +1,44 @@
+import asyncio
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from nidus_scraper import connections
+from nidus_scraper.connections import Connections
+
+
+def test_accept_encoding() -> None:
+    assert connections.accept_encoding("https://a.com/manual.PDF?x=1") == "identity"
+    assert connections.accept_encoding("https://raw.a.com/r/robot.urdf").startswith("gzip")
+
+
+@pytest.mark.asyncio
+async def test_sources_share_a_pool_with_their_own_timeouts() -> None:
+    seen: list[str] = []
+
+    async def ok(request: web.Request) -> web.Response:
+        seen.append(request.headers.get("Accept-Encoding", ""))
+        return web.Response(text="<robot/>" * 100)
+
+    async def hang(request: web.Request) -> web.Response:
+        await asyncio.sleep(10)
+        return web.Response(text="late")
+
+    app = web.Application()
+    app.router.add_get("/ok", ok)
+    app.router.add_get("/hang", hang)
+    timeouts = {"fast": aiohttp.ClientTimeout(sock_read=0.1)}
+    async with TestServer(app) as server, Connections(timeouts=timeouts) as pool:
+        for source in ("fast", "slow", "fast"):
+            async with pool.session(source).get(server.make_url("/ok")) as resp:
+                await resp.text()
+        with pytest.raises(asyncio.TimeoutError):
+            async with pool.session("fast").get(server.make_url("/hang")) as resp:
+                await resp.text()
+
+    assert pool.connector is None
+    assert seen == [connections.text_encodings()] * 3
+    # Every request after the first, from either session, reuses its connection.
+    assert (pool.stats.requests, pool.stats.opened, pool.stats.reused) == (4, 1, 3)
@@ -0,0 +1,43 @@
+from nidus_scraper.fingerprint import (
+    SimhashIndex,
+    distance,
+    page_fingerprint,
+    simhash,
+    visible_text,
+)
+
+WORDS = " ".join(f"word{i % 97} term{i % 13}" for i in range(300))
+
+
+def test_visible_text_drops_markup() -> None:
+    html = (
+        "<html><head><style>p {color: red}</style>"
+        "<script>var x = '<p>';</script></head>"
+        "<body><!-- hidden --><p>Servo&nbsp;arm</p>"
+        "<svg><text>logo</text></svg></body></html>"
+    )
+    assert visible_text(html) == "Servo arm"
+
+
+def test_simhash_tolerates_small_edits() -> None:
+    base = simhash(WORDS)
+    edited = simhash(WORDS + " updated 2026")
+    other = simhash(" ".join(f"other{i} thing{i % 7}" for i in range(300)))
+    assert base is not None and edited is not None and other is not None
+    assert distance(base, edited) <= 6
+    assert distance(base, other) > 12
+    assert simhash("too short") is None
+    # Markup and scripts do not move the fingerprint.
+    assert page_fingerprint(f"<p>{WORDS}</p><script>track()</script>") == base
+
+
+def test_simhash_index_finds_near_keys() -> None:
+    index = SimhashIndex()
+    index.add("a", 0b1011 << 40)
+    index.add("b", (1 << 64) - 1)
+    assert index.near((0b1011 << 40) ^ 0b111) == "a"
+    assert index.near(0b1011 << 40, exclude="a") is None
+    assert index.near((1 << 32) - 1) is None
+    index.remove("a")
+    assert index.near(0b1011 << 40) is None
+    assert len(index) == 1
@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from nidus_scraper.frontier import (
+    Frontier,
+    canonical_url,
+    normalize_url,
+    strip_tracking,
+)
+
+
+def test_normalize_url() -> None:
+    assert normalize_url("HTTPS://Example.com:443/a/b/?y=2&x=1#top") == (
+        "https://example.com/a/b?x=1&y=2"
+    )
+    assert normalize_url("http://example.com") == "http://example.com/"
+    assert normalize_url("http://example.com:8080/") == "http://example.com:8080/"
+
+
+@pytest.mark.asyncio
+async def test_frontier_budget_and_priority() -> None:
+    in_flight = 0
+    peak = 0
+    fetched: list[str] = []
+
+    async def fetch(url: str) -> str:
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        fetched.append(url)
+        await asyncio.sleep(0.001)
+        in_flight -= 1
+        return "html"
+
+    async def links(html: str, url: str) -> list[str]:
+        if url.endswith("/"):
+            return [f"https://x.com/p{i}/" for i in range(10)] + ["https://x.com/p9#frag"]
+        return []
+
+    frontier = Frontier(
+        fetch,
+        links,
+        follow=lambda u: True,
+        is_target=lambda u: "/p" in u,
+        score=lambda u: u.endswith("p7"),
+        max_depth=1,
+        max_pages=3,
+        fetchers=3,
+    )
+    found = [url async for url, _ in frontier.crawl(["https://x.com/"])]
+
+    assert len(found) == 3
+    assert found[0] == "https://x.com/p7"
+    assert len(frontier.visited) == 11
+    assert len(fetched) < 11
+    assert peak > 1
+
+
+def test_canonical_url_merges_aliases() -> None:
+    canonical = "https://example.com/products/arm"
+    for url in [
+        "https://www.example.com/products/arm/?utm_source=x&gclid=1",
+        "https://example.com/en-us/products/arm#specs",
+        "https://EXAMPLE.com/products/arm/index.html",
+    ]:
+        assert canonical_url(url) == canonical
+    assert canonical_url("https://example.com/products/arm?id=2&utm_medium=a") == (
+        "https://example.com/products/arm?id=2"
+    )
+    assert canonical_url("https://example.com/de/products/arm") != canonical
+    assert strip_tracking("https://www.example.com/a?utm_x=1&b=2") == (
+        "https://www.example.com/a?b=2"
+    )
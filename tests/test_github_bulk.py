@@ -0,0 +1,174 @@
+import asyncio
+import io
+import tarfile
+from pathlib import Path
+from typing import Any
+
+import aiohttp
+import pytest
+from aioresponses import aioresponses
+
+from nidus_scraper import github
+from nidus_scraper.connections import TIMEOUTS
+from nidus_scraper.github_bulk import (
+    extract_matching,
+    git_blob_sha,
+    mesh_references,
+    stream_timeout,
+    tarball_url,
+)
+from nidus_scraper.manifest import Manifest
+
+
+def make_tarball(files: dict[str, bytes]) -> bytes:
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tar:
+        for name, data in files.items():
+            info = tarfile.TarInfo(f"org-repo-abc123/{name}")
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return buf.getvalue()
+
+
+ROBOT = b'<robot><mesh filename="package://arm_description/meshes/base.stl"/></robot>'
+FILES = {
+    "README.md": b"docs",
+    "urdf/arm.urdf": ROBOT,
+    "urdf/gripper.xacro": b"<robot/>",
+    "arm_description/meshes/base.stl": b"solid base",
+    "arm_description/meshes/unused.stl": b"solid unused",
+}
+
+
+def test_git_blob_sha_matches_git() -> None:
+    # `printf 'hello\n' | git hash-object --stdin`
+    assert git_blob_sha(b"hello\n") == "ce013625030ba8dba906f756967f9e9ca394464a"
+
+
+@pytest.mark.asyncio
+async def test_tarballs_keep_read_timeouts_but_no_deadline() -> None:
+    async with aiohttp.ClientSession(timeout=TIMEOUTS["urdf"]) as session:
+        timeout = stream_timeout(session)
+    assert timeout.total is None
+    assert timeout.sock_read == TIMEOUTS["urdf"].sock_read
+
+
+def test_mesh_references() -> None:
+    doc = b"""<mesh filename="package://pkg/meshes/a.STL"/><uri>model://m/meshes/b.dae</uri>
+    <mesh filename="../meshes/c.obj" />"""
+    assert mesh_references(doc) == {"meshes/a.STL", "meshes/b.dae", "meshes/c.obj"}
+
+
+def test_extract_matching_keeps_referenced_meshes(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr("nidus_scraper.config.DATA_DIR", tmp_path)
+    archive = io.BytesIO(make_tarball(FILES))
+    root = tmp_path / "github" / "org" / "repo"
+
+    extracted = extract_matching(
+        archive, root, lambda p: p.endswith((".urdf", ".xacro")), meshes=True
+    )
+
+    assert sorted(e.path for e in extracted) == [
+        "arm_description/meshes/base.stl",
+        "urdf/arm.urdf",
+        "urdf/gripper.xacro",
+    ]
+    assert (root / "urdf" / "arm.urdf").read_bytes() == ROBOT
+    assert not (root / "README.md").exists()
+    assert not (root / "arm_description" / "meshes" / "unused.stl").exists()
+    assert not list((tmp_path / "blobs" / "tmp").iterdir())
+
+
+@pytest.mark.asyncio
+async def test_dense_repository_is_fetched_as_one_tarball(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr("nidus_scraper.config.DATA_DIR", tmp_path)
+    monkeypatch.setattr("nidus_scraper.config.MANIFEST", tmp_path / "sources.csv")
+    monkeypatch.setattr(github, "EXTENSIONS", ["urdf", "xacro"])
+    items = [
+        {
+            "html_url": f"https://github.com/org/repo/blob/abc123/{name}",
+            "path": name,
+            "sha": git_blob_sha(FILES[name]),
+        }
+        for name in ("urdf/arm.urdf", "urdf/gripper.xacro")
+    ]
+    items.append(
+        {
+            "html_url": "https://github.com/other/repo/blob/main/solo.urdf",
+            "path": "solo.urdf",
+            "sha": "s",
+        }
+    )
+
+    async def fake_fetch(session, query, page, limiter):
+        return {"items": items if page == 1 and "urdf" in query else []}
+
+    monkeypatch.setattr(github, "fetch_search_page", fake_fetch)
+
+    with aioresponses() as m:
+        m.get(tarball_url("org/repo", "abc123"), body=make_tarball(FILES))
+        m.get(github.raw_url(items[2]["html_url"]), body=b"<robot/>")
+        async with aiohttp.ClientSession() as session:
+            await github.crawl_github(session, workers=2, bulk_threshold=2)
+        requested = sorted(str(url) for _, url in m.requests)
+
+    assert requested == [
+        tarball_url("org/repo", "abc123"),
+        github.raw_url(items[2]["html_url"]),
+    ]
+    repo = tmp_path / "github" / "org" / "repo"
+    assert (repo / "urdf" / "gripper.xacro").read_bytes() == b"<robot/>"
+    assert (tmp_path / "github" / "other" / "repo" / "solo.urdf").exists()
+
+    async with Manifest() as manifest:
+        known = await manifest.github_blobs()
+    assert known["org/repo", "urdf/arm.urdf"].blob_sha == items[0]["sha"]
+
+
+@pytest.mark.asyncio
+async def test_hits_after_a_tarball_come_from_it(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr("nidus_scraper.config.DATA_DIR", tmp_path)
+    monkeypatch.setattr("nidus_scraper.config.MANIFEST", tmp_path / "sources.csv")
+    monkeypatch.setattr(github, "EXTENSIONS", ["urdf", "xacro"])
+    items = {
+        ext: {
+            "html_url": f"https://github.com/org/repo/blob/abc123/{name}",
+            "path": name,
+            "sha": git_blob_sha(FILES[name]),
+        }
+        for ext, name in (("urdf", "urdf/arm.urdf"), ("xacro", "urdf/gripper.xacro"))
+    }
+    extracted = asyncio.Event()
+    download_tarball = github.download_tarball
+
+    async def fake_download(*args: Any) -> Any:
+        result = await download_tarball(*args)
+        extracted.set()
+        return result
+
+    async def fake_fetch(session, query, page, limiter):
+        ext = "xacro" if "xacro" in query else "urdf"
+        if ext == "xacro":
+            # This query only answers once the urdf hit's tarball is done.
+            await extracted.wait()
+        return {"items": [items[ext]] if page == 1 else []}
+
+    monkeypatch.setattr(github, "download_tarball", fake_download)
+    monkeypatch.setattr(github, "fetch_search_page", fake_fetch)
+
+    with aioresponses() as m:
+        m.get(tarball_url("org/repo", "abc123"), body=make_tarball(FILES))
+        async with aiohttp.ClientSession() as session:
+            await github.crawl_github(session, workers=2, bulk_threshold=1)
+        requested = [str(url) for _, url in m.requests]
+
+    assert requested == [tarball_url("org/repo", "abc123")]
+    async with Manifest() as manifest:
+        known = await manifest.github_blobs()
+    assert known["org/repo", "urdf/gripper.xacro"].blob_sha == items["xacro"]["sha"]
@@ -7,13 +7,15 @@ import aiohttp
 
 from nidus_scraper import github
 from nidus_scraper.github import crawl_github, SEARCH_URL, raw_url
+from nidus_scraper.github_bulk import git_blob_sha
+from nidus_scraper.jobs import JobStore
+from nidus_scraper.manifest import Manifest
 
 
 @pytest.mark.asyncio
 async def test_crawl_github(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
     monkeypatch.setattr("nidus_scraper.config.DATA_DIR", tmp_path)
     monkeypatch.setattr("nidus_scraper.config.MANIFEST", tmp_path / "sources.csv")
-    monkeypatch.setattr(github, "DATA_DIR", tmp_path)
     tmp_path.mkdir(exist_ok=True)
     search_json = {
         "items": [
@@ -26,7 +28,7 @@ async def test_crawl_github(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) ->
 
     monkeypatch.setattr(github, "EXTENSIONS", ["urdf"])
 
-    async def fake_fetch(session, ext, page):
+    async def fake_fetch(session, query, page, limiter):
         if page == 1:
             return search_json
         return {"items": []}
@@ -42,6 +44,164 @@ async def test_crawl_github(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) ->
             async with aiohttp.ClientSession() as session:
                 await crawl_github(session, workers=1)
 
-    saved = tmp_path / "github" / "test.urdf"
+    saved = tmp_path / "github" / "org" / "repo" / "test.urdf"
     assert saved.exists()
     assert saved.read_bytes() == raw_content
+
+
+@pytest.mark.asyncio
+async def test_search_items_shards_past_cap(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(github, "EXTENSIONS", ["urdf"])
+    monkeypatch.setattr(github, "MAX_INDEXED_SIZE", 3)
+    queries: list[tuple[str, int]] = []
+
+    async def fake_fetch(session, query, page, limiter):
+        queries.append((query, page))
+        lo, hi = map(int, query.rsplit("size:", 1)[1].split(".."))
+        total = 600 * (hi - lo + 1)
+        item = {"html_url": f"https://github.com/o/r/blob/main/{lo}-{page}.urdf"}
+        return {"total_count": total, "items": [item]}
+
+    monkeypatch.setattr(github, "fetch_search_page", fake_fetch)
+
+    async with aiohttp.ClientSession() as session:
+        items = [i async for i in github.search_items(session)]
+
+    # 0..3 and 0..1 / 2..3 exceed the cap; the four single-size shards do not.
+    leaves = {q for q, p in queries if p > 1}
+    assert leaves == {github.search_query("urdf", n, n) for n in range(4)}
+    assert len(items) == 4 * 6
+
+
+def test_rate_limiter_honours_retry_after() -> None:
+    limiter = github.RateLimiter()
+    headers = {"X-RateLimit-Remaining": "9", "X-RateLimit-Reset": "0"}
+    assert not limiter.update(200, headers)
+    assert limiter.update(403, {"Retry-After": "30"})
+    assert limiter._blocked_until > 0
+    assert not limiter.update(404, {})
+
+
+@pytest.mark.asyncio
+async def test_incremental_sync_skips_unchanged_blobs(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr("nidus_scraper.config.DATA_DIR", tmp_path)
+    monkeypatch.setattr("nidus_scraper.config.MANIFEST", tmp_path / "sources.csv")
+    monkeypatch.setattr(github, "EXTENSIONS", ["urdf"])
+    items: list[dict[str, str]] = []
+
+    def item(name: str, sha: str, commit: str = "c1") -> dict[str, str]:
+        return {
+            "html_url": f"https://github.com/org/repo/blob/{commit}/{name}",
+            "path": name,
+            "sha": sha,
+        }
+
+    async def fake_fetch(session, query, page, limiter):
+        return {"items": items if page == 1 else []}
+
+    monkeypatch.setattr(github, "fetch_search_page", fake_fetch)
+
+    async def sync() -> list[str]:
+        with aioresponses() as m:
+            for i in items:
+                m.get(raw_url(i["html_url"]), body=i["sha"].encode(), repeat=True)
+            async with aiohttp.ClientSession() as session:
+                await crawl_github(session, workers=2)
+            return [str(url) for _, url in m.requests]
+
+    items[:] = [item("a.urdf", "sha-a"), item("b.urdf", "sha-b")]
+    assert len(await sync()) == 2
+
+    # Same blobs at a new commit: nothing to download.
+    items[:] = [item("a.urdf", "sha-a", "c2"), item("b.urdf", "sha-b", "c2")]
+    assert await sync() == []
+
+    # b changed, a disappeared.
+    items[:] = [item("b.urdf", "sha-b2", "c3")]
+    assert await sync() == [raw_url(items[0]["html_url"])]
+    assert (tmp_path / "github" / "org" / "repo" / "b.urdf").read_bytes() == b"sha-b2"
+
+    async with Manifest() as manifest:
+        known = await manifest.github_blobs()
+    assert set(known) == {("org/repo", "b.urdf")}
+    assert known["org/repo", "b.urdf"].blob_sha == "sha-b2"
+
+
+@pytest.mark.asyncio
+async def test_partial_search_does_not_remove_files(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr("nidus_scraper.config.DATA_DIR", tmp_path)
+    monkeypatch.setattr("nidus_scraper.config.MANIFEST", tmp_path / "sources.csv")
+    monkeypatch.setattr(github, "EXTENSIONS", ["urdf"])
+    names = ["a.urdf", "b.urdf"]
+    failing = False
+
+    async def fake_fetch(session, query, page, limiter):
+        if failing and page == 2:
+            raise RuntimeError("secondary rate limit")
+        items = [
+            {
+                "html_url": f"https://github.com/org/repo/blob/c1/{name}",
+                "path": name,
+                "sha": f"sha-{name}",
+            }
+            for name in names[page - 1 : page]
+        ]
+        return {"total_count": len(names), "items": items}
+
+    monkeypatch.setattr(github, "fetch_search_page", fake_fetch)
+    monkeypatch.setattr(github, "PER_PAGE", 1)
+
+    async def sync() -> set[tuple[str, str]]:
+        with aioresponses() as m:
+            for name in names:
+                url = raw_url(f"https://github.com/org/repo/blob/c1/{name}")
+                m.get(url, body=name.encode(), repeat=True)
+            async with aiohttp.ClientSession() as session:
+                await crawl_github(session, workers=2)
+        async with Manifest() as manifest:
+            return set(await manifest.github_blobs())
+
+    assert await sync() == {("org/repo", "a.urdf"), ("org/repo", "b.urdf")}
+
+    # Page 2 fails: b is missing from the results but was not removed upstream.
+    failing = True
+    report = github.SearchReport()
+    async with aiohttp.ClientSession() as session:
+        found = [i async for i in github.search_items(session, report=report)]
+    assert [i["path"] for i in found] == ["a.urdf"] and not report.complete
+    assert await sync() == {("org/repo", "a.urdf"), ("org/repo", "b.urdf")}
+
+
+@pytest.mark.asyncio
+async def test_resumed_downloads_record_their_blob_sha(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr("nidus_scraper.config.DATA_DIR", tmp_path)
+    monkeypatch.setattr("nidus_scraper.config.MANIFEST", tmp_path / "sources.csv")
+    monkeypatch.setattr(github, "EXTENSIONS", ["urdf"])
+    html_url = "https://github.com/org/repo/blob/c1/b.urdf"
+    item = {"html_url": html_url, "path": "b.urdf", "sha": git_blob_sha(b"<b/>")}
+
+    async def fake_fetch(session, query, page, limiter):
+        return {"items": [item] if page == 1 else []}
+
+    monkeypatch.setattr(github, "fetch_search_page", fake_fetch)
+
+    async def sync(status: int, resume: bool) -> None:
+        with aioresponses() as m:
+            m.get(raw_url(html_url), status=status, body=b"<b/>")
+            async with JobStore(tmp_path / "jobs.sqlite3", resume=resume):
+                async with aiohttp.ClientSession() as session:
+                    await crawl_github(session, workers=1)
+
+    await sync(404, resume=False)
+    # Discovery finished, so the resumed run only replays the failed download.
+    await sync(200, resume=True)
+
+    async with Manifest() as manifest:
+        known = await manifest.github_blobs()
+    assert known["org/repo", "b.urdf"].blob_sha == item["sha"]
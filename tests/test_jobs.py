@@ -0,0 +1,46 @@
+from collections.abc import AsyncIterator
+from pathlib import Path
+
+import pytest
+
+from nidus_scraper import jobs
+from nidus_scraper.jobs import JobStore, run_jobs
+
+
+@pytest.mark.asyncio
+async def test_resume_skips_done_and_replays_unfinished(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr("nidus_scraper.config.DATA_DIR", tmp_path)
+    db = tmp_path / "jobs.sqlite3"
+    urls = [f"https://example.com/{i}.pdf" for i in range(4)]
+    discovered = 0
+
+    async def discover() -> AsyncIterator[tuple[str, Path]]:
+        nonlocal discovered
+        for url in urls:
+            discovered += 1
+            yield url, tmp_path / url.rsplit("/", 1)[1]
+
+    handled: list[str] = []
+
+    async def crash_on_two(job: tuple[str, Path]) -> None:
+        if job[0].endswith("2.pdf"):
+            raise RuntimeError("connection reset")
+        handled.append(job[0])
+
+    async with JobStore(db):
+        await run_jobs("test", discover(), crash_on_two, workers=1)
+    assert discovered == 4
+
+    async def ok(job: tuple[str, Path]) -> None:
+        handled.append(job[0])
+
+    handled.clear()
+    async with JobStore(db, resume=True) as store:
+        await run_jobs("test", discover(), ok, workers=1)
+        assert (await store.get(urls[2])).state == jobs.DONE  # type: ignore[union-attr]
+
+    # Discovery had finished, so only the failed job is replayed.
+    assert handled == [urls[2]]
+    assert discovered == 4
@@ -0,0 +1,66 @@
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+
+import pytest
+from bs4 import BeautifulSoup, Tag
+
+from nidus_scraper import links
+from nidus_scraper.vendor_pages import extract_links
+from nidus_scraper.vendors import extract_pdfs
+
+HTML = """<!doctype html><html><head><title>x</title>
+<script>var s = '<a href="/in-script">';</script></head><body>
+<A HREF="/Products/arm.pdf">Arm</A>
+<a href="">empty</a><a>no href</a><a name="x" href='docs\\manual.PDF'>m</a>
+<a href="/q?a=1&amp;b=2">q</a><div><a href="https://other.com/x.pdf">o</a>
+<a href="rel/page">r</a><p><a href="/unclosed.pdf">u</p>
+</body></html>"""
+
+
+def bs4_links(html: str, base_url: str) -> list[str]:
+    soup = BeautifulSoup(html, "html.parser")
+    out = []
+    for a in soup.find_all("a", href=True):
+        if isinstance(a, Tag) and a.get("href"):
+            out.append(urljoin(base_url, str(a.get("href"))))
+    return out
+
+
+@pytest.mark.parametrize("backend", links.BACKENDS)
+def test_backends_match_beautifulsoup(
+    backend: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(links, "DEFAULT_BACKEND", backend)
+    base = "https://example.com/base/"
+    assert extract_links(HTML, base) == bs4_links(HTML, base)
+    assert list(extract_pdfs(HTML, base)) == [
+        "https://example.com/Products/arm.pdf",
+        "https://example.com/base/docs/manual.PDF",
+        "https://other.com/x.pdf",
+        "https://example.com/unclosed.pdf",
+    ]
+    assert links.anchor_hrefs("", backend) == []
+
+
+@pytest.mark.asyncio
+async def test_large_documents_leave_the_event_loop(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    pool = ThreadPoolExecutor(1)
+    submitted: list[int] = []
+    monkeypatch.setattr(links, "_get_pool", lambda: pool)
+    monkeypatch.setattr(links, "PROCESS_THRESHOLD", len(HTML))
+    real_submit = pool.submit
+
+    def submit(fn, *args):  # type: ignore[no-untyped-def]
+        submitted.append(len(args[0]))
+        return real_submit(fn, *args)
+
+    monkeypatch.setattr(pool, "submit", submit)
+    try:
+        cut = HTML[:-1]
+        assert await links.anchor_hrefs_async(cut) == links.anchor_hrefs(cut)
+        assert await links.anchor_hrefs_async(HTML) == links.anchor_hrefs(HTML)
+    finally:
+        pool.shutdown()
+    assert submitted == [len(HTML)]
@@ -0,0 +1,65 @@
+import asyncio
+import csv
+from pathlib import Path
+
+import pytest
+
+from nidus_scraper import manifest, utils
+from nidus_scraper.manifest import Manifest, ManifestEntry
+
+
+@pytest.mark.asyncio
+async def test_lookup_and_csv_export(tmp_path: Path) -> None:
+    export = tmp_path / "sources.csv"
+    entry = ManifestEntry("a.pdf", "ab" * 32, "https://example.com/a.pdf", "2024-01-01")
+    async with Manifest(tmp_path / "m.sqlite3", export_csv=export) as store:
+        assert manifest.current() is store
+        await store.add(entry)
+        assert await store.find_by_url(entry.source_url) == entry
+        await store.flush()
+        assert await store.find_by_url(entry.source_url) == entry
+        assert await store.find_by_sha(entry.sha256) == [entry]
+        assert not await store.has_url("https://example.com/missing.pdf")
+    assert manifest.current() is None
+
+    with open(export, newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows == [manifest.CSV_HEADER, list(entry.__dict__.values())]
+
+
+@pytest.mark.asyncio
+async def test_imports_legacy_csv(tmp_path: Path) -> None:
+    export = tmp_path / "sources.csv"
+    export.write_text(
+        "filename,sha256,source_url,downloaded_at\n"
+        "old.pdf,cafe,https://example.com/old.pdf,2023-01-01\n"
+    )
+    async with Manifest(tmp_path / "m.sqlite3", export_csv=export) as store:
+        assert await store.has_sha("cafe")
+        await utils.update_manifest(
+            tmp_path / "new.pdf", "https://example.com/new", "beef"
+        )
+        assert await store.has_url("https://example.com/new")
+
+    assert len(export.read_text().splitlines()) == 3
+
+
+@pytest.mark.asyncio
+async def test_failed_write_is_raised_not_waited_on(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    def disk_full(self: Manifest, batch: object) -> None:
+        raise OSError("database or disk is full")
+
+    entry = ManifestEntry("a.pdf", "ab" * 32, "https://example.com/a.pdf", "2024-01-01")
+    store = Manifest(tmp_path / "m.sqlite3", export_csv=tmp_path / "sources.csv")
+    monkeypatch.setattr(Manifest, "_insert", disk_full)
+    await store.open()
+    await store.add(entry)
+    with pytest.raises(OSError, match="disk is full"):
+        await asyncio.wait_for(store.flush(), 5)
+    with pytest.raises(OSError):
+        await store.add(entry)
+    with pytest.raises(OSError):
+        await store.close()
+    assert store._wconn is None
@@ -0,0 +1,71 @@
+import hashlib
+import os
+from pathlib import Path
+
+import pytest
+
+from nidus_scraper import analysis, blobs, packs, utils
+from nidus_scraper.manifest import Manifest
+from nidus_scraper.packs import PackReader, PackStore
+
+URDF = b'<robot name="arm">' + b'<link name="l"/>' * 50 + b"</robot>"
+
+
+def spool(data: bytes) -> Path:
+    tmp = blobs.temp_path()
+    tmp.write_bytes(data)
+    return tmp
+
+
+@pytest.mark.asyncio
+async def test_small_text_files_are_packed(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr("nidus_scraper.config.DATA_DIR", tmp_path)
+    monkeypatch.setattr("nidus_scraper.config.MANIFEST", tmp_path / "sources.csv")
+    urdf = tmp_path / "github/org/repo/arm.urdf"
+    pdf = tmp_path / "vendor/manual.pdf"
+    async with PackStore(codec=packs.ZLIB) as store:
+        first = utils.store_file(spool(URDF), urdf)
+        again = utils.store_file(spool(URDF), tmp_path / "github/fork/repo/arm.urdf")
+        utils.store_file(spool(b"%PDF-1.4"), pdf)
+    assert (first.deduplicated, again.deduplicated) == (False, True)
+    assert store.written == 1 and store.packed_bytes < len(URDF)
+    assert not urdf.exists() and pdf.exists()
+    sha = first.sha256
+    assert blobs.exists(sha) and blobs.present(urdf, sha)
+
+    with blobs.open_stored(urdf, sha) as f:
+        assert f.read() == URDF
+    assert analysis.analyze(urdf, sha).links == 50
+
+    # Packed files can be written back to the plain layout.
+    async with Manifest():
+        await utils.update_manifest(urdf, "https://raw/arm.urdf", sha)
+    assert packs.unpack() == 1
+    assert urdf.read_bytes() == URDF and urdf.samefile(blobs.blob_path(sha))
+
+
+def test_reader_sees_appends_and_ignores_torn_records(tmp_path: Path) -> None:
+    reader = PackReader(tmp_path)
+    store = PackStore(tmp_path, max_bytes=1)
+    store.open()
+    data = [os.urandom(100), b"abc" * 1000]
+    shas = [hashlib.sha256(d).hexdigest() for d in data]
+    store.add(shas[0], data[0])
+    assert reader.read(shas[0]) == data[0]
+    store.add(shas[1], data[1])
+    store.close()
+    # Incompressible content is stored as is; every pack stays under max_bytes.
+    assert reader.entries[shas[0]].codec == packs.RAW
+    assert reader.read(shas[1], refresh=False) is None
+    assert reader.read(shas[1]) == data[1]
+    assert len(list(tmp_path.glob("*.pack"))) == 2
+
+    with open(next(tmp_path.glob("*.idx")), "ab") as f:
+        f.write(b"torn")
+    fresh = PackReader(tmp_path)
+    fresh.refresh()
+    assert set(fresh.entries) == set(shas)
+    reader.close()
+    fresh.close()
@@ -0,0 +1,36 @@
+import asyncio
+from collections.abc import AsyncIterator
+
+import pytest
+
+from nidus_scraper.pipeline import Pipeline
+
+
+@pytest.mark.asyncio
+async def test_backpressure_and_failures() -> None:
+    produced = 0
+    max_ahead = 0
+    handled: list[int] = []
+
+    async def source() -> AsyncIterator[int]:
+        nonlocal produced, max_ahead
+        for i in range(50):
+            produced += 1
+            max_ahead = max(max_ahead, produced - len(handled))
+            yield i
+
+    async def handler(item: int) -> None:
+        await asyncio.sleep(0.001)
+        handled.append(item)
+        if item % 10 == 0:
+            raise ValueError(item)
+
+    pipeline = Pipeline("test", handler, workers=2, maxsize=3)
+    stats = await pipeline.run(source())
+
+    assert sorted(handled) == list(range(50))
+    assert stats["done"] == 45
+    assert stats["failed"] == 5
+    assert stats["queue_depth"] == 0
+    # Discovery never runs further ahead than the queue plus in-flight items.
+    assert max_ahead <= 3 + 2 + 1
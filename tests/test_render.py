@@ -0,0 +1,68 @@
+from pathlib import Path
+
+import pytest
+
+from nidus_scraper import render
+from nidus_scraper.manifest import Manifest
+from nidus_scraper.warc import WarcWriter
+
+ARM = " ".join(f"arm{i % 50} joint{i % 7}" for i in range(200))
+GRIPPER = " ".join(f"gripper{i % 40} finger{i % 5}" for i in range(200))
+
+
+@pytest.mark.asyncio
+async def test_render_archive_offline(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr("nidus_scraper.config.DATA_DIR", tmp_path)
+    monkeypatch.setattr("nidus_scraper.config.MANIFEST", tmp_path / "sources.csv")
+    html = {"Content-Type": "text/html"}
+    writer = WarcWriter(tmp_path / "warc")
+    writer.open()
+    pages = {
+        "https://www.ex.com/product/arm": f"<p>{ARM}</p>",
+        "https://ex.com/product/arm-copy": f"<p>{ARM}!</p>",
+        "https://ex.com/product/gripper": f"<p>{GRIPPER}</p>",
+        "https://ex.com/about": "<p>about us</p>",
+    }
+    for url, body in pages.items():
+        writer.write(url, 200, "OK", html, body.encode())
+    pdf = {"Content-Type": "application/pdf"}
+    writer.write("https://ex.com/product/spec.pdf", 200, "OK", pdf, b"%PDF")
+    writer.close()
+    rendered: list[str] = []
+
+    class FakePool:
+        capacity = 2
+
+        def __init__(self, *args: object) -> None:
+            pass
+
+        async def __aenter__(self) -> "FakePool":
+            return self
+
+        async def __aexit__(self, *exc: object) -> None:
+            pass
+
+        async def render_pdf(self, url: str, path: str) -> None:
+            raise AssertionError("rendering must not go to the network")
+
+        async def render_html(self, markup: str, path: str) -> None:
+            rendered.append(markup)
+            Path(path).write_bytes(markup.encode())
+
+    monkeypatch.setattr(render, "BrowserPool", FakePool)
+
+    async with Manifest():
+        assert await render.render_archive(tmp_path / "warc") == 2
+    # One of the two near-identical arm pages, the gripper; no PDF or non-product page.
+    assert len(rendered) == 2 and f"<p>{GRIPPER}</p>" in rendered
+    assert (tmp_path / "html_product_pages" / "ex.com" / "product_gripper.pdf").exists()
+
+    rendered.clear()
+    async with Manifest():
+        assert await render.render_archive(tmp_path / "warc") == 0
+        rendered_about = await render.render_archive(
+            tmp_path / "warc", match="about", force=True
+        )
+        assert rendered_about == 1
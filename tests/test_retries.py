@@ -0,0 +1,143 @@
+import asyncio
+
+import aiohttp
+import pytest
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+
+from nidus_scraper import retries
+from nidus_scraper.retries import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryPolicy,
+    classify,
+)
+
+
+def http_error(
+    status: int, retry_after: str | None = None
+) -> aiohttp.ClientResponseError:
+    url = URL("https://example.com/x")
+    request = aiohttp.RequestInfo(url, "GET", CIMultiDictProxy(CIMultiDict()), url)
+    headers = CIMultiDict({"Retry-After": retry_after} if retry_after else {})
+    return aiohttp.ClientResponseError(
+        request, (), status=status, headers=CIMultiDictProxy(headers)
+    )
+
+
+def test_classify() -> None:
+    assert not classify(http_error(404)).retryable
+    assert not classify(http_error(403)).retryable
+    assert classify(http_error(503)).host_failure
+    rate_limited = classify(http_error(429, "7"))
+    assert rate_limited.retryable and not rate_limited.host_failure
+    assert rate_limited.retry_after == 7.0
+    assert classify(asyncio.TimeoutError()).host_failure
+    assert classify(aiohttp.ClientConnectionError()).retryable
+    assert classify(ValueError("short transfer")).retryable
+    assert retries.parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+
+@pytest.mark.asyncio
+async def test_permanent_errors_are_not_retried() -> None:
+    calls = 0
+
+    async def func() -> None:
+        nonlocal calls
+        calls += 1
+        raise http_error(404)
+
+    with pytest.raises(aiohttp.ClientResponseError):
+        await RetryPolicy(base_delay=10).call(func)
+    assert calls == 1
+
+
+@pytest.mark.asyncio
+async def test_retry_after_is_honoured(monkeypatch: pytest.MonkeyPatch) -> None:
+    sleeps: list[float] = []
+
+    async def fake_sleep(delay: float) -> None:
+        sleeps.append(delay)
+
+    monkeypatch.setattr(retries.asyncio, "sleep", fake_sleep)
+    outcomes = [http_error(429, "12"), http_error(502)]
+
+    async def func() -> str:
+        if outcomes:
+            raise outcomes.pop(0)
+        return "ok"
+
+    policy = RetryPolicy(base_delay=0.5, max_delay=4)
+    assert await policy.call(func) == "ok"
+    assert sleeps[0] == 12.0
+    assert 0.5 <= sleeps[1] <= 4
+
+
+@pytest.mark.asyncio
+async def test_deadline_stops_retrying() -> None:
+    calls = 0
+
+    async def flaky() -> None:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.03)
+        raise aiohttp.ClientConnectionError("reset")
+
+    with pytest.raises(aiohttp.ClientConnectionError):
+        await RetryPolicy(attempts=5, base_delay=0, deadline=0.05).call(flaky)
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_deadline_does_not_cancel_a_running_attempt() -> None:
+    async def slow_download() -> str:
+        await asyncio.sleep(0.1)
+        return "ok"
+
+    policy = RetryPolicy(attempts=1, deadline=0.05)
+    assert await policy.call(slow_download) == "ok"
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_fails_fast_and_probes(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    now = [0.0]
+    monkeypatch.setattr(retries.time, "monotonic", lambda: now[0])
+    policy = RetryPolicy(attempts=1, breaker_threshold=2, breaker_reset=30)
+    calls = 0
+
+    async def down() -> None:
+        nonlocal calls
+        calls += 1
+        raise aiohttp.ClientConnectionError("refused")
+
+    for _ in range(2):
+        with pytest.raises(aiohttp.ClientConnectionError):
+            await policy.call(down, "https://dead.example/a")
+    with pytest.raises(CircuitOpenError):
+        await policy.call(down, "https://dead.example/b")
+    assert calls == 2
+
+    async def up() -> str:
+        return "ok"
+
+    assert await policy.call(up, "https://alive.example/") == "ok"
+    now[0] = 31.0
+    breaker = policy.breakers["dead.example"]
+    assert breaker.state == "half_open"
+    assert await policy.call(up, "https://dead.example/c") == "ok"
+    assert breaker.state == "closed"
+
+
+def test_failed_probe_reopens(monkeypatch: pytest.MonkeyPatch) -> None:
+    now = [0.0]
+    monkeypatch.setattr(retries.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker(threshold=1, reset_timeout=10)
+    breaker.failure("h")
+    now[0] = 10.0
+    breaker.before("h")
+    with pytest.raises(CircuitOpenError):
+        breaker.before("h")
+    breaker.failure("h")
+    assert breaker.state == "open"
@@ -0,0 +1,127 @@
+import asyncio
+import statistics
+
+import aiohttp
+import pytest
+
+from nidus_scraper.scheduler import MIN_ROUND, FairLimiter, HostLimiter, Scheduler
+
+
+@pytest.mark.asyncio
+async def test_fair_limiter_round_robins_sources() -> None:
+    limiter = FairLimiter(1)
+    await limiter.acquire("hold")
+    order: list[str] = []
+
+    async def take(key: str) -> None:
+        await limiter.acquire(key)
+        order.append(key)
+        await asyncio.sleep(0)
+        limiter.release()
+
+    tasks = [asyncio.create_task(take(k)) for k in ("a", "a", "a", "b")]
+    await asyncio.sleep(0)
+    limiter.release()
+    await asyncio.gather(*tasks)
+
+    assert order == ["a", "b", "a", "a"]
+    assert limiter.active == 0
+
+
+@pytest.mark.asyncio
+async def test_per_host_limit() -> None:
+    scheduler = Scheduler(global_limit=10, host_limit=2, host_limits={"fast.com": 5})
+    peak: dict[str, int] = {"slow.com": 0, "fast.com": 0}
+    active: dict[str, int] = {"slow.com": 0, "fast.com": 0}
+
+    async def request(host: str) -> None:
+        async with scheduler.slot("src", f"https://{host}/x"):
+            active[host] += 1
+            peak[host] = max(peak[host], active[host])
+            await asyncio.sleep(0.01)
+            active[host] -= 1
+
+    await asyncio.gather(*(request(h) for h in ["slow.com", "fast.com"] * 8))
+
+    assert peak == {"slow.com": 2, "fast.com": 5}
+
+
+def test_host_limiter_aimd(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("nidus_scraper.scheduler.MIN_ROUND", 1)
+    limiter = HostLimiter("h", 4, ceiling=6)
+    fixed = HostLimiter("p", 4)
+    for _ in range(4):
+        limiter._saturated = True
+        limiter.record(0.1)
+        fixed.record(0.1)
+    assert (limiter.limit, fixed.limit) == (5, 4)
+    limiter.record(None, overloaded=True)
+    for _ in range(4):
+        limiter.record(0.1)
+    assert limiter.limit == 2
+    # Latency far above the baseline means the extra slot only queued.
+    limiter.record(0.5)
+    limiter.record(0.5)
+    assert limiter.limit == 1
+    for _ in range(20):
+        limiter._saturated = True
+        limiter.record(0.1)
+    assert limiter.limit == 6
+
+
+@pytest.mark.asyncio
+async def test_adaptive_limit_finds_knee() -> None:
+    capacity = 6
+    scheduler = Scheduler(global_limit=100, host_limit=2, ceiling=32)
+    active = 0
+    limits: list[int] = []
+
+    async def request() -> None:
+        nonlocal active
+        async with scheduler.slot("src", "https://knee.com/x"):
+            limits.append(scheduler.limits()["knee.com"])
+            active += 1
+            # Beyond its capacity the server queues: latency grows with load.
+            await asyncio.sleep(0.002 * max(1, active / capacity))
+            active -= 1
+
+    async def worker() -> None:
+        for _ in range(60):
+            await request()
+
+    await asyncio.gather(*(worker() for _ in range(32)))
+    assert capacity - 2 <= statistics.median(limits) <= 2 * capacity
+
+
+@pytest.mark.asyncio
+async def test_throttled_host_backs_off_and_pinned_host_does_not() -> None:
+    scheduler = Scheduler(host_limit=8, host_limits={"pinned.com": 8}, ceiling=32)
+
+    async def throttled(host: str) -> None:
+        with pytest.raises(aiohttp.ClientResponseError):
+            async with scheduler.slot("src", f"https://{host}/x"):
+                raise aiohttp.ClientResponseError(None, (), status=429)  # type: ignore[arg-type]
+
+    for _ in range(MIN_ROUND):
+        await throttled("busy.com")
+        await throttled("pinned.com")
+    assert scheduler.limits() == {"busy.com": 4, "pinned.com": 8}
+
+
+@pytest.mark.asyncio
+async def test_latency_stops_at_the_first_byte(monkeypatch: pytest.MonkeyPatch) -> None:
+    scheduler = Scheduler(ceiling=32)
+    recorded: list[float | None] = []
+
+    def record(latency: float | None, overloaded: bool = False) -> None:
+        recorded.append(latency)
+
+    monkeypatch.setattr(scheduler.host("big.com"), "record", record)
+    async with scheduler.slot("src", "https://big.com/x") as request:
+        request.first_byte()
+        # A long body transfer says nothing about queueing at the server.
+        await asyncio.sleep(0.05)
+    async with scheduler.slot("src", "https://big.com/x"):
+        await asyncio.sleep(0.05)
+    assert recorded[0] is not None and recorded[0] < 0.05
+    assert recorded[1] is not None and recorded[1] >= 0.05
@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import random
+import sqlite3
+from pathlib import Path
+
+import aiohttp
+import pytest
+from aioresponses import aioresponses
+
+import nidus_scraper.standards as standards
+from nidus_scraper import github, runners, sharding
+from nidus_scraper.manifest import GitHubBlob, Manifest, ManifestEntry
+from nidus_scraper.sharding import Shard, merge_manifests
+
+
+def test_shards_partition_keys() -> None:
+    keys = [f"host{i}.example" for i in range(300)]
+    shards = [Shard(i, 3) for i in range(3)]
+    owners = [[s for s in shards if s.owns(k)] for k in keys]
+    assert all(len(o) == 1 for o in owners)
+    assert all(sum(o[0] == s for o in owners) > 50 for s in shards)
+
+    # Sub-shards stay inside their parent, whatever the process count.
+    for key in keys:
+        parent = next(s for s in shards if s.owns(key))
+        children = [c for c in parent.split(4) if c.owns(key)]
+        assert len(children) == 1
+
+    assert Shard.parse("2/3") == Shard(2, 3)
+    with pytest.raises(ValueError):
+        Shard.parse("3/3")
+
+
+def test_shards_split_the_github_search() -> None:
+    top = github.MAX_INDEXED_SIZE
+    assert github.search_roots() == [(e, 0, top) for e in github.EXTENSIONS]
+    shards = [*Shard(0, 2).split(2), Shard(1, 2)]
+    assert sharding.covers(shards)
+    assert not sharding.covers([Shard(0, 2), Shard(0, 4), Shard(1, 4)])
+    roots = []
+    try:
+        for shard in shards:
+            sharding.set_shard(shard)
+            roots += github.search_roots()
+    finally:
+        sharding.set_shard(None)
+    # Every size of every extension is searched by exactly one shard.
+    assert len(roots) == len(set(roots)) == 3 * github.SEARCH_SLICES
+    for ext in github.EXTENSIONS:
+        ranges = sorted((lo, hi) for e, lo, hi in roots if e == ext)
+        assert ranges[0][0] == 0 and ranges[-1][1] == top
+        assert all(a[1] + 1 == b[0] for a, b in zip(ranges, ranges[1:]))
+
+
+@pytest.mark.parametrize("count", [2, 3, 4, 8])
+def test_github_search_work_is_balanced(count: int) -> None:
+    # Description files are mostly a few KB with a long tail of large ones.
+    rng = random.Random(7)
+    sizes = [int(rng.lognormvariate(8, 1.2)) for _ in range(20000)]
+    slices = github.search_slices()
+    load = [0] * count
+    for size in sizes:
+        if size <= github.MAX_INDEXED_SIZE:
+            i = next(i for i, (lo, hi) in enumerate(slices) if lo <= size <= hi)
+            load[i % count] += 1
+    assert max(load) <= 1.1 * sum(load) / count
+
+
+def test_github_removals_wait_for_every_shard(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr("nidus_scraper.config.MANIFEST", tmp_path / "sources.csv")
+    target = tmp_path / "main.sqlite3"
+
+    async def seed() -> None:
+        async with Manifest(target) as m:
+            for name in ("a", "b", "c"):
+                await m.put_github_blob(GitHubBlob("o/r", name, "sha", "url", "t"))
+
+    asyncio.run(seed())
+
+    def merge(complete: bool) -> int:
+        sharding.write_github_seen(Shard(0, 2), [("o/r", "a")], True)
+        sharding.write_github_seen(Shard(1, 2), [("o/r", "b")], complete)
+        removed = sharding.remove_unseen_github_blobs(
+            target, sharding.github_seen_records()
+        )
+        assert sharding.github_seen_records() == []
+        return removed
+
+    assert merge(complete=False) == 0
+    assert merge(complete=True) == 1
+    rows = sqlite3.connect(target).execute("SELECT path FROM github_blobs").fetchall()
+    assert sorted(rows) == [("a",), ("b",)]
+
+
+def test_merge_manifests_is_idempotent(tmp_path: Path) -> None:
+    async def write(path: Path, names: list[str]) -> None:
+        async with Manifest(path) as m:
+            for name in names:
+                entry = ManifestEntry(name, f"sha-{name}", f"https://x/{name}", "t")
+                await m.add(entry)
+
+    asyncio.run(write(tmp_path / "a.sqlite3", ["one", "two"]))
+    asyncio.run(write(tmp_path / "b.sqlite3", ["three"]))
+    target = tmp_path / "main.sqlite3"
+    shards = [tmp_path / "a.sqlite3", tmp_path / "b.sqlite3"]
+
+    assert merge_manifests(target, shards) == 3
+    assert merge_manifests(target, shards) == 0
+    conn = sqlite3.connect(target)
+    rows = conn.execute("SELECT filename FROM files ORDER BY id").fetchall()
+    assert rows == [("one",), ("two",), ("three",)]
+
+
+@pytest.mark.asyncio
+async def test_sharded_crawl_only_fetches_owned_hosts(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr("nidus_scraper.config.DATA_DIR", tmp_path)
+    monkeypatch.setattr("nidus_scraper.config.MANIFEST", tmp_path / "sources.csv")
+    urls = [f"https://h{i}.example/doc.pdf" for i in range(8)]
+    monkeypatch.setattr(standards, "STANDARD_URLS", urls)
+    shard = Shard(1, 2)
+    owned = [u for u in urls if shard.owns(u.split("/")[2])]
+
+    sharding.set_shard(shard)
+    try:
+        with aioresponses() as m:
+            for url in urls:
+                m.get(url, body=b"pdf")
+            async with aiohttp.ClientSession() as session:
+                await standards.crawl_standards(session)
+            fetched = sorted(str(u) for _, u in m.requests)
+    finally:
+        sharding.set_shard(None)
+
+    assert fetched == sorted(owned)
+    assert 0 < len(owned) < len(urls)
+
+
+def test_shard_processes_log_like_the_parent(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    caplog: pytest.LogCaptureFixture,
+    capfd: pytest.CaptureFixture[str],
+) -> None:
+    monkeypatch.setattr("nidus_scraper.config.DATA_DIR", tmp_path)
+    monkeypatch.setattr("nidus_scraper.config.MANIFEST", tmp_path / "sources.csv")
+    caplog.set_level(logging.INFO)
+
+    shards = runners.run_processes(
+        Shard(0, 1), 2, sources=[], workers=1, analysis_processes=0, text_processes=0
+    )
+
+    assert len(shards) == 2
+    # Each spawned process writes its own summary to the inherited stderr.
+    assert capfd.readouterr().err.count("Crawl telemetry") == 2
+    assert all(sharding.manifest_path(s).exists() for s in shards)
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import subprocess
+import sys
+from importlib import metadata
+
+import pytest
+
+from nidus_scraper import sources, standards
+
+
+def test_runners_import_is_light_and_quiet() -> None:
+    code = (
+        "import logging, sys, nidus_scraper.runners\n"
+        "heavy = [m for m in ('pyppeteer', 'pypdf', 'dotenv', 'nidus_scraper.github',"
+        " 'nidus_scraper.vendor_pages') if m in sys.modules]\n"
+        "print(heavy, logging.getLogger().handlers)\n"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout
+    assert out.strip() == "[] []"
+
+
+def test_parsing_arguments_loads_no_source() -> None:
+    code = (
+        "import sys\n"
+        "from importlib import metadata\n"
+        "from nidus_scraper import runners\n"
+        "def scan(**kw): raise AssertionError('entry points scanned')\n"
+        "metadata.entry_points = scan\n"
+        "sys.argv = ['crawl-all', '--sources', 'standards']\n"
+        "args = runners.parse_args()\n"
+        "unknown = runners.registry.unknown(['standards'])\n"
+        "print(unknown, 'nidus_scraper.github' in sys.modules)\n"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout
+    assert out.strip() == "[] False"
+
+
+def test_builtin_sources_load() -> None:
+    assert sources.available()[:4] == ["urdf", "vendor", "pages", "standards"]
+    assert sources.load("standards") is standards.crawl_standards
+
+
+def test_plugins_are_discovered(monkeypatch: pytest.MonkeyPatch) -> None:
+    plugin = metadata.EntryPoint(
+        "cad", "nidus_scraper.standards:crawl_standards", sources.GROUP
+    )
+    monkeypatch.setattr(
+        sources.metadata,
+        "entry_points",
+        lambda group: [plugin] if group == sources.GROUP else [],
+    )
+    assert sources.available() == ["urdf", "vendor", "pages", "standards", "cad"]
+    assert sources.load("cad") is standards.crawl_standards
+    assert sources.unknown(["urdf", "cad", "nope"]) == ["nope"]
+    with pytest.raises(ValueError, match="Unknown source 'nope'.*cad"):
+        sources.load("nope")
@@ -0,0 +1,82 @@
+import asyncio
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from nidus_scraper import telemetry
+from nidus_scraper.scheduler import set_source
+from nidus_scraper.telemetry import Histogram, Telemetry
+
+
+def test_histogram_quantiles() -> None:
+    h = Histogram()
+    for value in [0.002] * 98 + [3.0, 7.0]:
+        h.observe(value)
+
+    summary = h.summary()
+    assert summary["count"] == 100
+    assert summary["p50"] == 0.0025
+    assert summary["p99"] == 5.0
+    assert summary["max"] == 7.0
+
+
+@pytest.mark.asyncio
+async def test_stages_are_timed_per_source() -> None:
+    async with Telemetry() as t:
+        set_source("vendor")
+        with telemetry.stage("fetch"):
+            key = (("source", "vendor"), ("stage", "fetch"))
+            assert t.gauges["active_tasks"][key] == 1
+            await asyncio.sleep(0.01)
+        with pytest.raises(ValueError):
+            with telemetry.stage("save"):
+                raise ValueError("disk full")
+        telemetry.count("retries_total")
+
+    summary = t.summary()
+    stage_seconds = summary["histograms"]["stage_seconds"]
+    assert stage_seconds["source=vendor,stage=fetch"]["count"] == 1
+    assert summary["counters"]["stage_errors_total"] == {"source=vendor,stage=save": 1}
+    assert summary["counters"]["retries_total"] == {"source=vendor": 1}
+    assert summary["gauges"]["active_tasks"]["source=vendor,stage=fetch"] == 0
+    assert telemetry.current() is None
+
+
+@pytest.mark.asyncio
+async def test_helpers_are_noops_without_telemetry() -> None:
+    with telemetry.stage("fetch"):
+        telemetry.count("retries_total")
+
+
+@pytest.mark.asyncio
+async def test_trace_config_and_metrics_endpoint(unused_tcp_port: int) -> None:
+    async def ok(request: web.Request) -> web.Response:
+        return web.Response(text="ok")
+
+    app = web.Application()
+    app.router.add_get("/x", ok)
+    async with TestServer(app) as server, Telemetry(lag_interval=0.01) as t:
+        async with aiohttp.ClientSession(trace_configs=[t.trace_config()]) as session:
+            for _ in range(2):
+                async with session.get(server.make_url("/x")) as resp:
+                    await resp.text()
+        await asyncio.sleep(0.03)
+
+        runner = await t.serve(unused_tcp_port)
+        try:
+            async with aiohttp.ClientSession() as session:
+                url = f"http://127.0.0.1:{unused_tcp_port}/metrics"
+                async with session.get(url) as resp:
+                    text = await resp.text()
+        finally:
+            await runner.cleanup()
+
+    host = server.host
+    assert t.counters["requests_total"][(("host", host), ("status", "200"))] == 2
+    assert t.counters["connections_reused_total"][(("host", host),)] == 1
+    assert t.histograms["connect_seconds"][(("host", host),)].count == 1
+    assert t.histograms["loop_lag_seconds"][()].count >= 1
+    assert f'nidus_requests_total{{host="{host}",status="200"}} 2' in text
+    assert f'nidus_ttfb_seconds_bucket{{host="{host}",le="+Inf"}} 2' in text
@@ -0,0 +1,151 @@
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from nidus_scraper import blobs, textindex
+from nidus_scraper.textindex import TextIndex, text_cache_path
+
+
+def write(tmp_path: Path, name: str, text: str) -> tuple[str, str]:
+    path = tmp_path / name
+    path.write_text(text)
+    return str(path), f"{name:0<64}"
+
+
+@pytest.mark.asyncio
+async def test_update_and_search(tmp_path: Path) -> None:
+    index = TextIndex(tmp_path / "index")
+    files = [
+        write(tmp_path, "a.txt", "Servo motor datasheet. Servo torque 12 Nm."),
+        write(tmp_path, "b.md", "Stepper motor wiring"),
+        write(tmp_path, "c.xsd", "<xs:schema>robot description format</xs:schema>"),
+        write(tmp_path, "d.stl", "solid servo"),
+    ]
+    with ThreadPoolExecutor(2) as pool:
+        assert await index.update(files, executor=pool) == 3
+        assert await index.update(files, executor=pool) == 0
+
+    hits = index.search("motor")
+    assert {Path(h.filename).name for h in hits} == {"a.txt", "b.md"}
+    assert [Path(h.filename).name for h in index.search("SERVO motor")] == ["a.txt"]
+    assert index.search("servo stepper") == []
+    assert index.search("missing") == []
+    assert text_cache_path(index.root, files[0][1]).exists()
+    index.close()
+
+    reopened = TextIndex(tmp_path / "index")
+    assert [Path(h.filename).name for h in reopened.search("schema")] == ["c.xsd"]
+    reopened.close()
+
+
+@pytest.mark.asyncio
+async def test_segments_compact(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(textindex, "MAX_SEGMENTS", 2)
+    index = TextIndex(tmp_path / "index")
+    with ThreadPoolExecutor(1) as pool:
+        for i, segments in enumerate([1, 2, 1]):
+            await index.update(
+                [write(tmp_path, f"{i}.txt", f"common word{i}")], executor=pool
+            )
+            assert len(index.segments) == segments
+    assert len(list(index.root.glob("*.post"))) == 1
+    assert [Path(h.filename).name for h in index.search("word1")] == ["1.txt"]
+    assert len(index.search("common")) == 3
+    index.close()
+
+
+@pytest.mark.asyncio
+async def test_pdf_text_is_cached_by_sha(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    calls: list[Path] = []
+
+    def fake_extract(path: Path, sha256: str | None = None) -> str:
+        calls.append(path)
+        return "gripper manual"
+
+    monkeypatch.setattr(textindex, "extract_text", fake_extract)
+    (tmp_path / "one.pdf").write_bytes(b"%PDF")
+    (tmp_path / "two.pdf").write_bytes(b"%PDF")
+    sha = "f" * 64
+    with ThreadPoolExecutor(1) as pool:
+        first = TextIndex(tmp_path / "index")
+        await first.update([(str(tmp_path / "one.pdf"), sha)], executor=pool)
+        first.close()
+        # A rebuilt index reuses the cached text instead of extracting again.
+        for path in (tmp_path / "index").glob("seg-*"):
+            path.unlink()
+        (tmp_path / "index" / "segments.json").unlink()
+        second = TextIndex(tmp_path / "index")
+        await second.update([(str(tmp_path / "two.pdf"), sha)], executor=pool)
+    assert calls == [tmp_path / "one.pdf"]
+    assert [h.filename for h in second.search("gripper")] == [str(tmp_path / "two.pdf")]
+    second.close()
+
+
+@pytest.mark.asyncio
+async def test_uncommitted_docs_are_ignored(tmp_path: Path) -> None:
+    index = TextIndex(tmp_path / "index")
+    with ThreadPoolExecutor(1) as pool:
+        await index.update([write(tmp_path, "a.txt", "alpha")], executor=pool)
+    index.close()
+    with open(tmp_path / "index" / "docs.tsv", "a") as f:
+        f.write(f"{'e' * 64}\t/lost.txt\n")
+
+    reopened = TextIndex(tmp_path / "index")
+    assert len(reopened.docs) == 1
+    with ThreadPoolExecutor(1) as pool:
+        await reopened.update([write(tmp_path, "b.txt", "beta")], executor=pool)
+    assert (tmp_path / "index" / "docs.tsv").read_text().count("\n") == 2
+    assert [Path(h.filename).name for h in reopened.search("beta")] == ["b.txt"]
+    reopened.close()
+
+
+def minimal_pdf(text: str) -> bytes:
+    stream = f"BT /F1 12 Tf 72 712 Td ({text}) Tj ET".encode()
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792]"
+        b" /Contents 4 0 R /Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for i, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (i, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\n" % (len(objects) + 1)
+    return out + b"startxref\n%d\n%%%%EOF\n" % xref
+
+
+def test_deleted_pdf_is_read_from_its_blob(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    pytest.importorskip("pypdf")
+    monkeypatch.setattr("nidus_scraper.config.DATA_DIR", tmp_path)
+    data = minimal_pdf("gripper manual")
+    sha = hashlib.sha256(data).hexdigest()
+    dest = tmp_path / "pdfs" / "manual.pdf"
+    dest.parent.mkdir()
+    tmp = tmp_path / "manual.part"
+    tmp.write_bytes(data)
+    blobs.store(tmp, sha, dest)
+    dest.unlink()
+    root = tmp_path / "index"
+
+    assert blobs.present(dest, sha)
+    assert textindex.document_terms(root, dest, sha) == {"gripper": 1, "manual": 1}
+
+    # Content that cannot be read at all is retried later, not cached as empty.
+    missing = "0" * 64
+    assert textindex.document_terms(root, tmp_path / "gone.pdf", missing) is None
+    assert not text_cache_path(root, missing).exists()
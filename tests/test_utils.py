@@ -1,9 +1,13 @@
 import asyncio
+import hashlib
 from pathlib import Path
 
+import aiohttp
 import pytest
+from aioresponses import aioresponses
 
-from nidus_scraper import utils
+from nidus_scraper import blobs, utils
+from nidus_scraper.manifest import Manifest
 
 
 def test_hash_and_save(tmp_path: Path) -> None:
@@ -35,3 +39,137 @@ async def test_retry_fail() -> None:
     with pytest.raises(ValueError):
         await utils.retry(func, attempts=2, base_delay=0)
     assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_stream_to_file(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("nidus_scraper.config.DATA_DIR", tmp_path)
+    body = b"x" * (utils.CHUNK_SIZE * 3 + 17)
+    dest = tmp_path / "sub" / "big.pdf"
+    with aioresponses() as m:
+        m.get("https://example.com/big.pdf", status=200, body=body)
+        async with aiohttp.ClientSession() as session:
+            async with session.get("https://example.com/big.pdf") as resp:
+                result = await utils.stream_to_file(resp, dest)
+
+    assert result.size == len(body)
+    assert result.sha256 == hashlib.sha256(body).hexdigest()
+    assert dest.read_bytes() == body
+    assert [p.name for p in dest.parent.iterdir()] == ["big.pdf"]
+    assert dest.samefile(blobs.blob_path(result.sha256))
+    assert not list((tmp_path / "blobs" / "tmp").iterdir())
+
+
+@pytest.mark.asyncio
+async def test_fetch_to_file_replays_validators(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr("nidus_scraper.config.DATA_DIR", tmp_path)
+    monkeypatch.setattr("nidus_scraper.config.MANIFEST", tmp_path / "sources.csv")
+    url = "https://example.com/doc.pdf"
+    dest = tmp_path / "doc.pdf"
+    seen: list[dict[str, str]] = []
+
+    def record(url: object, **kwargs: object) -> None:
+        seen.append(dict(kwargs["headers"]))  # type: ignore[call-overload]
+
+    async with Manifest(tmp_path / "m.sqlite3"):
+        with aioresponses() as m:
+            m.get(
+                url,
+                status=200,
+                body=b"pdf",
+                headers={"ETag": '"v1"'},
+                callback=record,
+            )
+            m.get(url, status=304, callback=record)
+            async with aiohttp.ClientSession() as session:
+                first = await utils.fetch_to_file(session, url, dest)
+                second = await utils.fetch_to_file(session, url, dest)
+
+    assert first is not None and first.size == 3
+    assert second is None
+    # PDFs are already compressed; asking for identity keeps sizes checkable.
+    identity = {"Accept-Encoding": "identity"}
+    assert seen == [identity, {**identity, "If-None-Match": '"v1"'}]
+    assert dest.read_bytes() == b"pdf"
+
+
+@pytest.mark.asyncio
+async def test_not_modified_restores_deleted_file(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr("nidus_scraper.config.DATA_DIR", tmp_path)
+    monkeypatch.setattr("nidus_scraper.config.MANIFEST", tmp_path / "sources.csv")
+    url = "https://example.com/doc.pdf"
+    dest = tmp_path / "doc.pdf"
+
+    async with Manifest(tmp_path / "m.sqlite3"):
+        with aioresponses() as m:
+            m.get(url, status=200, body=b"pdf", headers={"ETag": '"v1"'})
+            m.get(url, status=304)
+            async with aiohttp.ClientSession() as session:
+                first = await utils.fetch_to_file(session, url, dest)
+                dest.unlink()
+                assert await utils.fetch_to_file(session, url, dest) is None
+
+    assert first is not None and dest.samefile(blobs.blob_path(first.sha256))
+
+
+@pytest.mark.asyncio
+async def test_fetch_to_file_resumes_partial_download(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr("nidus_scraper.config.DATA_DIR", tmp_path)
+    monkeypatch.setattr("nidus_scraper.config.MANIFEST", tmp_path / "sources.csv")
+    url = "https://example.com/big.pdf"
+    body = b"0123456789" * 100
+    partial = blobs.partial_path(url, tmp_path / "big.pdf")
+    partial.write_bytes(body[:400])
+    blobs.write_partial_validator(partial, '"v1"')
+    seen: list[dict[str, str]] = []
+
+    def record(url: object, **kwargs: object) -> None:
+        seen.append(dict(kwargs["headers"]))  # type: ignore[call-overload]
+
+    headers = {"Content-Range": f"bytes 400-999/{len(body)}", "ETag": '"v1"'}
+    async with Manifest(tmp_path / "m.sqlite3"):
+        with aioresponses() as m:
+            m.get(url, status=206, body=body[400:], headers=headers, callback=record)
+            async with aiohttp.ClientSession() as session:
+                result = await utils.fetch_to_file(session, url, tmp_path / "big.pdf")
+
+    assert seen == [
+        {"Accept-Encoding": "identity", "Range": "bytes=400-", "If-Range": '"v1"'}
+    ]
+    assert result is not None
+    assert result.sha256 == hashlib.sha256(body).hexdigest()
+    assert (tmp_path / "big.pdf").read_bytes() == body
+    assert not partial.exists()
+
+
+@pytest.mark.asyncio
+async def test_compressible_downloads_resume_unencoded(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr("nidus_scraper.config.DATA_DIR", tmp_path)
+    monkeypatch.setattr("nidus_scraper.config.MANIFEST", tmp_path / "sources.csv")
+    url = "https://example.com/robot.urdf"
+    body = b"<robot/>" * 100
+    partial = blobs.partial_path(url, tmp_path / "r.urdf")
+    partial.write_bytes(body[:400])
+    blobs.write_partial_validator(partial, '"v1"')
+    seen: list[dict[str, str]] = []
+
+    def record(url: object, **kwargs: object) -> None:
+        seen.append(dict(kwargs["headers"]))  # type: ignore[call-overload]
+
+    headers = {"Content-Range": f"bytes 400-799/{len(body)}", "ETag": '"v1"'}
+    async with Manifest(tmp_path / "m.sqlite3"):
+        with aioresponses() as m:
+            m.get(url, status=206, body=body[400:], headers=headers, callback=record)
+            async with aiohttp.ClientSession() as session:
+                result = await utils.fetch_to_file(session, url, tmp_path / "r.urdf")
+
+    assert seen[0]["Accept-Encoding"] == "identity"
+    assert result is not None and (tmp_path / "r.urdf").read_bytes() == body
@@ -1,3 +1,5 @@
+from pathlib import Path
+
 import aiohttp
 import pytest
 
@@ -20,3 +22,81 @@ async def test_discover_product_pages(monkeypatch: pytest.MonkeyPatch) -> None:
 
     assert pages == {"https://example.com/product/item"}
 
+
+@pytest.mark.asyncio
+async def test_load_vendor_domains_groups_flat_urls(tmp_path: Path) -> None:
+    path = tmp_path / "domains.json"
+    path.write_text(
+        '{"urls": ["https://www.a.com/products", "https://a.com/x", "https://b.io/"]}'
+    )
+    domains = await vendor_pages.load_vendor_domains(path)
+    assert domains == {
+        "a.com": ["https://www.a.com/products", "https://a.com/x"],
+        "b.io": ["https://b.io/"],
+    }
+
+
+ARM = " ".join(f"arm{i % 50} joint{i % 7}" for i in range(200))
+GRIPPER = " ".join(f"gripper{i % 40} finger{i % 5}" for i in range(200))
+
+
+@pytest.mark.asyncio
+async def test_crawl_renders_only_new_content(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    from nidus_scraper.manifest import Manifest
+
+    monkeypatch.setattr("nidus_scraper.config.DATA_DIR", tmp_path)
+    monkeypatch.setattr("nidus_scraper.config.MANIFEST", tmp_path / "sources.csv")
+    site = {
+        "https://ex.com/": '<a href="/product/arm?utm_source=x">a</a>'
+        '<a href="/en/product/arm">b</a><a href="/product/arm-v2">c</a>'
+        '<a href="/product/gripper">d</a>',
+        "https://ex.com/product/arm": f"<p>{ARM}</p>",
+        "https://ex.com/product/arm-v2": f"<p>{ARM} new</p>",
+        "https://ex.com/product/gripper": f"<p>{GRIPPER}</p>",
+    }
+    rendered: list[str] = []
+
+    async def fake_fetch(session: aiohttp.ClientSession, url: str) -> str:
+        return site.get(url, "")
+
+    async def fake_domains() -> dict[str, list[str]]:
+        return {"ex.com": ["https://ex.com/"]}
+
+    class FakePool:
+        capacity = 1
+
+        def __init__(self, *args: object) -> None:
+            pass
+
+        async def __aenter__(self) -> "FakePool":
+            return self
+
+        async def __aexit__(self, *exc: object) -> None:
+            pass
+
+        async def render_pdf(self, url: str, path: str) -> None:
+            rendered.append(url)
+            with open(path, "wb") as f:
+                f.write(url.encode())
+
+    monkeypatch.setattr(vendor_pages, "fetch_html", fake_fetch)
+    monkeypatch.setattr(vendor_pages, "load_vendor_domains", fake_domains)
+    monkeypatch.setattr(vendor_pages, "BrowserPool", FakePool)
+
+    async with Manifest():
+        await vendor_pages.crawl_vendor_pages(None, 1)  # type: ignore[arg-type]
+    # The tracking and locale aliases are never fetched and only one of the
+    # two near-identical arm pages is rendered.
+    assert len(rendered) == 2 and "https://ex.com/product/gripper" in rendered
+    async with Manifest() as manifest:
+        pages = await manifest.page_fingerprints()
+    assert len(pages) == 3
+    assert len({p.filename for p in pages.values()}) == 2
+
+    rendered.clear()
+    site["https://ex.com/product/gripper"] = f"<p>{ARM.replace('arm', 'hand')}</p>"
+    async with Manifest():
+        await vendor_pages.crawl_vendor_pages(None, 1)  # type: ignore[arg-type]
+    assert rendered == ["https://ex.com/product/gripper"]
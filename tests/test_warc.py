@@ -0,0 +1,57 @@
+import gzip
+from pathlib import Path
+
+import aiohttp
+import pytest
+from aioresponses import aioresponses
+
+from nidus_scraper import vendor_pages, warc
+from nidus_scraper.warc import WarcWriter
+
+
+def test_records_round_trip_and_rotate(tmp_path: Path) -> None:
+    writer = WarcWriter(tmp_path, max_bytes=1)
+    writer.open()
+    headers = {"Content-Type": "text/html; charset=latin-1", "Content-Encoding": "gzip"}
+    body = "café".encode("latin-1")
+    first = writer.write("https://ex.com/a?utm_source=x", 200, "OK", headers, body)
+    html = {"Content-Type": "text/html"}
+    second = writer.write("https://ex.com/b", 200, "OK", html, b"<p>b</p>")
+    assert writer.write("https://ex.com/a", 200, "OK", headers, body) is None
+    writer.close()
+
+    assert first is not None and second is not None
+    assert first.filename != second.filename
+    assert len(list(tmp_path.glob("*.warc.gz"))) == 2
+    record = warc.read_entry(first, tmp_path)
+    assert (record.url, record.status, record.mime) == (
+        "https://ex.com/a?utm_source=x",
+        200,
+        "text/html",
+    )
+    assert record.text() == "café"
+    assert "content-encoding" not in record.headers
+    # Every record is its own gzip member, so whole files stay valid .warc.gz.
+    data = gzip.decompress((tmp_path / first.filename).read_bytes())
+    assert data.count(b"WARC/1.1") == 2
+
+    latest = warc.latest_entries(tmp_path)
+    assert set(latest) == {"https://ex.com/a", "https://ex.com/b"}
+
+    reopened = WarcWriter(tmp_path)
+    reopened.open()
+    assert reopened.write("https://ex.com/b", 200, "OK", {}, b"<p>b</p>") is None
+    assert reopened.write("https://ex.com/b", 200, "OK", {}, b"<p>b2</p>") is not None
+    reopened.close()
+    assert warc.latest_entries(tmp_path)["https://ex.com/b"].digest != second.digest
+
+
+@pytest.mark.asyncio
+async def test_fetch_html_archives_responses(tmp_path: Path) -> None:
+    async with WarcWriter(tmp_path), aiohttp.ClientSession() as session:
+        with aioresponses() as m:
+            m.get("https://ex.com/p", body="<p>hi</p>", content_type="text/html")
+            html = await vendor_pages.fetch_html(session, "https://ex.com/p")
+            assert html == "<p>hi</p>"
+    (entry,) = warc.latest_entries(tmp_path).values()
+    assert warc.read_entry(entry, tmp_path).body == b"<p>hi</p>"